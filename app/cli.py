@@ -0,0 +1,635 @@
+"""
+Command line interface of BatchFileRenamer.
+
+Built directly on `app.core.renamer.Renamer`, so it never imports PySide6
+and can be used in scripts. Run it with:
+    python -m app.cli DIRECTORY --name NEW_NAME --extension .jpg [...]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+from collections.abc import Callable, Sequence
+
+from app.core.duplicates import DUPLICATE_ACTIONS, SKIP_DUPLICATES
+from app.core.instrumentation import Instrumentation, InstrumentationSummary
+from app.core.journal import DEFAULT_FSYNC_EVERY
+from app.core.recursive import DirectoryResult, rename_tree
+from app.core.renamer import Renamer
+from app.core.sorting import NAME_ORDER, SORT_ORDERS
+from app.core.undo import DEFAULT_UNDO_LOG_DIR, get_latest_undo_log
+from app.core.watcher import DirectoryWatcher
+
+
+def normalize_extension(extension: str) -> str:
+    """
+    Returns the extension in the form returned by `os.path.splitext`
+    (e.g. `.jpg`), accepting it with or without the leading dot.
+    An empty string stands for files without an extension.
+    """
+    if extension and not extension.startswith("."):
+        return f".{extension}"
+    return extension
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli",
+        description=(
+            "Rename files in a directory to NAME_<number>.<extension>, "
+            "keeping files which already have correct names."
+        )
+    )
+    parser.add_argument(
+        "directory",
+        nargs="?",
+        help="directory with files to rename"
+    )
+    parser.add_argument(
+        "-n", "--name",
+        help="new name for this file batch (required)"
+    )
+    extensions_group = parser.add_mutually_exclusive_group()
+    extensions_group.add_argument(
+        "-e", "--extension",
+        dest="extensions",
+        action="append",
+        type=normalize_extension,
+        help=(
+            "only rename files with this extension (e.g. jpg or .jpg, "
+            "empty for files without an extension), can be repeated"
+        )
+    )
+    extensions_group.add_argument(
+        "--all-extensions",
+        action="store_true",
+        help="rename files with any extension"
+    )
+    parser.add_argument(
+        "-p", "--padding",
+        type=int,
+        help=(
+            "length of \"0\" padding of the numbers, by default based on "
+            "the number of entries in the directory"
+        )
+    )
+    parser.add_argument(
+        "-j", "--parallelism",
+        type=int,
+        default=1,
+        help="number of renames executed at the same time (default: 1)"
+    )
+    parser.add_argument(
+        "--sort",
+        choices=SORT_ORDERS,
+        default=NAME_ORDER.name,
+        help=(
+            "order in which files are numbered: by name, by name "
+            "with numbers compared by value (natural), by modification "
+            "time, by size or by the capture time read from EXIF, PNG "
+            "or MP4 headers (default: name)"
+        )
+    )
+    parser.add_argument(
+        "--duplicates",
+        choices=DUPLICATE_ACTIONS,
+        help=(
+            "don't number files identical to another one in the batch: "
+            "skip them (keeping their names) or give them the new name "
+            "of the first one with a suffix (by default, they are "
+            "numbered as any other file)"
+        )
+    )
+    parser.add_argument(
+        "-r", "--recursive",
+        action="store_true",
+        help=(
+            "also rename files in all subdirectories, numbering each "
+            "directory separately (overall progress is printed to stderr)"
+        )
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help=(
+            "number of processes renaming directories at the same time "
+            "with --recursive (default: number of CPUs)"
+        )
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help=(
+            "keep memory usage low for directories with millions of files "
+            "(renames are executed sequentially)"
+        )
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "after renaming, keep watching the directory and number "
+            "new files as they arrive, until interrupted with Ctrl+C"
+        )
+    )
+    parser.add_argument(
+        "--journal",
+        metavar="PATH",
+        help=(
+            "record the batch in a new journal at PATH, "
+            "so that it can be resumed with --resume if interrupted"
+        )
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="JOURNAL",
+        help=(
+            "resume the batch recorded in the journal, "
+            "instead of starting a new one"
+        )
+    )
+    parser.add_argument(
+        "--fsync-every",
+        type=int,
+        default=DEFAULT_FSYNC_EVERY,
+        metavar="N",
+        help=(
+            "fsync the journal every N records, 1 for the highest "
+            "durability, 0 to fsync only at the end "
+            f"(default: {DEFAULT_FSYNC_EVERY})"
+        )
+    )
+    parser.add_argument(
+        "--save-plan",
+        metavar="PATH",
+        help=(
+            "save the planned renames to a new plan file at PATH, "
+            "without renaming anything"
+        )
+    )
+    parser.add_argument(
+        "--apply-plan",
+        metavar="PLAN",
+        help=(
+            "execute the renames saved in the plan file, "
+            "if the directory still matches it"
+        )
+    )
+    parser.add_argument(
+        "--undo",
+        metavar="LOG",
+        help=(
+            "rename files from the batch recorded in the undo log back, "
+            "\"last\" for the most recent batch (with --recursive, every "
+            "directory is recorded in its own undo log, and a resumed "
+            "batch is recorded apart from its interrupted part)"
+        )
+    )
+    parser.add_argument(
+        "--undo-log-dir",
+        default=DEFAULT_UNDO_LOG_DIR,
+        metavar="DIR",
+        help=f"directory of undo logs (default: {DEFAULT_UNDO_LOG_DIR})"
+    )
+    parser.add_argument(
+        "--no-undo-log",
+        action="store_true",
+        help="don't record the batch in an undo log"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only print the planned renames, without renaming anything"
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="print one JSON object per line instead of plain text"
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help=(
+            "print durations of the scan, filter, metadata, plan "
+            "and execute stages, counts of file system calls "
+            "and a histogram of rename latencies"
+        )
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help=(
+            "log renames to stderr (per-file records are limited "
+            "to 100 per second)"
+        )
+    )
+    return parser
+
+
+class NullSignal:
+    """Progress signal which ignores the emitted values."""
+
+    def emit(self, value: float) -> None:
+        pass
+
+
+class StderrProgressSignal:
+    """Progress signal which prints the emitted percentage to stderr.
+
+    On a terminal the percentage is updated in place, otherwise every
+    emitted value is printed on its own line. Emissions are expected
+    to be rate-limited by the caller (see `ThrottledProgress`).
+    """
+
+    def __init__(self, label: str) -> None:
+        self.label: str = label
+        self.in_place: bool = sys.stderr.isatty()
+
+    def emit(self, value: float) -> None:
+        message: str = f"{self.label}: {value:.0f}%"
+        if not self.in_place:
+            print(message, file=sys.stderr)
+            return
+        end: str = "\n" if value >= 100.0 else ""
+        print(f"\r{message}", end=end, file=sys.stderr, flush=True)
+
+
+def print_rename(
+        old_name: str,
+        new_name: str,
+        status: str,
+        as_json: bool,
+        directory: str | None = None
+) -> None:
+    if as_json:
+        record: dict[str, str] = {
+            "old": old_name,
+            "new": new_name,
+            "status": status
+        }
+        if directory is not None:
+            record = {"directory": directory, **record}
+        print(json.dumps(record))
+    elif directory is not None:
+        print(
+            f"{os.path.join(directory, old_name)} => "
+            f"{os.path.join(directory, new_name)} ({status})"
+        )
+    else:
+        print(f"{old_name} => {new_name} ({status})")
+
+
+def print_directory_result(result: DirectoryResult, as_json: bool) -> None:
+    for old_name, new_name, status in result.renames:
+        print_rename(old_name, new_name, status, as_json, result.directory)
+    if result.error is None:
+        return
+    if as_json:
+        print(json.dumps({
+            "directory": result.directory,
+            "status": "error",
+            "error": result.error
+        }))
+    else:
+        print(f"{result.directory}: {result.error}", file=sys.stderr)
+
+
+def rename_recursively(renamer: Renamer, args: argparse.Namespace) -> int:
+    results: list[DirectoryResult] = rename_tree(
+        root=args.directory,
+        extensions=None if args.all_extensions else args.extensions,
+        new_batch_name=args.name,
+        progress_callback=StderrProgressSignal("directories processed"),
+        number_padding=args.padding,
+        max_workers=args.jobs,
+        dry_run=args.dry_run,
+        result_callback=lambda result: print_directory_result(
+            result,
+            args.json
+        ),
+        sort_order_name=args.sort,
+        duplicate_action=args.duplicates,
+        undo_log_dir=renamer.undo_log_dir
+    )
+    return 1 if any(result.failed for result in results) else 0
+
+
+def get_files_to_rename(
+        renamer: Renamer,
+        args: argparse.Namespace
+) -> list[str]:
+    if args.streaming:
+        return list(
+            renamer.iter_files_with_extensions(
+                renamer.iter_file_names(args.directory),
+                args.extensions
+            )
+        )
+    files_to_rename: list[str] = renamer.filter_directories(args.directory)
+    if args.all_extensions:
+        return files_to_rename
+    return renamer.filter_extensions(
+        file_list=files_to_rename,
+        extensions=args.extensions
+    )
+
+
+def get_renaming_map(
+        renamer: Renamer,
+        args: argparse.Namespace
+) -> dict[str, str]:
+    return renamer.get_directory_renaming_map(
+        directory=args.directory,
+        files_to_rename=get_files_to_rename(renamer, args),
+        new_batch_name=args.name,
+        number_padding=args.padding,
+        sort_order=SORT_ORDERS[args.sort],
+        duplicate_action=args.duplicates
+    )
+
+
+def print_plan(renamer: Renamer, args: argparse.Namespace) -> int:
+    files_to_rename: list[str] = get_files_to_rename(renamer, args)
+    files_to_rename.sort(key=renamer.get_sort_key(
+        args.directory,
+        files_to_rename,
+        SORT_ORDERS[args.sort]
+    ))
+    for old_name, new_name in renamer.iter_renaming_plan(
+        files_to_rename,
+        new_batch_name=args.name,
+        number_padding=args.padding,
+        duplicates=(
+            None if args.duplicates is None
+            else renamer.find_duplicates(args.directory, files_to_rename)
+        ),
+        duplicate_action=args.duplicates or SKIP_DUPLICATES
+    ):
+        print_rename(old_name, new_name, "planned", args.json)
+    return 0
+
+
+def create_rename_reporter(
+        as_json: bool
+) -> tuple[Callable[[str, str, bool], None], list[str]]:
+    """
+    Returns a callback printing every rename and a list
+    to which the callback adds the names of files which failed.
+    """
+    failed: list[str] = []
+    # Renames are reported from multiple threads if parallelism is above 1
+    output_lock: threading.Lock = threading.Lock()
+
+    def report_rename(old_name: str, new_name: str, renamed: bool) -> None:
+        with output_lock:
+            if not renamed:
+                failed.append(old_name)
+            print_rename(
+                old_name,
+                new_name,
+                "renamed" if renamed else "failed",
+                as_json
+            )
+
+    return report_rename, failed
+
+
+def rename(renamer: Renamer, args: argparse.Namespace) -> int:
+    report_rename, failed = create_rename_reporter(args.json)
+    if args.streaming:
+        renamer.rename_files_streaming(
+            directory=args.directory,
+            extensions=args.extensions,
+            new_batch_name=args.name,
+            progress_callback=NullSignal(),
+            number_padding=args.padding,
+            step_callback=report_rename
+        )
+    else:
+        renamer.rename_files_from_file_map(
+            directory=args.directory,
+            files_map=get_renaming_map(renamer, args),
+            parallelism=args.parallelism,
+            step_callback=report_rename,
+            journal_path=args.journal,
+            fsync_every=args.fsync_every
+        )
+    return 1 if failed else 0
+
+
+def watch(renamer: Renamer, args: argparse.Namespace) -> int:
+    report_rename, failed = create_rename_reporter(args.json)
+    watcher: DirectoryWatcher = DirectoryWatcher(
+        renamer=renamer,
+        directory=args.directory,
+        extensions=None if args.all_extensions else args.extensions,
+        new_batch_name=args.name,
+        number_padding=args.padding,
+        step_callback=report_rename
+    )
+    print(
+        f"Watching {args.directory} for new files, press Ctrl+C to stop",
+        file=sys.stderr
+    )
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return 1 if failed else 0
+
+
+def resume(renamer: Renamer, args: argparse.Namespace) -> int:
+    report_rename, failed = create_rename_reporter(args.json)
+    renamer.resume_renaming(
+        journal_path=args.resume,
+        parallelism=args.parallelism,
+        step_callback=report_rename,
+        fsync_every=args.fsync_every
+    )
+    return 1 if failed else 0
+
+
+def save_plan(renamer: Renamer, args: argparse.Namespace) -> int:
+    count: int = renamer.save_plan(
+        plan_path=args.save_plan,
+        directory=args.directory,
+        files_map=get_renaming_map(renamer, args)
+    )
+    print(f"Saved {count} renames to {args.save_plan}", file=sys.stderr)
+    return 0
+
+
+def apply_plan(renamer: Renamer, args: argparse.Namespace) -> int:
+    report_rename, failed = create_rename_reporter(args.json)
+    renamer.apply_plan(
+        plan_path=args.apply_plan,
+        parallelism=args.parallelism,
+        step_callback=report_rename,
+        journal_path=args.journal,
+        fsync_every=args.fsync_every
+    )
+    return 1 if failed else 0
+
+
+def undo(renamer: Renamer, args: argparse.Namespace) -> int:
+    report_rename, failed = create_rename_reporter(args.json)
+    renamer.undo_renaming(
+        undo_log_path=args.undo,
+        parallelism=args.parallelism,
+        step_callback=report_rename
+    )
+    return 1 if failed else 0
+
+
+def print_stats(instrumentation: Instrumentation, as_json: bool) -> None:
+    summary: InstrumentationSummary = instrumentation.take_summary()
+    if as_json:
+        print(json.dumps({"stats": summary.to_dict()}))
+    else:
+        print(summary, file=sys.stderr)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """
+    Runs the command line interface. Returns the exit code:
+    `0` on success and `1` if any of the files could not be renamed.
+    """
+    parser = create_parser()
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+    logging.getLogger("app").setLevel(
+        logging.DEBUG if args.verbose else logging.WARNING
+    )
+
+    if args.stats and args.recursive:
+        parser.error("--stats can't be used with --recursive")
+    renamer = Renamer(
+        undo_log_dir=None if args.no_undo_log else args.undo_log_dir,
+        instrumentation=Instrumentation() if args.stats else None
+    )
+    exit_code: int = run_command(parser, args, renamer)
+    if renamer.instrumentation is not None:
+        print_stats(renamer.instrumentation, args.json)
+    return exit_code
+
+
+def run_command(
+        parser: argparse.ArgumentParser,
+        args: argparse.Namespace,
+        renamer: Renamer
+) -> int:
+    """Validates the arguments and runs the chosen command."""
+    if args.parallelism < 1:
+        parser.error("parallelism must be at least 1")
+    if args.fsync_every < 0:
+        parser.error("fsync-every can't be negative")
+    if args.undo is not None and args.dry_run:
+        parser.error("--undo can't be used with --dry-run")
+    if args.undo == "last":
+        args.undo = get_latest_undo_log(args.undo_log_dir)
+        if args.undo is None:
+            parser.error(f"no undo logs in {args.undo_log_dir}")
+    if args.undo is not None:
+        try:
+            return undo(renamer, args)
+        except (OSError, ValueError) as e:
+            parser.error(f"can't undo from {args.undo}: {e}")
+    if args.apply_plan is not None and args.dry_run:
+        parser.error("--apply-plan can't be used with --dry-run")
+    if args.apply_plan is not None:
+        try:
+            return apply_plan(renamer, args)
+        except (OSError, ValueError) as e:
+            parser.error(f"can't apply {args.apply_plan}: {e}")
+    if args.resume is not None and args.dry_run:
+        parser.error("--resume can't be used with --dry-run")
+    if args.resume is not None:
+        try:
+            return resume(renamer, args)
+        except (OSError, ValueError) as e:
+            parser.error(f"can't resume from {args.resume}: {e}")
+
+    if args.directory is None or args.name is None:
+        parser.error("the directory and --name are required")
+    if args.extensions is None and not args.all_extensions:
+        parser.error("one of --extension or --all-extensions is required")
+    if args.journal is not None and (args.streaming or args.recursive):
+        parser.error("--journal can't be used with --streaming or --recursive")
+    if args.journal is not None and args.dry_run:
+        parser.error("--journal can't be used with --dry-run")
+    if not renamer.validate_new_name(args.name):
+        parser.error(
+            "invalid new name. Only lowercase and uppercase letters, "
+            "digits, \"-\", \"_\" and spaces are allowed"
+        )
+    if args.padding is not None and args.padding < 1:
+        parser.error("padding must be at least 1")
+
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("jobs must be at least 1")
+    if args.jobs is not None and not args.recursive:
+        parser.error("--jobs can only be used with --recursive")
+    if args.recursive and args.streaming:
+        parser.error("--recursive can't be used with --streaming")
+    if args.save_plan is not None and (
+        args.streaming or args.recursive or args.dry_run
+    ):
+        parser.error(
+            "--save-plan can't be used with --streaming, --recursive "
+            "or --dry-run"
+        )
+    if args.recursive and args.watch:
+        parser.error("--watch can't be used with --recursive")
+    if args.recursive:
+        if not os.path.isdir(args.directory):
+            parser.error(f"{args.directory} is not a directory")
+        return rename_recursively(renamer, args)
+
+    if args.streaming and args.all_extensions:
+        parser.error("--streaming requires choosing the extensions")
+    if args.streaming and args.padding is None:
+        parser.error("--streaming requires choosing the padding")
+    if args.streaming and args.sort != NAME_ORDER.name:
+        parser.error("--streaming only numbers files by name")
+    if args.streaming and args.duplicates is not None:
+        parser.error("--duplicates can't be used with --streaming")
+    if args.streaming and args.parallelism != 1:
+        parser.error("--parallelism can't be used with --streaming")
+    if args.watch and (
+        args.streaming or args.dry_run or args.save_plan is not None
+    ):
+        parser.error(
+            "--watch can't be used with --streaming, --dry-run "
+            "or --save-plan"
+        )
+
+    # What was being done when an `OSError` is raised, for its message
+    operation: str = f"read directory {args.directory}"
+    try:
+        if args.padding is None:
+            args.padding = len(str(len(
+                renamer.get_directory_snapshot(args.directory).names
+            )))
+        if args.dry_run:
+            return print_plan(renamer, args)
+        if args.save_plan is not None:
+            operation = f"save plan to {args.save_plan}"
+            return save_plan(renamer, args)
+        operation = f"rename files in {args.directory}"
+        exit_code: int = rename(renamer, args)
+        if args.watch:
+            operation = f"watch {args.directory}"
+            exit_code = max(exit_code, watch(renamer, args))
+        return exit_code
+    except OSError as e:
+        # The message names the path the error is about (`e.filename`),
+        # which may be a file in the directory, the plan or the journal
+        parser.error(f"can't {operation}: {e}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
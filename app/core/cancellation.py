@@ -0,0 +1,65 @@
+"""
+This module holds the cancellation token used by BatchFileRenamer.
+A token is shared between the thread running a batch and the thread
+controlling it (e.g. the GUI), and checked by the batch between renames,
+so that it can be paused, resumed or cancelled while it's running.
+"""
+
+import threading
+
+
+class BatchCancelled(Exception):
+    """
+    Raised by a step of a batch which doesn't rename files (e.g. hashing
+    or reading headers while planning) to stop it once it's cancelled.
+    """
+
+
+class CancellationToken:
+    """Cooperative cancellation and pausing of a running batch.
+
+    Safe to use from multiple threads.
+    """
+
+    def __init__(self) -> None:
+        self._cancelled: threading.Event = threading.Event()
+        self._running: threading.Event = threading.Event()
+        self._running.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def is_paused(self) -> bool:
+        return not self._running.is_set()
+
+    def cancel(self) -> None:
+        """Stop the batch. A paused batch stops right away."""
+        self._cancelled.set()
+        self._running.set()
+
+    def pause(self) -> None:
+        """Pause the batch before its next rename."""
+        self._running.clear()
+
+    def resume(self) -> None:
+        """Resume a paused batch."""
+        self._running.set()
+
+    def should_stop(self) -> bool:
+        """
+        Called by the batch between renames. Blocks while the batch
+        is paused and returns whether it was cancelled.
+        """
+        self._running.wait()
+        return self._cancelled.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        """
+        Called by steps of the batch other than renames (e.g. planning).
+        Blocks while the batch is paused and raises `BatchCancelled`
+        if it was cancelled.
+        """
+        if self.should_stop():
+            raise BatchCancelled
@@ -0,0 +1,198 @@
+"""
+This module holds the duplicate detection used by BatchFileRenamer,
+so that byte-identical copies in a batch don't take up numbers.
+Files are grouped by size first and only files sharing a size with
+another one are hashed, by a pool of threads. Hashes are cached
+by file identity, so repeated runs only hash new or modified files.
+"""
+
+import hashlib
+import mmap
+import os
+from collections.abc import Iterable, Iterator, Mapping
+from functools import partial
+
+from .cancellation import CancellationToken
+from .file_cache import FILE_CACHE_SIZE, FileIdentityCache
+from .snapshot import FileInfo
+
+
+# Duplicates keep their names and don't take up numbers
+SKIP_DUPLICATES: str = "skip"
+# Duplicates are renamed after their original, with a suffix
+SUFFIX_DUPLICATES: str = "suffix"
+DUPLICATE_ACTIONS: tuple[str, ...] = (SKIP_DUPLICATES, SUFFIX_DUPLICATES)
+
+# Inserted between the new name of the original and the duplicate's
+# number (e.g. `holidays_003_duplicate_1.jpg`)
+DUPLICATE_SUFFIX: str = "duplicate"
+
+# Length of the parts of a file hashed at once. The hash function
+# releases the GIL for each part, so files are hashed in parallel
+HASH_CHUNK_SIZE: int = 1024 * 1024
+
+
+def hash_file(
+        path: str,
+        cancellation_token: CancellationToken | None = None
+) -> bytes | None:
+    """
+    Returns the hash of the contents of the file at `path`, hashed
+    part by part from a memory map (without copying it), or `None`
+    if the file can't be read. `cancellation_token` is checked
+    before every part (see `CancellationToken.raise_if_cancelled`).
+    """
+    content_hash = hashlib.blake2b(digest_size=32)
+    try:
+        with open(path, "rb") as file:
+            size: int = os.fstat(file.fileno()).st_size
+            if size == 0:
+                return content_hash.digest()
+            with (
+                mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ)
+                as data,
+                memoryview(data) as view
+            ):
+                for start in range(0, len(view), HASH_CHUNK_SIZE):
+                    if cancellation_token is not None:
+                        cancellation_token.raise_if_cancelled()
+                    content_hash.update(view[start:start + HASH_CHUNK_SIZE])
+    except (OSError, ValueError):
+        return None
+    return content_hash.digest()
+
+
+def get_duplicate_name(
+        original_name: str,
+        duplicate_name: str,
+        index: int
+) -> str:
+    """
+    Returns the new name of the `index`-th duplicate of a file
+    renamed to (or keeping) `original_name`.
+    """
+    stem: str = os.path.splitext(original_name)[0]
+    extension: str = os.path.splitext(duplicate_name)[1]
+    return f"{stem}_{DUPLICATE_SUFFIX}_{index}{extension}"
+
+
+def iter_plan_with_duplicates(
+        plan: Iterable[tuple[str, str]],
+        duplicates: Mapping[str, str],
+        duplicate_action: str
+) -> Iterator[tuple[str, str]]:
+    """
+    Yields old and new names from the renaming `plan`, leaving
+    the `duplicates` (names of duplicates by the names of their
+    originals) out or renaming each after its original (see
+    `get_duplicate_name`), right after the original.
+    """
+    if duplicate_action == SKIP_DUPLICATES:
+        for old_name, new_name in plan:
+            if old_name not in duplicates:
+                yield old_name, new_name
+        return
+    copies: dict[str, list[str]] = {}
+    for duplicate, original in duplicates.items():
+        copies.setdefault(original, []).append(duplicate)
+
+    def iter_duplicate_renames(
+            original: str,
+            new_name: str
+    ) -> Iterator[tuple[str, str]]:
+        for index, duplicate in enumerate(copies.pop(original, ()), 1):
+            duplicate_name: str = get_duplicate_name(
+                new_name,
+                duplicate,
+                index
+            )
+            # Duplicates already renamed by a previous batch
+            if duplicate_name != duplicate:
+                yield duplicate, duplicate_name
+
+    for old_name, new_name in plan:
+        if old_name in duplicates:
+            continue
+        yield old_name, new_name
+        yield from iter_duplicate_renames(old_name, new_name)
+    # Originals which keep their names
+    for original in list(copies):
+        yield from iter_duplicate_renames(original, original)
+
+
+class DuplicateFinder:
+    """Finds byte-identical files, caching hashes by file identity.
+
+    A file is hashed again only if it was replaced or modified
+    (see `FileIdentityCache`). Safe to use from multiple threads.
+    """
+
+    def __init__(self, max_size: int = FILE_CACHE_SIZE) -> None:
+        self._hashes: FileIdentityCache[bytes] = FileIdentityCache(max_size)
+
+    def find_duplicates(
+            self,
+            directory: str,
+            files: Iterable[FileInfo],
+            max_workers: int | None = None,
+            cancellation_token: CancellationToken | None = None
+    ) -> dict[str, str]:
+        """
+        Returns names of files from `directory` which are duplicates
+        of another one by the name of that one (the first of the
+        identical files in the order of `files`). Only files sharing
+        a size with another one are hashed, by a pool of `max_workers`
+        threads (by default based on the number of CPUs).
+        Raises `BatchCancelled` once `cancellation_token` is cancelled.
+        """
+        files = list(files)
+        sizes: dict[int, int] = {}
+        for file in files:
+            sizes[file.size] = sizes.get(file.size, 0) + 1
+        candidates: list[FileInfo] = [
+            file for file in files if sizes[file.size] > 1
+        ]
+        if not candidates:
+            return {}
+        hashes: dict[str, bytes | None] = self.get_hashes(
+            directory,
+            candidates,
+            max_workers,
+            cancellation_token
+        )
+        originals: dict[tuple[int, bytes], str] = {}
+        duplicates: dict[str, str] = {}
+        for file in candidates:
+            content_hash: bytes | None = hashes[file.name]
+            if content_hash is None:
+                continue
+            original: str = originals.setdefault(
+                (file.size, content_hash),
+                file.name
+            )
+            if original != file.name:
+                duplicates[file.name] = original
+        return duplicates
+
+    def get_hashes(
+            self,
+            directory: str,
+            files: list[FileInfo],
+            max_workers: int | None = None,
+            cancellation_token: CancellationToken | None = None
+    ) -> dict[str, bytes | None]:
+        """
+        Returns hashes of the files from `directory` by name
+        (`None` if a file can't be read), hashing only files
+        which are not cached yet.
+        """
+        return self._hashes.get_values(
+            directory,
+            files,
+            partial(hash_file, cancellation_token=cancellation_token),
+            max_workers
+        )
+
+    def clear(self) -> None:
+        """Forget all cached hashes."""
+        self._hashes.clear()
@@ -0,0 +1,265 @@
+"""
+This module holds the rename executor used by BatchFileRenamer.
+The executor reads the directory's contents once and keeps
+the set of names up to date in memory as renames succeed,
+so checking for missing sources and conflicting targets
+does not require listing the directory for every file.
+
+Independent chains of renames (see `get_rename_chains`) can be executed
+in parallel, which helps on network file systems (NFS, SMB), where
+every rename is a round trip to the server.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+from .cancellation import CancellationToken
+from .instrumentation import Instrumentation
+from .journal import RenameJournal
+from .rate_limited_log import RateLimitedLog
+
+
+logger = logging.getLogger(__name__)
+
+
+def open_directory(directory: str) -> int | None:
+    """
+    Opens the directory and returns its file descriptor,
+    or `None` if renaming relative to directory descriptors
+    is not supported on this platform (e.g. on Windows).
+    The descriptor has to be closed with `os.close`.
+    """
+    if os.rename not in os.supports_dir_fd:
+        return None
+    return os.open(directory, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+
+
+def lstat_entry(
+        directory: str,
+        dir_fd: int | None,
+        name: str
+) -> os.stat_result:
+    """
+    Returns the `lstat` of an entry in the directory, relative to `dir_fd`
+    (see `open_directory`) if provided. Raises `OSError` if it's missing.
+    """
+    if dir_fd is not None:
+        return os.stat(name, dir_fd=dir_fd, follow_symlinks=False)
+    return os.lstat(os.path.join(directory, name))
+
+
+class RenameExecutor:
+    """Renames files within a single directory.
+
+    Attributes:
+        directory (str): Path to the directory in which files are renamed.
+        names (set[str]): Names currently present in the directory,
+            as known to the executor.
+        journal (RenameJournal | None): Journal in which every rename
+            is recorded, if any.
+        instrumentation (Instrumentation | None): Instrumentation
+            recording the latency of every rename, if enabled.
+    """
+
+    def __init__(
+            self,
+            directory: str,
+            names: Iterable[str] | None = None,
+            all_names: bool = True,
+            dir_fd: int | None = None
+    ) -> None:
+        """Initialise the executor.
+
+        Args:
+            directory (str): Path to the directory in which files are renamed.
+            names (Iterable[str] | None): Names present in the directory.
+                If not provided, the directory is listed once.
+            all_names (bool): Whether `names` contains all names present
+                in the directory. If `False`, it must contain at least all
+                names which the files could be renamed to, and renaming
+                a file missing from `names` is left to `os.rename` to fail.
+            dir_fd (int | None): File descriptor of the open directory
+                (see `open_directory`). If provided, files are renamed
+                relative to it, which avoids resolving the directory's path
+                for every rename and keeps renaming in the same directory
+                even if it gets moved.
+        """
+        self.directory: str = directory
+        self.all_names: bool = all_names
+        self.dir_fd: int | None = dir_fd
+        self.journal: RenameJournal | None = None
+        self.instrumentation: Instrumentation | None = None
+        self.names: set[str] = set(
+            names if names is not None else os.listdir(directory)
+        )
+        self._names_lock: threading.Lock = threading.Lock()
+        # Records emitted for every file are rate-limited
+        self._renamed_log: RateLimitedLog = RateLimitedLog(
+            logger,
+            logging.DEBUG
+        )
+        self._failed_log: RateLimitedLog = RateLimitedLog(
+            logger,
+            logging.ERROR
+        )
+
+    def rename(self, old_name: str, new_name: str) -> bool:
+        """Rename a single file and update the known names.
+
+        Raises `ValueError` if `old_name` is not present in the directory
+        (checked only if all names in the directory are known).
+        Safe to call from multiple threads, as long as no two threads
+        rename files from or to the same name at the same time.
+        Returns `True` if the file was renamed, `False` if `new_name`
+        already exists or the rename failed.
+        """
+        if self.all_names and old_name not in self.names:
+            raise ValueError(
+                f"File {old_name} was not present in the directory. "
+                "Files map is likely incorrect."
+            )
+
+        if new_name in self.names:
+            self._failed_log.log(
+                "File %s could not be renamed to %s, "
+                "as it already exists in the directory",
+                old_name,
+                new_name
+            )
+            if self.journal is not None:
+                self.journal.record_failure(old_name, new_name)
+            return False
+
+        if self.journal is not None:
+            self.journal.record_intent(old_name, new_name)
+
+        start: int = time.perf_counter_ns()
+        try:
+            if self.dir_fd is not None:
+                os.rename(
+                    old_name,
+                    new_name,
+                    src_dir_fd=self.dir_fd,
+                    dst_dir_fd=self.dir_fd
+                )
+            else:
+                os.rename(
+                    os.path.join(self.directory, old_name),
+                    os.path.join(self.directory, new_name)
+                )
+
+        except OSError as e:
+            self._failed_log.log(
+                "Failed renaming (%s => %s). %s: %s.",
+                old_name,
+                new_name,
+                type(e).__name__,
+                e
+            )
+            if self.instrumentation is not None:
+                self.instrumentation.record_rename(
+                    time.perf_counter_ns() - start
+                )
+            if self.journal is not None:
+                self.journal.record_failure(old_name, new_name)
+            return False
+
+        if self.instrumentation is not None:
+            self.instrumentation.record_rename(
+                time.perf_counter_ns() - start
+            )
+        if self.journal is not None:
+            self.journal.record_commit(old_name, new_name)
+
+        with self._names_lock:
+            self.names.discard(old_name)
+            self.names.add(new_name)
+        self._renamed_log.log("Renamed %s => %s", old_name, new_name)
+        return True
+
+    def execute_chain(
+            self,
+            chain: Iterable[tuple[str, str]]
+    ) -> Iterator[bool]:
+        """Rename files one by one, in the order given by the chain.
+
+        Each rename in a chain frees the name needed by the next one
+        (see `get_rename_chains`), so once a rename fails, the rest
+        of the chain is skipped. Yields whether each rename succeeded.
+        """
+        failed: bool = False
+        for old_name, new_name in chain:
+            if failed:
+                self._failed_log.log(
+                    "Skipped renaming (%s => %s), "
+                    "as a previous rename in the same chain failed",
+                    old_name,
+                    new_name
+                )
+                yield False
+                continue
+            renamed: bool = self.rename(old_name, new_name)
+            failed = not renamed
+            yield renamed
+
+    def execute_chains(
+            self,
+            chains: list[list[tuple[str, str]]],
+            parallelism: int = 1,
+            step_callback: Callable[[str, str, bool], None] | None = None,
+            cancellation_token: CancellationToken | None = None
+    ) -> None:
+        """Execute independent chains of renames.
+
+        Args:
+            chains (list[list[tuple[str, str]]]): Chains of renames,
+                none of which renames a file to a name used by another chain.
+            parallelism (int): Maximum number of chains renamed at the same
+                time. With `1`, chains are executed in the calling thread.
+            step_callback (Callable[[str, str, bool], None] | None): Called
+                after every rename with the old name, the new name and
+                whether the file was renamed. Called from the worker threads
+                if `parallelism` is greater than 1.
+            cancellation_token (CancellationToken | None): Token checked
+                before every chain, which pauses or stops the execution.
+                A chain which has been started is always finished,
+                so that no file is left under a temporary name.
+        """
+        def execute_chain_group(group: list[list[tuple[str, str]]]) -> None:
+            for chain in group:
+                if (
+                    cancellation_token is not None
+                    and cancellation_token.should_stop()
+                ):
+                    return
+                results: Iterator[bool] = self.execute_chain(chain)
+                for (old_name, new_name), renamed in zip(chain, results):
+                    if step_callback is not None:
+                        step_callback(old_name, new_name, renamed)
+
+        if parallelism <= 1 or len(chains) <= 1:
+            execute_chain_group(chains)
+            self.flush_logs()
+            return
+
+        # Submit chains in a few groups per thread, instead of one task
+        # per chain, to keep the overhead low for batches of short chains
+        group_count: int = min(len(chains), parallelism * 4)
+        groups: list[list[list[tuple[str, str]]]] = [
+            chains[i::group_count] for i in range(group_count)
+        ]
+        with ThreadPoolExecutor(max_workers=parallelism) as pool:
+            for future in [
+                pool.submit(execute_chain_group, group) for group in groups
+            ]:
+                future.result()
+        self.flush_logs()
+
+    def flush_logs(self) -> None:
+        """Report the per-file log records suppressed by rate limiting."""
+        self._renamed_log.flush()
+        self._failed_log.flush()
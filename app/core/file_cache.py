@@ -0,0 +1,99 @@
+"""
+This module holds the cache of values read from files (hashes, capture
+times) used by BatchFileRenamer. Values are cached by file identity
+instead of name, so renaming a file keeps its value, and reading
+the files which are not cached yet is spread over a pool of threads.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Generic, TypeVar
+
+from .snapshot import FileInfo
+
+
+# Maximum number of values kept by a `FileIdentityCache`
+FILE_CACHE_SIZE: int = 100_000
+
+# Device, inode, size and modification time (in nanoseconds) of a file
+FileIdentity = tuple[int, int, int, int]
+
+T = TypeVar("T")
+
+
+class FileIdentityCache(Generic[T]):
+    """Values read from files by file identity.
+
+    A file's identity is its device, inode, size and modification time,
+    so a value is read again only if the file was replaced or modified
+    (renaming it keeps its value). Files without an inode are never
+    cached, since they can't be told from one another. At most
+    `max_size` values are kept, the least recently used are forgotten
+    first. Safe to use from multiple threads.
+    """
+
+    def __init__(self, max_size: int = FILE_CACHE_SIZE) -> None:
+        self.max_size: int = max_size
+        self._lock: threading.Lock = threading.Lock()
+        self._values: OrderedDict[FileIdentity, T | None] = OrderedDict()
+
+    def get_values(
+            self,
+            directory: str,
+            files: Iterable[FileInfo],
+            read: Callable[[str], T | None],
+            max_workers: int | None = None
+    ) -> dict[str, T | None]:
+        """
+        Returns values of the files from `directory` by name (`None`
+        if the directory can't be accessed). Files which are not cached
+        yet are read with `read`, called with their paths by a pool
+        of `max_workers` threads (by default based on the number
+        of CPUs). Exceptions raised by `read` are propagated.
+        """
+        files = list(files)
+        try:
+            device: int = os.stat(directory).st_dev
+        except OSError:
+            return {file.name: None for file in files}
+        values: dict[str, T | None] = {}
+        missing: list[tuple[FileInfo, FileIdentity | None]] = []
+        with self._lock:
+            for file in files:
+                identity: FileIdentity | None = (
+                    (device, file.inode, file.size, file.mtime_ns)
+                    if file.inode else None
+                )
+                if identity is not None and identity in self._values:
+                    self._values.move_to_end(identity)
+                    values[file.name] = self._values[identity]
+                else:
+                    missing.append((file, identity))
+        if not missing:
+            return values
+        paths: list[str] = [
+            os.path.join(directory, file.name) for file, _ in missing
+        ]
+        if len(paths) == 1:
+            read_values: list[T | None] = [read(paths[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                read_values = list(pool.map(read, paths))
+        with self._lock:
+            for (file, identity), value in zip(missing, read_values):
+                values[file.name] = value
+                if identity is None:
+                    continue
+                self._values[identity] = value
+                self._values.move_to_end(identity)
+            while len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+        return values
+
+    def clear(self) -> None:
+        """Forget all cached values."""
+        with self._lock:
+            self._values.clear()
@@ -0,0 +1,125 @@
+"""
+This module holds the opt-in instrumentation used by BatchFileRenamer.
+When enabled, it records how long each stage of a batch (scan, filter,
+metadata, hash, plan, execute) took, how many file system calls were made
+and how long the individual renames took, so that a slow batch can be
+explained without reading the per-file log records.
+"""
+
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+
+STAGES: tuple[str, ...] = (
+    "scan", "filter", "metadata", "hash", "plan", "execute"
+)
+
+
+@dataclass
+class InstrumentationSummary:
+    """Measurements of a batch.
+
+    Attributes:
+        stages (dict[str, float]): Total time (in seconds) spent
+            in each stage.
+        calls (dict[str, int]): Number of file system calls by name
+            (e.g. `"listdir"`, `"stat"`, `"rename"`).
+        rename_latencies (dict[int, int]): Histogram of rename latencies.
+            Keys are upper bounds (in microseconds, powers of two),
+            values are numbers of renames faster than the bound,
+            but not faster than half of it.
+    """
+    stages: dict[str, float] = field(default_factory=dict)
+    calls: dict[str, int] = field(default_factory=dict)
+    rename_latencies: dict[int, int] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Returns the summary as a JSON-serialisable dict."""
+        return {
+            "stages": self.stages,
+            "calls": self.calls,
+            "rename_latencies_us": {
+                str(bound): count
+                for bound, count in sorted(self.rename_latencies.items())
+            }
+        }
+
+    def __str__(self) -> str:
+        lines: list[str] = ["Stages:"]
+        lines.extend(
+            f"  {stage:<8} {seconds * 1000:>10.1f} ms"
+            for stage, seconds in self.stages.items()
+        )
+        lines.append("File system calls:")
+        lines.extend(
+            f"  {call:<8} {count:>10}" for call, count in self.calls.items()
+        )
+        if self.rename_latencies:
+            lines.append("Rename latencies:")
+            lines.extend(
+                f"  < {bound:>7} us {count:>10}"
+                for bound, count in sorted(self.rename_latencies.items())
+            )
+        return "\n".join(lines)
+
+
+class Instrumentation:
+    """Collects measurements of batches. Safe to use from multiple threads.
+
+    Measurements accumulate until `take_summary` is called.
+    """
+
+    def __init__(
+            self,
+            clock: Callable[[], int] = time.perf_counter_ns
+    ) -> None:
+        self.clock: Callable[[], int] = clock
+        self._lock: threading.Lock = threading.Lock()
+        self._summary: InstrumentationSummary = InstrumentationSummary()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Add the time spent in the `with` block to the stage."""
+        start: int = self.clock()
+        try:
+            yield
+        finally:
+            elapsed: float = (self.clock() - start) / 1e9
+            with self._lock:
+                stages: dict[str, float] = self._summary.stages
+                stages[name] = stages.get(name, 0.0) + elapsed
+
+    def count(self, call: str, count: int = 1) -> None:
+        """Count a file system call."""
+        with self._lock:
+            calls: dict[str, int] = self._summary.calls
+            calls[call] = calls.get(call, 0) + count
+
+    def record_rename(self, latency_ns: int) -> None:
+        """Count a rename call and add its latency to the histogram."""
+        bound: int = 1 << (latency_ns // 1000).bit_length()
+        with self._lock:
+            calls: dict[str, int] = self._summary.calls
+            calls["rename"] = calls.get("rename", 0) + 1
+            latencies: dict[int, int] = self._summary.rename_latencies
+            latencies[bound] = latencies.get(bound, 0) + 1
+
+    def take_summary(self) -> InstrumentationSummary:
+        """Returns the measurements collected so far and starts over."""
+        with self._lock:
+            summary: InstrumentationSummary = self._summary
+            self._summary = InstrumentationSummary()
+        summary.stages = {
+            stage: summary.stages[stage]
+            for stage in sorted(
+                summary.stages,
+                key=lambda stage: (
+                    STAGES.index(stage) if stage in STAGES else len(STAGES)
+                )
+            )
+        }
+        return summary
@@ -0,0 +1,251 @@
+"""
+This module holds the write-ahead rename journal used by BatchFileRenamer.
+Before a batch starts, the whole ordered plan is written to the journal.
+Every rename is then preceded by an intent record and followed by a commit
+(or failure) record, so that a batch interrupted by a crash can be resumed
+from the journal, without planning it again nor rescanning the directory.
+
+The journal is a JSON lines file. Records are written to the operating
+system as soon as they are created, which is enough to survive a crash
+of the application. Surviving a crash of the operating system requires
+them to be also `fsync`-ed, which is done in batches of `fsync_every`
+records, trading throughput for durability.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import IO, Any
+
+
+logger = logging.getLogger(__name__)
+
+
+JOURNAL_VERSION: int = 1
+DEFAULT_FSYNC_EVERY: int = 256
+
+
+class RenameJournal:
+    """Append-only journal of a single batch of renames.
+
+    Use `RenameJournal.create` to start a new journal
+    and `RenameJournal.append` to continue an existing one.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            steps: Iterable[tuple[str, str]],
+            fsync_every: int = DEFAULT_FSYNC_EVERY
+    ) -> None:
+        """Open the journal for appending records.
+
+        Args:
+            path (str): Path to the journal file.
+            steps (Iterable[tuple[str, str]]): All renames of the plan,
+                in the order in which they were written to the journal.
+            fsync_every (int): Number of records after which the journal
+                is `fsync`-ed. With `1` every record is durable before
+                the rename it describes is executed, with `0` the journal
+                is only `fsync`-ed when closed.
+        """
+        self.path: str = path
+        self.fsync_every: int = fsync_every
+        self.step_indexes: dict[tuple[str, str], int] = {
+            step: index for index, step in enumerate(steps)
+        }
+        self._file: IO[str] = open(path, "a", encoding="utf-8")
+        self._records_since_fsync: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    @classmethod
+    def create(
+            cls,
+            path: str,
+            directory: str,
+            chains: list[list[tuple[str, str]]],
+            fsync_every: int = DEFAULT_FSYNC_EVERY
+    ) -> "RenameJournal":
+        """
+        Create a new journal with the whole plan (the chains of renames
+        as returned by `get_rename_chains`) and make it durable.
+        """
+        with open(path, "x", encoding="utf-8") as file:
+            file.write(_encode({
+                "type": "batch",
+                "version": JOURNAL_VERSION,
+                "directory": os.path.abspath(directory)
+            }))
+            for chain_index, chain in enumerate(chains):
+                for old_name, new_name in chain:
+                    file.write(_encode({
+                        "type": "step",
+                        "chain": chain_index,
+                        "old": old_name,
+                        "new": new_name
+                    }))
+            file.flush()
+            os.fsync(file.fileno())
+        return cls(
+            path,
+            (step for chain in chains for step in chain),
+            fsync_every
+        )
+
+    @classmethod
+    def append(
+            cls,
+            path: str,
+            fsync_every: int = DEFAULT_FSYNC_EVERY
+    ) -> "RenameJournal":
+        """Open an existing journal to record the rest of the batch.
+
+        A torn last record (after a crash) is cut off first,
+        so that new records start on a new line.
+        """
+        state: JournalState = read_journal(path)
+        with open(path, "rb+") as file:
+            # Records are far shorter than this, so the tail always
+            # contains the end of the last complete record
+            tail_start: int = max(0, file.seek(0, os.SEEK_END) - 65536)
+            file.seek(tail_start)
+            tail: bytes = file.read()
+            if tail and not tail.endswith(b"\n"):
+                file.truncate(tail_start + tail.rfind(b"\n") + 1)
+        return cls(
+            path,
+            (step for chain in state.chains for step in chain),
+            fsync_every
+        )
+
+    def record_intent(self, old_name: str, new_name: str) -> None:
+        """Record that the rename is about to be executed."""
+        self._record("intent", old_name, new_name)
+
+    def record_commit(self, old_name: str, new_name: str) -> None:
+        """Record that the rename was executed."""
+        self._record("commit", old_name, new_name)
+
+    def record_failure(self, old_name: str, new_name: str) -> None:
+        """Record that the rename failed or was skipped."""
+        self._record("failure", old_name, new_name)
+
+    def close(self) -> None:
+        """Make all records durable and close the journal."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def __enter__(self) -> "RenameJournal":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _record(self, record_type: str, old_name: str, new_name: str) -> None:
+        index: int = self.step_indexes[(old_name, new_name)]
+        with self._lock:
+            self._file.write(_encode({"type": record_type, "step": index}))
+            self._file.flush()
+            self._records_since_fsync += 1
+            if (
+                self.fsync_every > 0
+                and self._records_since_fsync >= self.fsync_every
+            ):
+                os.fsync(self._file.fileno())
+                self._records_since_fsync = 0
+
+
+@dataclass
+class JournalState:
+    """Contents of a journal.
+
+    Attributes:
+        directory (str): Absolute path to the directory of the batch.
+        chains (list[list[tuple[str, str]]]): Planned chains of renames.
+        committed (set[int]): Indexes of committed steps.
+        failed (set[int]): Indexes of failed or skipped steps.
+    """
+    directory: str
+    chains: list[list[tuple[str, str]]] = field(default_factory=list)
+    committed: set[int] = field(default_factory=set)
+    failed: set[int] = field(default_factory=set)
+
+
+def read_journal(path: str) -> JournalState:
+    """Read the journal. A torn last record (after a crash) is ignored."""
+    state: JournalState | None = None
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record: dict[str, Any] = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Ignoring a torn record in journal %s", path)
+                break
+            if record["type"] == "batch":
+                if record["version"] != JOURNAL_VERSION:
+                    raise ValueError(
+                        f"Unsupported journal version {record['version']}"
+                    )
+                state = JournalState(record["directory"])
+            elif state is None:
+                raise ValueError(f"File {path} is not a rename journal")
+            elif record["type"] == "step":
+                if record["chain"] == len(state.chains):
+                    state.chains.append([])
+                state.chains[-1].append((record["old"], record["new"]))
+            elif record["type"] == "commit":
+                state.committed.add(record["step"])
+            elif record["type"] == "failure":
+                state.failed.add(record["step"])
+    if state is None:
+        raise ValueError(f"File {path} is not a rename journal")
+    return state
+
+
+def get_pending_chains(state: JournalState) -> list[list[tuple[str, str]]]:
+    """Returns the renames of the batch which still have to be executed.
+
+    Steps without a commit record (e.g. lost in a crash) are checked
+    in the directory, from the end of each chain: the last step whose
+    old name is gone and new name exists was executed, and so were all
+    the steps before it. This takes at most two `lstat` calls per step
+    without a record, instead of rescanning the directory.
+    Chains with a failed step are not continued.
+    """
+    pending_chains: list[list[tuple[str, str]]] = []
+    index: int = 0
+    for chain in state.chains:
+        chain_indexes: range = range(index, index + len(chain))
+        index += len(chain)
+        if any(i in state.failed for i in chain_indexes):
+            continue
+
+        # Steps up to the last committed one are done
+        first_pending: int = 0
+        for position, i in enumerate(chain_indexes):
+            if i in state.committed:
+                first_pending = position + 1
+
+        for position in range(len(chain) - 1, first_pending - 1, -1):
+            old_name, new_name = chain[position]
+            if (
+                not os.path.lexists(os.path.join(state.directory, old_name))
+                and os.path.lexists(os.path.join(state.directory, new_name))
+            ):
+                first_pending = position + 1
+                break
+
+        if first_pending < len(chain):
+            pending_chains.append(chain[first_pending:])
+    return pending_chains
+
+
+def _encode(record: dict[str, Any]) -> str:
+    return json.dumps(record, separators=(",", ":")) + "\n"
@@ -0,0 +1,326 @@
+"""
+This module holds the metadata reader used by BatchFileRenamer
+to number files by the date they were taken on, instead of their names.
+Only the header of each file is mapped into memory (and only the pages
+actually parsed are read from the disk), so reading the capture time
+of a 50 MB video costs no more than of a small photo.
+Supported are JPEG and TIFF (including most camera raw formats) EXIF,
+PNG (eXIf and tIME chunks) and MP4 / QuickTime (`mvhd` box) headers.
+"""
+
+import mmap
+import os
+import struct
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+
+from .cancellation import CancellationToken
+from .file_cache import FILE_CACHE_SIZE, FileIdentityCache
+from .snapshot import FileInfo
+
+
+# Length of the mapped header. EXIF data can't be longer than a JPEG
+# segment (64 KB) and is almost always in the first few KB, so most
+# of the mapping is never read
+HEADER_SIZE: int = 64 * 1024
+
+# Format of dates in EXIF tags
+EXIF_DATE_FORMAT: str = "%Y:%m:%d %H:%M:%S"
+
+# EXIF tags with dates, in the order of preference
+DATE_TIME_ORIGINAL_TAG: int = 0x9003
+DATE_TIME_DIGITIZED_TAG: int = 0x9004
+DATE_TIME_TAG: int = 0x0132
+EXIF_IFD_POINTER_TAG: int = 0x8769
+
+# MP4 / QuickTime times are in seconds since this date (in UTC)
+MP4_EPOCH: datetime = datetime(1904, 1, 1)
+
+JPEG_SIGNATURE: bytes = b"\xff\xd8"
+PNG_SIGNATURE: bytes = b"\x89PNG\r\n\x1a\n"
+TIFF_SIGNATURES: tuple[bytes, bytes] = (b"II*\x00", b"MM\x00*")
+
+
+def parse_exif_date(value: bytes) -> datetime | None:
+    """
+    Returns the date from an EXIF date string, or `None` if it's
+    not a valid date (e.g. `0000:00:00 00:00:00` for an unknown one).
+    """
+    try:
+        return datetime.strptime(
+            value.split(b"\x00", 1)[0].decode("ascii").strip(),
+            EXIF_DATE_FORMAT
+        )
+    except (UnicodeDecodeError, ValueError):
+        return None
+
+
+def read_ifd(
+        data: bytes | mmap.mmap,
+        tiff_start: int,
+        ifd_offset: int,
+        byte_order: str
+) -> dict[int, tuple[int, int, int]]:
+    """
+    Returns the type, count and value (or offset of the value)
+    of every tag in the TIFF image file directory by tag.
+    """
+    tags: dict[int, tuple[int, int, int]] = {}
+    position: int = tiff_start + ifd_offset
+    (count,) = struct.unpack_from(byte_order + "H", data, position)
+    for i in range(count):
+        tag, tag_type, value_count, value = struct.unpack_from(
+            byte_order + "HHII",
+            data,
+            position + 2 + 12 * i
+        )
+        tags[tag] = (tag_type, value_count, value)
+    return tags
+
+
+def read_ascii_tag(
+        data: bytes | mmap.mmap,
+        tiff_start: int,
+        tag: tuple[int, int, int]
+) -> bytes:
+    """Returns the value of an ASCII tag (longer than 4 bytes)."""
+    _, count, offset = tag
+    start: int = tiff_start + offset
+    if count <= 4 or start + count > len(data):
+        return b""
+    return data[start:start + count]
+
+
+def parse_tiff_capture_time(
+        data: bytes | mmap.mmap,
+        tiff_start: int = 0
+) -> datetime | None:
+    """
+    Returns the capture time from TIFF structured EXIF data starting
+    at `tiff_start`: the original date, the digitization date
+    or the modification date (whichever is found first).
+    """
+    byte_order_mark: bytes = data[tiff_start:tiff_start + 2]
+    if byte_order_mark == b"II":
+        byte_order: str = "<"
+    elif byte_order_mark == b"MM":
+        byte_order = ">"
+    else:
+        return None
+    magic, ifd0_offset = struct.unpack_from(
+        byte_order + "HI",
+        data,
+        tiff_start + 2
+    )
+    if magic != 42:
+        return None
+    ifd0: dict[int, tuple[int, int, int]] = read_ifd(
+        data,
+        tiff_start,
+        ifd0_offset,
+        byte_order
+    )
+    exif_ifd: dict[int, tuple[int, int, int]] = {}
+    if EXIF_IFD_POINTER_TAG in ifd0:
+        exif_ifd = read_ifd(
+            data,
+            tiff_start,
+            ifd0[EXIF_IFD_POINTER_TAG][2],
+            byte_order
+        )
+    for ifd, tag in (
+        (exif_ifd, DATE_TIME_ORIGINAL_TAG),
+        (exif_ifd, DATE_TIME_DIGITIZED_TAG),
+        (ifd0, DATE_TIME_TAG)
+    ):
+        if tag not in ifd:
+            continue
+        capture_time: datetime | None = parse_exif_date(
+            read_ascii_tag(data, tiff_start, ifd[tag])
+        )
+        if capture_time is not None:
+            return capture_time
+    return None
+
+
+def parse_jpeg_capture_time(data: bytes | mmap.mmap) -> datetime | None:
+    """Returns the capture time from the EXIF (APP1) segment of a JPEG."""
+    position: int = len(JPEG_SIGNATURE)
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return None
+        marker: int = data[position + 1]
+        if marker == 0xFF:
+            # Fill byte
+            position += 1
+            continue
+        if marker in (0xD9, 0xDA):
+            # End of image or start of the image data
+            return None
+        (length,) = struct.unpack_from(">H", data, position + 2)
+        if marker == 0xE1 and data[position + 4:position + 10] == (
+            b"Exif\x00\x00"
+        ):
+            return parse_tiff_capture_time(data, position + 10)
+        position += 2 + length
+    return None
+
+
+def parse_png_capture_time(data: bytes | mmap.mmap) -> datetime | None:
+    """
+    Returns the capture time from the eXIf chunk of a PNG or, if it has
+    none, the modification time from its tIME chunk.
+    """
+    position: int = len(PNG_SIGNATURE)
+    modification_time: datetime | None = None
+    while position + 8 <= len(data):
+        length, chunk_type = struct.unpack_from(">I4s", data, position)
+        if chunk_type == b"eXIf":
+            capture_time: datetime | None = parse_tiff_capture_time(
+                data,
+                position + 8
+            )
+            if capture_time is not None:
+                return capture_time
+        elif chunk_type == b"tIME":
+            try:
+                modification_time = datetime(
+                    *struct.unpack_from(">HBBBBB", data, position + 8)
+                )
+            except ValueError:
+                pass
+        elif chunk_type == b"IEND":
+            break
+        # Length, type, data and CRC
+        position += 12 + length
+    return modification_time
+
+
+def parse_mp4_capture_time(data: bytes | mmap.mmap) -> datetime | None:
+    """
+    Returns the creation time (in UTC) from the `mvhd` box of an MP4
+    or QuickTime file, if its `moov` box starts within the header.
+    """
+    position: int = 0
+    end: int = len(data)
+    while position + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, position)
+        header_size: int = 8
+        if size == 1:
+            (size,) = struct.unpack_from(">Q", data, position + 8)
+            header_size = 16
+        elif size == 0:
+            size = end - position
+        if size < header_size:
+            return None
+        if box_type == b"moov":
+            # Search the boxes inside
+            end = min(end, position + size)
+            position += header_size
+            continue
+        if box_type == b"mvhd":
+            version: int = data[position + header_size]
+            if version == 1:
+                (seconds,) = struct.unpack_from(
+                    ">Q",
+                    data,
+                    position + header_size + 4
+                )
+            else:
+                (seconds,) = struct.unpack_from(
+                    ">I",
+                    data,
+                    position + header_size + 4
+                )
+            if seconds == 0:
+                return None
+            return MP4_EPOCH + timedelta(seconds=seconds)
+        position += size
+    return None
+
+
+def parse_capture_time(data: bytes | mmap.mmap) -> datetime | None:
+    """
+    Returns the capture time from the header of a file, recognized
+    by its signature, or `None` if the format isn't supported
+    or the header has no valid date.
+    """
+    try:
+        if data[:2] == JPEG_SIGNATURE:
+            return parse_jpeg_capture_time(data)
+        if data[:8] == PNG_SIGNATURE:
+            return parse_png_capture_time(data)
+        if data[:4] in TIFF_SIGNATURES:
+            return parse_tiff_capture_time(data)
+        if data[4:8] == b"ftyp":
+            return parse_mp4_capture_time(data)
+    except (struct.error, IndexError, OverflowError, ValueError):
+        # Truncated or corrupted header
+        return None
+    return None
+
+
+def read_capture_time(path: str) -> datetime | None:
+    """
+    Returns the capture time from the header of the file at `path`
+    (see `parse_capture_time`), mapping only its first `HEADER_SIZE`
+    bytes into memory. Returns `None` if the file can't be read.
+    """
+    try:
+        with open(path, "rb") as file:
+            size: int = os.fstat(file.fileno()).st_size
+            if size == 0:
+                return None
+            with mmap.mmap(
+                file.fileno(),
+                min(size, HEADER_SIZE),
+                access=mmap.ACCESS_READ
+            ) as header:
+                return parse_capture_time(header)
+    except (OSError, ValueError):
+        return None
+
+
+class MetadataCache:
+    """Capture times of files by file identity.
+
+    A file's header is read again only if the file was replaced
+    or modified (see `FileIdentityCache`), so renaming it keeps
+    its capture time. Safe to use from multiple threads.
+    """
+
+    def __init__(self, max_size: int = FILE_CACHE_SIZE) -> None:
+        self._capture_times: FileIdentityCache[datetime] = (
+            FileIdentityCache(max_size)
+        )
+
+    def get_capture_times(
+            self,
+            directory: str,
+            files: Iterable[FileInfo],
+            max_workers: int | None = None,
+            cancellation_token: CancellationToken | None = None
+    ) -> dict[str, datetime | None]:
+        """
+        Returns capture times of the files from `directory` by name.
+        Headers of files which are not cached yet are read by a pool
+        of `max_workers` threads (by default based on the number
+        of CPUs), since the time is mostly spent waiting for the disk.
+        Raises `BatchCancelled` once `cancellation_token` is cancelled.
+        """
+
+        def read(path: str) -> datetime | None:
+            if cancellation_token is not None:
+                cancellation_token.raise_if_cancelled()
+            return read_capture_time(path)
+
+        return self._capture_times.get_values(
+            directory,
+            files,
+            read,
+            max_workers
+        )
+
+    def clear(self) -> None:
+        """Forget all cached capture times."""
+        self._capture_times.clear()
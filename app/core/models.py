@@ -1,3 +1,4 @@
+from collections.abc import Iterable, Mapping
 from typing import (
     Any,
     Callable,
@@ -5,6 +6,14 @@ from typing import (
 )
 from re import Pattern
 
+from .cancellation import CancellationToken
+from .duplicates import SKIP_DUPLICATES
+from .instrumentation import Instrumentation
+from .journal import DEFAULT_FSYNC_EVERY
+from .report import BatchReport
+from .snapshot import DirectorySnapshot, ExtensionStats
+from .sorting import SortOrder
+
 
 class IRenamer(Protocol):
     """Protocol class for a file renamer used by the application.
@@ -15,12 +24,36 @@ class IRenamer(Protocol):
     Provides a blueprint for creating other file renamers
     to be used plug&play in the GUI app.
     """
-    def __init__(self, pattern: str) -> None:
+    undo_log_dir: str | None
+    instrumentation: Instrumentation | None
+    last_undo_log_path: str | None
+
+    def __init__(
+            self,
+            pattern: str,
+            undo_log_dir: str | None = None,
+            instrumentation: Instrumentation | None = None
+    ) -> None:
+        ...
+
+    def get_directory_snapshot(self, path: str) -> DirectorySnapshot:
+        ...
+
+    def scan_directory(
+            self,
+            path: str,
+            progress_callback: "ISignal | None" = None,
+            partial_result_callback: "ISignal | None" = None,
+            cancellation_token: CancellationToken | None = None
+    ) -> DirectorySnapshot | None:
         ...
 
     def get_all_file_extensions(self, path: str) -> set[str]:
         ...
 
+    def get_extension_stats(self, path: str) -> dict[str, ExtensionStats]:
+        ...
+
     def filter_directories(self, path: str) -> list[str]:
         ...
 
@@ -34,7 +67,7 @@ class IRenamer(Protocol):
     def validate_new_name(
             self,
             new_name: str,
-            pattern: Pattern | None = None
+            pattern: Pattern | str | None = None
     ) -> bool:
         ...
 
@@ -42,15 +75,66 @@ class IRenamer(Protocol):
             self,
             files_to_rename: list[str],
             new_batch_name: str,
-            number_padding: int = 3
+            number_padding: int = 3,
+            sort_key: Callable[[str], Any] | None = None,
+            duplicates: Mapping[str, str] | None = None,
+            duplicate_action: str = SKIP_DUPLICATES
     ) -> dict[str, str]:
         ...
 
+    def get_directory_renaming_map(
+            self,
+            directory: str,
+            files_to_rename: list[str],
+            new_batch_name: str,
+            number_padding: int = 3,
+            sort_order: SortOrder | None = None,
+            duplicate_action: str | None = None,
+            cancellation_token: CancellationToken | None = None
+    ) -> dict[str, str]:
+        ...
+
+    def find_duplicates(
+            self,
+            directory: str,
+            sorted_files: Iterable[str],
+            cancellation_token: CancellationToken | None = None
+    ) -> dict[str, str]:
+        ...
+
+    def get_sort_key(
+            self,
+            directory: str,
+            files: Iterable[str],
+            sort_order: SortOrder | None,
+            cancellation_token: CancellationToken | None = None
+    ) -> Callable[[str], Any] | None:
+        ...
+
     def rename_files(
             self,
             directory: str,
-            files_map: dict[str, str]
-    ) -> None:
+            files_to_rename: list[str],
+            new_batch_name: str,
+            progress_callback: "ISignal",
+            number_padding: int = 3,
+            parallelism: int = 1,
+            journal_path: str | None = None,
+            fsync_every: int = DEFAULT_FSYNC_EVERY,
+            cancellation_token: CancellationToken | None = None,
+            sort_order: SortOrder | None = None,
+            duplicate_action: str | None = None
+    ) -> BatchReport:
+        ...
+
+    def undo_renaming(
+            self,
+            undo_log_path: str,
+            progress_callback: "ISignal | None" = None,
+            parallelism: int = 1,
+            step_callback: Callable[[str, str, bool], None] | None = None,
+            cancellation_token: CancellationToken | None = None
+    ) -> BatchReport:
         ...
 
 
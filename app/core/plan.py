@@ -0,0 +1,178 @@
+"""
+This module holds the plan files used by BatchFileRenamer.
+A plan file stores the ordered renames of a batch (including temporary
+names breaking cycles, see `get_rename_chains`), so that a batch can be
+planned in advance and applied later, without planning it again.
+
+A plan file is a JSON lines file: a header record with the directory,
+followed by one record per rename, in the order of execution.
+Records are written and read one by one, so plans of any size
+can be streamed.
+"""
+
+import json
+import os
+from collections.abc import Collection, Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+from typing import IO, Any, NamedTuple
+
+
+PLAN_VERSION: int = 1
+
+
+class PlanStep(NamedTuple):
+    """A single rename of a plan.
+
+    Attributes:
+        chain (int): Index of the chain to which the rename belongs.
+        old_name (str): Name of the file before the rename.
+        new_name (str): Name of the file after the rename.
+        inode (int): Inode of the file when the plan was made,
+            `0` if unknown (e.g. for temporary names).
+    """
+    chain: int
+    old_name: str
+    new_name: str
+    inode: int = 0
+
+
+@dataclass
+class Plan:
+    """Contents of a plan file.
+
+    Attributes:
+        directory (str): Absolute path to the directory of the batch.
+        steps (list[PlanStep]): All renames, in the order of execution.
+    """
+    directory: str
+    steps: list[PlanStep] = field(default_factory=list)
+
+    @property
+    def chains(self) -> list[list[tuple[str, str]]]:
+        """Renames grouped into chains, as returned by `get_rename_chains`."""
+        chains: list[list[tuple[str, str]]] = []
+        for step in self.steps:
+            if step.chain == len(chains):
+                chains.append([])
+            chains[-1].append((step.old_name, step.new_name))
+        return chains
+
+
+def write_plan(
+        path: str,
+        directory: str,
+        chains: Iterable[Iterable[tuple[str, str]]],
+        inodes: Mapping[str, int] | None = None
+) -> int:
+    """Write the chains of renames to a new plan file.
+
+    Args:
+        path (str): Path to the new plan file.
+        directory (str): Path to the directory of the batch.
+        chains (Iterable[Iterable[tuple[str, str]]]): Chains of renames,
+            as returned by `get_rename_chains`.
+        inodes (Mapping[str, int] | None): Inodes of files
+            in the directory, checked before the plan is applied.
+
+    Returns the number of written renames.
+    """
+    count: int = 0
+    with open(path, "x", encoding="utf-8") as file:
+        file.write(_encode({
+            "type": "plan",
+            "version": PLAN_VERSION,
+            "directory": os.path.abspath(directory)
+        }))
+        for chain_index, chain in enumerate(chains):
+            for old_name, new_name in chain:
+                record: dict[str, Any] = {
+                    "chain": chain_index,
+                    "old": old_name,
+                    "new": new_name
+                }
+                if inodes is not None and inodes.get(old_name):
+                    record["inode"] = inodes[old_name]
+                file.write(_encode(record))
+                count += 1
+    return count
+
+
+def read_plan(path: str) -> Plan:
+    """Read the whole plan file."""
+    with open(path, encoding="utf-8") as file:
+        return Plan(_read_header(file, path), list(_iter_steps(file)))
+
+
+def iter_plan_steps(path: str) -> Iterator[PlanStep]:
+    """
+    Streaming version of `read_plan`, which yields the renames
+    of the plan one by one.
+    """
+    with open(path, encoding="utf-8") as file:
+        _read_header(file, path)
+        yield from _iter_steps(file)
+
+
+def check_plan(
+        plan: Plan,
+        names: Collection[str],
+        inodes: Mapping[str, int]
+) -> list[str]:
+    """Check whether the plan can still be applied to the directory.
+
+    Every file to be renamed has to exist (and, if its inode was recorded,
+    be the same file) and no rename can overwrite an existing file,
+    unless that file is renamed earlier by the plan.
+
+    Args:
+        plan (Plan): The plan to check.
+        names (Collection[str]): Names currently present in the directory.
+        inodes (Mapping[str, int]): Inodes of the entries in the directory.
+
+    Returns descriptions of all problems found (empty if there are none).
+    """
+    problems: list[str] = []
+    sources: set[str] = set()
+    created: set[str] = set()
+    for step in plan.steps:
+        if step.old_name not in created:
+            sources.add(step.old_name)
+            if step.old_name not in names:
+                problems.append(f"File {step.old_name} does not exist")
+            elif step.inode and inodes.get(step.old_name, 0) != step.inode:
+                problems.append(
+                    f"File {step.old_name} was replaced by another file"
+                )
+        created.add(step.new_name)
+    for step in plan.steps:
+        if step.new_name in names and step.new_name not in sources:
+            problems.append(f"File {step.new_name} already exists")
+    return problems
+
+
+def _read_header(file: IO[str], path: str) -> str:
+    """Read the header record and return the directory of the batch."""
+    try:
+        header: dict[str, Any] = json.loads(file.readline())
+    except json.JSONDecodeError:
+        header = {}
+    if not isinstance(header, dict) or header.get("type") != "plan":
+        raise ValueError(f"File {path} is not a plan file")
+    if header["version"] != PLAN_VERSION:
+        raise ValueError(f"Unsupported plan version {header['version']}")
+    return header["directory"]
+
+
+def _iter_steps(file: IO[str]) -> Iterator[PlanStep]:
+    for line in file:
+        record: dict[str, Any] = json.loads(line)
+        yield PlanStep(
+            chain=record["chain"],
+            old_name=record["old"],
+            new_name=record["new"],
+            inode=record.get("inode", 0)
+        )
+
+
+def _encode(record: dict[str, Any]) -> str:
+    return json.dumps(record, separators=(",", ":")) + "\n"
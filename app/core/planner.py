@@ -0,0 +1,118 @@
+"""
+This module holds the rename ordering used by BatchFileRenamer.
+A renaming map may contain files which have to be renamed to a name
+currently taken by another file from the same map (chains, e.g.
+a -> b -> c) or even form cycles (e.g. a -> b -> a). Executing
+such a map in an arbitrary order would make some renames fail,
+so the renames are ordered topologically instead, with every cycle
+broken by renaming one of its files to a temporary name.
+"""
+
+from collections.abc import Collection
+from typing import NamedTuple
+
+
+TEMPORARY_NAME_PREFIX: str = ".batch-file-renamer-tmp-"
+
+
+class RenameStep(NamedTuple):
+    """Single rename to be executed."""
+    old_name: str
+    new_name: str
+
+
+def get_temporary_name(taken_names: Collection[str], old_name: str) -> str:
+    """
+    Returns a temporary name for `old_name`,
+    which is not present in `taken_names`.
+    """
+    index: int = 0
+    while True:
+        temporary_name: str = f"{TEMPORARY_NAME_PREFIX}{index}-{old_name}"
+        if temporary_name not in taken_names:
+            return temporary_name
+        index += 1
+
+
+def get_rename_chains(
+        files_map: dict[str, str],
+        existing_names: Collection[str] = ()
+) -> list[list[RenameStep]]:
+    """Split the renaming map into independent, ordered chains of renames.
+
+    Within a chain, every rename frees the name needed by the next one.
+    No chain renames a file to a name taken by a file from another chain,
+    so chains can be executed in any order. Files mapped to their
+    current name are left out.
+
+    Each cycle is broken with one temporary name (one additional rename),
+    which is guaranteed not to be in `files_map` nor `existing_names`.
+
+    Raises `ValueError` if two files are to be renamed to the same name.
+    """
+    targets: dict[str, str] = {}
+    for old_name, new_name in files_map.items():
+        if new_name in targets:
+            raise ValueError(
+                f"Files {targets[new_name]} and {old_name} are both to be "
+                f"renamed to {new_name}. Files map is likely incorrect."
+            )
+        targets[new_name] = old_name
+
+    chains: list[list[RenameStep]] = []
+    visited: set[str] = set()
+
+    # Paths start with files whose names are not needed by any other file.
+    # Walk each path forward and execute it backwards, from its end.
+    for head in files_map:
+        if head in targets or files_map[head] == head:
+            continue
+        path: list[str] = [head]
+        while path[-1] in files_map:
+            visited.add(path[-1])
+            path.append(files_map[path[-1]])
+        chains.append([
+            RenameStep(path[i], path[i + 1])
+            for i in range(len(path) - 2, -1, -1)
+        ])
+
+    # Every file not visited yet belongs to a cycle.
+    # Move the first file out of the way, rename the rest of the cycle
+    # backwards and move the first file to its target at the end.
+    taken_names: set[str] | None = None
+    for start in files_map:
+        if start in visited or files_map[start] == start:
+            continue
+        if taken_names is None:
+            taken_names = set(existing_names) | set(files_map) | set(targets)
+        cycle: list[str] = [start]
+        visited.add(start)
+        while files_map[cycle[-1]] != start:
+            cycle.append(files_map[cycle[-1]])
+            visited.add(cycle[-1])
+        temporary_name: str = get_temporary_name(taken_names, start)
+        taken_names.add(temporary_name)
+        chain: list[RenameStep] = [RenameStep(start, temporary_name)]
+        chain.extend(
+            RenameStep(cycle[i], files_map[cycle[i]])
+            for i in range(len(cycle) - 1, 0, -1)
+        )
+        chain.append(RenameStep(temporary_name, files_map[start]))
+        chains.append(chain)
+
+    return chains
+
+
+def order_renames(
+        files_map: dict[str, str],
+        existing_names: Collection[str] = ()
+) -> list[RenameStep]:
+    """
+    Returns renames from the renaming map in an order in which
+    they can be executed one by one. See `get_rename_chains`.
+    """
+    return [
+        step
+        for chain in get_rename_chains(files_map, existing_names)
+        for step in chain
+    ]
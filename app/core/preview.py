@@ -0,0 +1,74 @@
+"""
+This module holds the renaming preview used by BatchFileRenamer.
+A preview plans the renaming of a fixed list of files again and again,
+with the new name and padding typed by the user, so the work which
+doesn't depend on them (sorting the files and finding the ones which
+could already have a matching name) is done only once.
+"""
+
+import re
+from collections.abc import Callable, Iterator, Mapping
+from re import Pattern
+from typing import Any
+
+from .duplicates import SKIP_DUPLICATES
+from .renamer import Renamer
+
+
+# Names matching `<new name>_<number>[.<extension>]` (for any new name
+# and a padding of at least 1) always contain this
+NUMBERED_NAME_PATTERN: Pattern = re.compile(r"_\d")
+
+
+class RenamingPreview:
+    """Renaming plans of a fixed list of files.
+
+    Attributes:
+        sorted_files (list[str]): Files to rename, sorted the same way
+            as by `Renamer.get_renaming_map` (with the same `sort_key`).
+        numbered_files (list[str]): Those of `sorted_files` which could
+            already have a name matching a new name (so they're the only
+            ones checked when the new name changes).
+        duplicates (Mapping[str, str] | None): Files identical to another
+            one by the name of that one, which don't take up numbers
+            (see `Renamer.find_duplicates`).
+        duplicate_action (str): What happens to `duplicates`
+            (see `Renamer.get_renaming_map`).
+    """
+
+    def __init__(
+            self,
+            renamer: Renamer,
+            files_to_rename: list[str],
+            sort_key: Callable[[str], Any] | None = None,
+            duplicates: Mapping[str, str] | None = None,
+            duplicate_action: str = SKIP_DUPLICATES
+    ) -> None:
+        self.renamer: Renamer = renamer
+        self.sorted_files: list[str] = sorted(files_to_rename, key=sort_key)
+        self.duplicates: Mapping[str, str] | None = duplicates
+        self.duplicate_action: str = duplicate_action
+        self.numbered_files: list[str] = [
+            file for file in self.sorted_files
+            if NUMBERED_NAME_PATTERN.search(file)
+        ]
+
+    def iter_plan(
+            self,
+            new_batch_name: str,
+            number_padding: int
+    ) -> Iterator[tuple[str, str]]:
+        """
+        Returns an iterator of old and new file names, the same as
+        `Renamer.get_renaming_map` would map them. Files which already
+        have a matching name are found right away, new names are
+        assigned lazily, as the iterator is consumed.
+        """
+        return self.renamer.iter_renaming_plan(
+            self.sorted_files,
+            new_batch_name,
+            number_padding,
+            self.numbered_files if number_padding >= 1 else None,
+            self.duplicates,
+            self.duplicate_action
+        )
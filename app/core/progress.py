@@ -0,0 +1,86 @@
+"""
+This module holds the progress reporting used by BatchFileRenamer.
+Emitting a Qt signal for every renamed file floods the GUI event loop
+on large batches, so progress is only emitted when both enough time
+has passed and the percentage changed enough since the last emission.
+"""
+
+import threading
+import time
+from collections.abc import Callable
+
+from .models import ISignal
+
+
+# At most 20 emissions per second
+DEFAULT_MIN_INTERVAL: float = 0.05
+DEFAULT_MIN_PERCENT_DELTA: float = 1.0
+
+
+class ThrottledProgress:
+    """Rate-limited wrapper around a progress signal.
+
+    The signal is emitted with the percentage of done items (0-100).
+    The final 100% is always emitted by `finish`.
+    Items can be reported as done from multiple threads with `advance`.
+    """
+
+    def __init__(
+            self,
+            progress_callback: ISignal,
+            total: int,
+            min_interval: float = DEFAULT_MIN_INTERVAL,
+            min_percent_delta: float = DEFAULT_MIN_PERCENT_DELTA,
+            clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        """Initialise the progress.
+
+        Args:
+            progress_callback (ISignal): Signal to emit the percentage with.
+            total (int): Number of items to be processed.
+            min_interval (float): Minimum time (in seconds)
+                between two emissions.
+            min_percent_delta (float): Minimum change of the percentage
+                between two emissions.
+            clock (Callable[[], float]): Source of time, in seconds.
+        """
+        self.progress_callback: ISignal = progress_callback
+        self.total: int = total
+        self.min_interval: float = min_interval
+        self.min_percent_delta: float = min_percent_delta
+        self.clock: Callable[[], float] = clock
+        self.last_percent: float | None = None
+        self.last_emitted_at: float = float("-inf")
+        self.done: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    def advance(self, count: int = 1) -> None:
+        """Report that `count` more items were processed. Thread-safe."""
+        with self._lock:
+            self.done += count
+            self.update(self.done)
+
+    def update(self, done: int) -> None:
+        """Report that `done` items out of `total` were processed."""
+        if self.total <= 0:
+            return
+        percent: float = min(done / self.total * 100, 100.0)
+        if (
+            self.last_percent is not None
+            and percent - self.last_percent < self.min_percent_delta
+        ):
+            return
+        now: float = self.clock()
+        if now - self.last_emitted_at < self.min_interval:
+            return
+        self._emit(percent, now)
+
+    def finish(self) -> None:
+        """Emit 100%, unless it was already emitted."""
+        if self.last_percent != 100.0:
+            self._emit(100.0, self.clock())
+
+    def _emit(self, percent: float, now: float) -> None:
+        self.last_percent = percent
+        self.last_emitted_at = now
+        self.progress_callback.emit(percent)
@@ -0,0 +1,70 @@
+"""
+This module holds the rate-limited logging used by BatchFileRenamer
+for records emitted once per file. With millions of files, formatting
+and writing a record for every rename costs more than the rename itself,
+so only the first few records in every second are emitted and the rest
+is counted and reported in a single record.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+
+
+DEFAULT_RECORDS_PER_SECOND: int = 100
+
+
+class RateLimitedLog:
+    """Emits at most `records_per_second` records of one kind per second.
+
+    Records are formatted lazily (%-style arguments), and only if they
+    are emitted, so suppressed records cost a single counter increment.
+    Safe to use from multiple threads.
+    """
+
+    def __init__(
+            self,
+            logger: logging.Logger,
+            level: int,
+            records_per_second: int = DEFAULT_RECORDS_PER_SECOND,
+            clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.logger: logging.Logger = logger
+        self.level: int = level
+        self.records_per_second: int = records_per_second
+        self.clock: Callable[[], float] = clock
+        self._lock: threading.Lock = threading.Lock()
+        self._window_start: float = clock()
+        self._emitted: int = 0
+        self._suppressed: int = 0
+
+    def log(self, message: str, *args: object) -> None:
+        """Emit the record, unless the limit has been reached."""
+        if not self.logger.isEnabledFor(self.level):
+            return
+        with self._lock:
+            now: float = self.clock()
+            if now - self._window_start >= 1.0:
+                self._report_suppressed()
+                self._window_start = now
+                self._emitted = 0
+            if self._emitted >= self.records_per_second:
+                self._suppressed += 1
+                return
+            self._emitted += 1
+        self.logger.log(self.level, message, *args)
+
+    def flush(self) -> None:
+        """Report the records suppressed since the last report, if any."""
+        with self._lock:
+            self._report_suppressed()
+
+    def _report_suppressed(self) -> None:
+        if self._suppressed:
+            self.logger.log(
+                self.level,
+                "%d similar records suppressed",
+                self._suppressed
+            )
+            self._suppressed = 0
@@ -0,0 +1,244 @@
+"""
+This module holds the recursive renaming used by BatchFileRenamer.
+Every directory in a tree is treated as an independent job, with its own
+numbering, and jobs are spread across a pool of processes, so that
+scanning, planning and renaming of many directories happen in parallel.
+"""
+
+import logging
+import multiprocessing
+import os
+from collections.abc import Callable, Collection, Iterator
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    wait
+)
+from dataclasses import dataclass, field
+
+from .cancellation import CancellationToken
+from .models import ISignal
+from .progress import ThrottledProgress
+from .renamer import Renamer
+from .sorting import NAME_ORDER, SORT_ORDERS
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DirectoryResult:
+    """Result of renaming files in a single directory.
+
+    Attributes:
+        directory (str): Path to the directory.
+        renames (list[tuple[str, str, str]]): Old name, new name and status
+            (`"planned"`, `"renamed"` or `"failed"`) of every rename.
+        error (str | None): Description of the error which stopped
+            the directory from being processed, if any.
+        undo_log_path (str | None): Path to the undo log of the directory's
+            batch, if undo logs are enabled and any file was renamed.
+    """
+    directory: str
+    renames: list[tuple[str, str, str]] = field(default_factory=list)
+    error: str | None = None
+    undo_log_path: str | None = None
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None or any(
+            status == "failed" for _, _, status in self.renames
+        )
+
+
+def iter_directories(root: str) -> Iterator[str]:
+    """Yields `root` and all its subdirectories (without following links)."""
+    for directory, _, _ in os.walk(root):
+        yield directory
+
+
+def configure_worker_logging(level: int, add_handler: bool) -> None:
+    """Initialise logging in a process of the `rename_tree` pool.
+
+    Processes started with the "spawn" method don't inherit the logging
+    configuration, so the level of the application's logger is set again
+    and, only if the parent process had configured logging, a handler
+    is added, leaving the cost of logging up to the embedding application.
+    """
+    logging.getLogger("app").setLevel(level)
+    if add_handler:
+        logging.basicConfig()
+
+
+def rename_directory(
+        directory: str,
+        extensions: Collection[str] | None,
+        new_batch_name: str,
+        number_padding: int | None = None,
+        dry_run: bool = False,
+        sort_order_name: str = NAME_ORDER.name,
+        duplicate_action: str | None = None,
+        undo_log_dir: str | None = None
+) -> DirectoryResult:
+    """Rename files in a single directory, as a job of `rename_tree`.
+
+    Args:
+        directory (str): Path to the directory.
+        extensions (Collection[str] | None): Only files with one of these
+            extensions are renamed. All files are renamed if `None`.
+        new_batch_name (str): New name to be applied
+            to all files being renamed.
+        number_padding (int | None): The minimum number of the numeric
+            suffix length. If `None`, it's based on the number of entries
+            in the directory.
+        dry_run (bool): Only plan the renames, without renaming anything.
+        sort_order_name (str): Name of the order in which files
+            are numbered (one of `SORT_ORDERS`). Orders are passed
+            by name, since their keys can't be sent to another process.
+        duplicate_action (str | None): What to do with files identical
+            to another one in the directory: `"skip"` or `"suffix"`
+            (see `Renamer.get_renaming_map`). If `None`, they are
+            numbered as any other file.
+        undo_log_dir (str | None): If provided, the directory's batch
+            is recorded in a new undo log in this directory
+            (see `Renamer.undo_renaming`).
+    """
+    result: DirectoryResult = DirectoryResult(directory)
+    renamer: Renamer = Renamer(undo_log_dir=undo_log_dir)
+    try:
+        if number_padding is None:
+            number_padding = len(str(len(
+                renamer.get_directory_snapshot(directory).names
+            )))
+        files_to_rename: list[str] = renamer.filter_directories(directory)
+        if extensions is not None:
+            files_to_rename = renamer.filter_extensions(
+                files_to_rename,
+                extensions
+            )
+        files_map: dict[str, str] = renamer.get_directory_renaming_map(
+            directory,
+            files_to_rename,
+            new_batch_name,
+            number_padding,
+            SORT_ORDERS[sort_order_name],
+            duplicate_action
+        )
+        if dry_run:
+            result.renames = [
+                (old_name, new_name, "planned")
+                for old_name, new_name in files_map.items()
+            ]
+            return result
+        renamer.rename_files_from_file_map(
+            directory,
+            files_map,
+            step_callback=lambda old_name, new_name, renamed: (
+                result.renames.append(
+                    (old_name, new_name, "renamed" if renamed else "failed")
+                )
+            )
+        )
+        result.undo_log_path = renamer.last_undo_log_path
+    except (OSError, ValueError) as e:
+        result.error = f"{type(e).__name__}: {str(e)}"
+    return result
+
+
+def rename_tree(
+        root: str,
+        extensions: Collection[str] | None,
+        new_batch_name: str,
+        progress_callback: ISignal,
+        number_padding: int | None = None,
+        max_workers: int | None = None,
+        dry_run: bool = False,
+        result_callback: Callable[[DirectoryResult], None] | None = None,
+        sort_order_name: str = NAME_ORDER.name,
+        duplicate_action: str | None = None,
+        undo_log_dir: str | None = None,
+        cancellation_token: CancellationToken | None = None
+) -> list[DirectoryResult]:
+    """Rename files in `root` and all its subdirectories.
+
+    Every directory is numbered independently (see `rename_directory`
+    for the arguments). Directories are processed by a pool
+    of `max_workers` processes (by default one per CPU).
+    Processes are started with the "spawn" method, which is safe
+    to use from a multithreaded (e.g. Qt) application, and inherit
+    the level of the application's logger (see `configure_worker_logging`).
+    If `undo_log_dir` is provided, the batch of every directory is recorded
+    in its own undo log (see `DirectoryResult.undo_log_path`).
+
+    `progress_callback` is emitted with the percentage of processed
+    directories and `result_callback` (if provided) is called
+    with the result of each directory as soon as it's processed.
+    Returns the results of all directories, in the order of processing.
+
+    Directories are handed to the pool only a few at a time, so that
+    the batch can be paused or cancelled with `cancellation_token`
+    between directories (a token can't be sent to another process).
+    Directories which are already being processed are finished.
+    """
+    directories: list[str] = list(iter_directories(root))
+    progress: ThrottledProgress = ThrottledProgress(
+        progress_callback,
+        total=len(directories)
+    )
+    results: list[DirectoryResult] = []
+    # Enough directories for every process to start the next one
+    # right away, but few enough to stop soon after cancelling
+    max_pending: int = 2 * (max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=configure_worker_logging,
+        initargs=(
+            logging.getLogger("app").getEffectiveLevel(),
+            logging.getLogger().hasHandlers()
+        )
+    ) as pool:
+        remaining: Iterator[str] = iter(directories)
+        pending: set[Future[DirectoryResult]] = set()
+        cancelled: bool = False
+        while True:
+            while len(pending) < max_pending and not cancelled:
+                directory: str | None = next(remaining, None)
+                if directory is None:
+                    break
+                if (
+                    cancellation_token is not None
+                    and cancellation_token.should_stop()
+                ):
+                    cancelled = True
+                    break
+                pending.add(pool.submit(
+                    rename_directory,
+                    directory,
+                    extensions,
+                    new_batch_name,
+                    number_padding,
+                    dry_run,
+                    sort_order_name,
+                    duplicate_action,
+                    undo_log_dir
+                ))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result: DirectoryResult = future.result()
+                results.append(result)
+                if result_callback is not None:
+                    result_callback(result)
+                progress.advance()
+    if cancelled:
+        logger.info(
+            "Recursive batch in %s cancelled, %d directories not processed",
+            root,
+            len(directories) - len(results)
+        )
+    else:
+        progress.finish()
+    return results
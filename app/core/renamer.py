@@ -6,56 +6,454 @@ and actual renaming logic.
 
 import logging
 import os
-import re
-from collections.abc import Callable
-from re import Pattern
+import threading
 import time
+from collections.abc import (
+    Callable,
+    Collection,
+    Iterable,
+    Iterator,
+    Mapping
+)
+from contextlib import AbstractContextManager, nullcontext
+from datetime import datetime
+from re import Pattern
+from typing import Any
 
+from .cancellation import BatchCancelled, CancellationToken
+from .duplicates import (
+    SKIP_DUPLICATES,
+    DuplicateFinder,
+    iter_plan_with_duplicates
+)
+from .executor import RenameExecutor, lstat_entry, open_directory
+from .instrumentation import Instrumentation
+from .journal import (
+    DEFAULT_FSYNC_EVERY,
+    JournalState,
+    RenameJournal,
+    get_pending_chains,
+    read_journal
+)
+from .metadata import MetadataCache
 from .models import ISignal
+from .plan import Plan, check_plan, read_plan, write_plan
+from .planner import RenameStep, get_rename_chains
+from .progress import ThrottledProgress
+from .rate_limited_log import RateLimitedLog
+from .report import BatchReport
+from .snapshot import (
+    DirectorySnapshot,
+    ExtensionStats,
+    FileInfo,
+    SnapshotEntry,
+    get_extension_stats,
+    merge_extension_stats
+)
+from .sorting import NAME_ORDER, SortKeyCache, SortOrder
+from .template import NameTemplate, get_name_template, get_validation_pattern
+from .undo import UndoLog, UndoLogRecorder, read_undo_log
 
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG)
 
 
 # Letter, digits, -, _ and spaces
 DEFAULT_ALLOWED_PATTERN = r"^[a-zA-Z0-9-_ ]+$"
 
+# Minimum time (in seconds) between partial results of a scan
+PARTIAL_RESULT_INTERVAL: float = 0.1
+
+
+class _ScanCancelled(Exception):
+    """Raised from a scan's batch callback to stop a cancelled scan."""
+
+
+def log_batch_summary(
+        directory: str,
+        renamed: int,
+        failed: int,
+        elapsed: float
+) -> None:
+    """Log a single record summarising a batch of renames."""
+    logger.info(
+        "Renamed %d files in %s in %.3f s (%d failed)",
+        renamed,
+        directory,
+        elapsed,
+        failed
+    )
+
 
 class Renamer:
-    def __init__(self, pattern: str = DEFAULT_ALLOWED_PATTERN) -> None:
-        self.pattern: Pattern = re.compile(pattern)
+    def __init__(
+            self,
+            pattern: str = DEFAULT_ALLOWED_PATTERN,
+            undo_log_dir: str | None = None,
+            instrumentation: Instrumentation | None = None
+    ) -> None:
+        """
+        If `undo_log_dir` is provided, every batch renamed by
+        `rename_files_from_file_map` (and so `rename_files`) is recorded
+        in a new undo log in that directory (see `undo_renaming`).
+
+        If `instrumentation` is provided, durations of all stages,
+        file system calls and rename latencies are recorded in it.
+        """
+        self.pattern: Pattern = get_validation_pattern(pattern)
+        self.undo_log_dir: str | None = undo_log_dir
+        self.instrumentation: Instrumentation | None = instrumentation
+        self.last_undo_log_path: str | None = None
+        self._snapshots: dict[str, DirectorySnapshot] = {}
+        self._sort_keys: SortKeyCache = SortKeyCache()
+        self._metadata: MetadataCache = MetadataCache()
+        self._duplicates: DuplicateFinder = DuplicateFinder()
+
+    def get_directory_snapshot(self, path: str) -> DirectorySnapshot:
+        """
+        Returns a snapshot of the directory, scanning it only if
+        it was not scanned before or has changed since the last scan.
+        """
+        key: str = os.path.abspath(path)
+        with self._stage("scan"):
+            snapshot: DirectorySnapshot | None = self._snapshots.get(key)
+            if snapshot is None or snapshot.is_stale():
+                self._count("listdir")
+                snapshot = DirectorySnapshot.scan(key, stat=self._stat)
+                self._snapshots[key] = snapshot
+        return snapshot
+
+    def scan_directory(
+            self,
+            path: str,
+            progress_callback: ISignal | None = None,
+            partial_result_callback: ISignal | None = None,
+            cancellation_token: CancellationToken | None = None
+    ) -> DirectorySnapshot | None:
+        """Scan the directory in the background, reporting partial results.
+
+        Same as `get_directory_snapshot` (the directory is only scanned
+        if its snapshot is not up to date), but sizes of files are taken
+        during the scan, so that extension stats of a long scan can be shown
+        while it's running:
+        `partial_result_callback` is emitted with the extension stats
+        (see `get_extension_stats`) of files scanned since the previous
+        emission, at most every `PARTIAL_RESULT_INTERVAL` seconds,
+        and `progress_callback` with the number of scanned entries.
+
+        Returns the snapshot, or `None` if the scan was cancelled
+        with `cancellation_token`.
+        """
+        key: str = os.path.abspath(path)
+        with self._stage("scan"):
+            snapshot: DirectorySnapshot | None = self._snapshots.get(key)
+            if snapshot is not None:
+                if not snapshot.is_stale():
+                    if partial_result_callback is not None:
+                        partial_result_callback.emit(
+                            dict(snapshot.extension_stats)
+                        )
+                    return snapshot
+
+            pending_stats: dict[str, ExtensionStats] = {}
+            scanned: int = 0
+            last_emitted_at: float = float("-inf")
+
+            def emit_pending() -> None:
+                nonlocal last_emitted_at
+                if partial_result_callback is not None and pending_stats:
+                    partial_result_callback.emit(dict(pending_stats))
+                    pending_stats.clear()
+                if progress_callback is not None:
+                    progress_callback.emit(scanned)
+                last_emitted_at = time.monotonic()
+
+            def report_batch(entries: list[SnapshotEntry]) -> None:
+                nonlocal scanned
+                if (
+                    cancellation_token is not None
+                    and cancellation_token.should_stop()
+                ):
+                    raise _ScanCancelled
+                merge_extension_stats(
+                    pending_stats,
+                    get_extension_stats(key, entries, self._stat)
+                )
+                scanned += len(entries)
+                if (
+                    time.monotonic() - last_emitted_at
+                    >= PARTIAL_RESULT_INTERVAL
+                ):
+                    emit_pending()
+
+            self._count("listdir")
+            try:
+                snapshot = DirectorySnapshot.scan(
+                    key,
+                    take_sizes=True,
+                    batch_callback=report_batch,
+                    stat=self._stat
+                )
+            except _ScanCancelled:
+                return None
+            emit_pending()
+            self._snapshots[key] = snapshot
+        return snapshot
 
     def get_all_file_extensions(self, path: str) -> set[str]:
-        file_list: list[str] = self.filter_directories(path)
-        extensions: list[str] = []
-        for file in file_list:
-            old_name, extension = os.path.splitext(file)
-            extensions.append(extension)
-        return set(extensions)
+        snapshot: DirectorySnapshot = self.get_directory_snapshot(path)
+        with self._stage("filter"):
+            return set(snapshot.extensions)
+
+    def get_extension_stats(self, path: str) -> dict[str, ExtensionStats]:
+        """
+        Returns the number and total size of files by extension,
+        from the same scan as `get_all_file_extensions`.
+        """
+        snapshot: DirectorySnapshot = self.get_directory_snapshot(path)
+        with self._stage("filter"):
+            return dict(snapshot.extension_stats)
 
     def filter_directories(
         self,
         path: str
     ) -> list[str]:
-        file_list: list[str] = os.listdir(path)
-        filtered_list: list[str] = [
-            file for file in file_list
-            if not os.path.isdir(os.path.join(path, file))
-        ]
-        return filtered_list
+        snapshot: DirectorySnapshot = self.get_directory_snapshot(path)
+        with self._stage("filter"):
+            return list(snapshot.file_names)
 
     def filter_extensions(
         self,
         file_list: list[str],
-        extensions: list[str]
+        extensions: Collection[str]
     ) -> list[str]:
-        corrected_file_list: list[str] = []
-        for file in file_list:
-            old_name, extension = os.path.splitext(file)
-            if extension in extensions:
-                corrected_file_list.append(file)
-        return corrected_file_list
+        with self._stage("filter"):
+            return list(
+                self.iter_files_with_extensions(file_list, extensions)
+            )
+
+    def get_sort_key(
+            self,
+            directory: str,
+            files: Iterable[str],
+            sort_order: SortOrder | None,
+            cancellation_token: CancellationToken | None = None
+    ) -> Callable[[str], Any] | None:
+        """
+        Returns a function returning the sort key of each of the files
+        from `directory` in the `sort_order`, to be passed
+        to `get_renaming_map`. Keys are computed at once and cached
+        by file identity (see `SortKeyCache`). Sizes and modification
+        times are taken with one `stat` call per file (not from the
+        snapshot, since editing a file in place doesn't change
+        the directory). Returns `None` for the order by name,
+        for which no keys are needed.
+        Raises `BatchCancelled` once `cancellation_token` is cancelled.
+        """
+        if sort_order is None or sort_order == NAME_ORDER:
+            return None
+        files = list(files)
+        files_info: Iterable[FileInfo]
+        if sort_order.needs_stat or sort_order.needs_metadata:
+            with self._stage("plan"):
+                file_info: dict[str, FileInfo] = self._stat_files(
+                    directory,
+                    files,
+                    cancellation_token
+                )
+            capture_times: dict[str, datetime | None] = {}
+            if sort_order.needs_metadata:
+                capture_times = self._get_capture_times(
+                    directory,
+                    file_info.values(),
+                    cancellation_token
+                )
+            files_info = (
+                file_info.get(name, FileInfo(name, 0, 0, 0))._replace(
+                    capture_time=capture_times.get(name)
+                )
+                for name in files
+            )
+        else:
+            inodes: dict[str, int] = (
+                self.get_directory_snapshot(directory).inodes
+            )
+            files_info = (
+                FileInfo(name, inodes.get(name, 0), -1, -1)
+                for name in files
+            )
+        with self._stage("plan"):
+            return self._sort_keys.get_keys(
+                sort_order,
+                files_info
+            ).__getitem__
+
+    def get_capture_times(
+            self,
+            directory: str,
+            files: Iterable[str]
+    ) -> dict[str, datetime | None]:
+        """
+        Returns the capture times of the files from `directory` by name
+        (`None` if unknown), read from their headers by a pool of threads
+        (see `metadata.read_capture_time`). Capture times are cached
+        by file identity, so reading them again for unchanged files takes
+        only a `stat` call per file.
+        """
+        files = list(files)
+        with self._stage("plan"):
+            file_info: dict[str, FileInfo] = self._stat_files(
+                directory,
+                files
+            )
+        capture_times: dict[str, datetime | None] = (
+            self._get_capture_times(directory, file_info.values())
+        )
+        return {name: capture_times.get(name) for name in files}
+
+    def _get_capture_times(
+            self,
+            directory: str,
+            files_info: Iterable[FileInfo],
+            cancellation_token: CancellationToken | None = None
+    ) -> dict[str, datetime | None]:
+        with self._stage("metadata"):
+            return self._metadata.get_capture_times(
+                directory,
+                files_info,
+                cancellation_token=cancellation_token
+            )
+
+    def find_duplicates(
+            self,
+            directory: str,
+            sorted_files: Iterable[str],
+            cancellation_token: CancellationToken | None = None
+    ) -> dict[str, str]:
+        """
+        Returns names of files from `directory` which are byte-identical
+        to another one, by the name of that one (the first of them
+        in the order of `sorted_files`, which is the one numbered).
+        Only files sharing a size with another one are hashed
+        (see `DuplicateFinder`), and hashes are cached by file identity,
+        so checking unchanged files again takes no reading.
+        Files are stat'ed again (not taken from the snapshot), since
+        editing a file in place doesn't change the directory.
+        Raises `BatchCancelled` once `cancellation_token` is cancelled.
+        """
+        with self._stage("hash"):
+            return self._duplicates.find_duplicates(
+                directory,
+                self._stat_files(
+                    directory,
+                    sorted_files,
+                    cancellation_token
+                ).values(),
+                cancellation_token=cancellation_token
+            )
+
+    def _stat_files(
+            self,
+            directory: str,
+            files: Iterable[str],
+            cancellation_token: CancellationToken | None = None
+    ) -> dict[str, FileInfo]:
+        """
+        Returns up to date identities, sizes and modification times
+        of the files from `directory` by name, in the order of `files`,
+        leaving out files which can't be stat'ed.
+        """
+        files_info: dict[str, FileInfo] = {}
+        for name in files:
+            if cancellation_token is not None:
+                cancellation_token.raise_if_cancelled()
+            try:
+                file_stat: os.stat_result = self._stat(
+                    os.path.join(directory, name)
+                )
+            except OSError:
+                continue
+            files_info[name] = FileInfo(
+                name,
+                file_stat.st_ino,
+                file_stat.st_size,
+                file_stat.st_mtime_ns
+            )
+        return files_info
+
+    def _stage(self, name: str) -> AbstractContextManager[None]:
+        """
+        Returns a context manager adding the time spent in it
+        to the stage, if instrumentation is enabled.
+        """
+        if self.instrumentation is None:
+            return nullcontext()
+        return self.instrumentation.stage(name)
+
+    def _count(self, call: str, count: int = 1) -> None:
+        """Count a file system call, if instrumentation is enabled."""
+        if self.instrumentation is not None:
+            self.instrumentation.count(call, count)
+
+    def _stat(self, path: str) -> os.stat_result:
+        """
+        `os.stat`, counted if instrumentation is enabled. Snapshots
+        take it, so that every `stat` call they make is counted.
+        """
+        if self.instrumentation is not None:
+            self.instrumentation.count("stat")
+        return os.stat(path)
+
+    def _lstat_entry(
+            self,
+            directory: str,
+            dir_fd: int | None,
+            name: str
+    ) -> os.stat_result:
+        """`lstat_entry`, counted if instrumentation is enabled."""
+        if self.instrumentation is not None:
+            self.instrumentation.count("stat")
+        return lstat_entry(directory, dir_fd, name)
+
+    def _lexists(self, directory: str, name: str) -> bool:
+        """
+        Check whether an entry (or a broken link) exists in the directory,
+        counted as a `stat` call if instrumentation is enabled.
+        """
+        try:
+            self._lstat_entry(directory, None, name)
+        except OSError:
+            return False
+        return True
+
+    def iter_file_names(self, path: str) -> Iterator[str]:
+        """
+        Streaming version of `filter_directories`, which yields names
+        of files (not directories) one by one, straight from `os.scandir`,
+        without taking a snapshot of the directory.
+        """
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        continue
+                except OSError:
+                    pass
+                yield entry.name
+
+    def iter_files_with_extensions(
+        self,
+        file_names: Iterable[str],
+        extensions: Collection[str]
+    ) -> Iterator[str]:
+        """
+        Streaming version of `filter_extensions`, which yields names
+        of files with one of the `extensions` one by one.
+        """
+        extensions_set: set[str] = set(extensions)
+        for file in file_names:
+            if os.path.splitext(file)[1] in extensions_set:
+                yield file
 
     def get_file_number_from_name(
             self,
@@ -71,9 +469,11 @@ class Renamer:
         and to try it out visit:
         https://regex101.com/
         """
-        split_filename: tuple[str, str] = os.path.splitext(filename)
-        filename_without_extension: str = split_filename[0]
-        extracted_file_number: str = filename_without_extension.split("_")[-1]
+        # The number ends at the first dot after it, so that names
+        # with several extensions (e.g. `.tar.gz`) are handled too
+        extracted_file_number: str = (
+            filename.rsplit("_", 1)[-1].partition(".")[0]
+        )
         file_number: int = int(extracted_file_number)
         return file_number
 
@@ -90,10 +490,10 @@ class Renamer:
         and to try it out visit:
         https://regex101.com/
         """
-        compiled_pattern: Pattern = re.compile(pattern)
+        compiled_pattern: Pattern = get_validation_pattern(pattern)
         files_matching: list[str] = []
         for file in file_list:
-            if re.match(compiled_pattern, file):
+            if compiled_pattern.match(file):
                 files_matching.append(file)
         return files_matching
 
@@ -120,21 +520,28 @@ class Renamer:
     def validate_new_name(
             self,
             new_name: str,
-            pattern: Pattern | None = None
+            pattern: Pattern | str | None = None
     ) -> bool:
         """
         Validates the `new_name` by trying to match it
         against REGEX pattern provided or default one,
         stored in `self.pattern` variable, if not explicitly provided.
+        Patterns given as strings are compiled once and cached.
         """
-        pattern = pattern if pattern else self.pattern
-        return bool(re.match(pattern, new_name))
+        if not pattern:
+            pattern = self.pattern
+        elif isinstance(pattern, str):
+            pattern = get_validation_pattern(pattern)
+        return bool(pattern.match(new_name))
 
     def get_renaming_map(
             self,
             files_to_rename: list[str],
             new_batch_name: str,
-            number_padding: int = 3
+            number_padding: int = 3,
+            sort_key: Callable[[str], Any] | None = None,
+            duplicates: Mapping[str, str] | None = None,
+            duplicate_action: str = SKIP_DUPLICATES
     ) -> dict[str, str]:
         """
         Prepares and returns a map of old file names to new file names
@@ -142,92 +549,668 @@ class Renamer:
         Filters the input file list to check if some files
         have filenames and numbers already matching the pattern
         and removes files and numbers that it finds from the renaming pool.
+        Files are numbered in the order of their names, or of `sort_key`
+        if provided (see `get_sort_key`).
+
+        `duplicates` (see `find_duplicates`) don't take up numbers.
+        They keep their names or, if `duplicate_action` is `"suffix"`,
+        get the new name of their original with a suffix
+        (see `iter_plan_with_duplicates`).
         """
-        files_to_rename.sort()
-        max_number: int = len(files_to_rename)
-        numbers_pool: list[int] = sorted(list(range(1, max_number + 1)))
+        with self._stage("plan"):
+            files_to_rename.sort(key=sort_key)
+            return dict(
+                self.iter_renaming_plan(
+                    files_to_rename,
+                    new_batch_name,
+                    number_padding,
+                    duplicates=duplicates,
+                    duplicate_action=duplicate_action
+                )
+            )
 
-        logger.info(f"{files_to_rename=}")
+    def get_directory_renaming_map(
+            self,
+            directory: str,
+            files_to_rename: list[str],
+            new_batch_name: str,
+            number_padding: int = 3,
+            sort_order: SortOrder | None = None,
+            duplicate_action: str | None = None,
+            cancellation_token: CancellationToken | None = None
+    ) -> dict[str, str]:
+        """
+        Returns the map of old to new names of the files from `directory`
+        (see `get_renaming_map`), numbered in the `sort_order`
+        (see `get_sort_key`). If `duplicate_action` is provided, files
+        identical to another one are found (see `find_duplicates`)
+        and skipped or given a suffix. Otherwise, they are numbered
+        as any other file.
 
-        # Check if any files already have a name that matches the new one
-        pattern: str = (
-            rf"^{new_batch_name}_\d{{{number_padding}}}\.\S*$|"
-            rf"^{new_batch_name}_\d{{{number_padding}}}$"
+        Raises `BatchCancelled` if the planning is cancelled
+        with `cancellation_token`.
+        """
+        sort_key: Callable[[str], Any] | None = self.get_sort_key(
+            directory,
+            files_to_rename,
+            sort_order,
+            cancellation_token
+        )
+        duplicates: dict[str, str] | None = None
+        if duplicate_action is not None:
+            files_to_rename.sort(key=sort_key)
+            duplicates = self.find_duplicates(
+                directory,
+                files_to_rename,
+                cancellation_token
+            )
+        return self.get_renaming_map(
+            files_to_rename=files_to_rename,
+            new_batch_name=new_batch_name,
+            number_padding=number_padding,
+            sort_key=sort_key,
+            duplicates=duplicates,
+            duplicate_action=duplicate_action or SKIP_DUPLICATES
+        )
+
+    def iter_renaming_plan(
+            self,
+            sorted_files_to_rename: list[str],
+            new_batch_name: str,
+            number_padding: int = 3,
+            candidate_files: list[str] | None = None,
+            duplicates: Mapping[str, str] | None = None,
+            duplicate_action: str = SKIP_DUPLICATES
+    ) -> Iterator[tuple[str, str]]:
+        """
+        Generator version of `get_renaming_map`, which yields pairs
+        of old and new file names instead of building the whole map.
+        Requires the list of files to be already sorted
+        in the order in which they are numbered.
+
+        Files which already have a matching name and number are searched
+        for only among `candidate_files` (if provided), which must include
+        all files which could have one (see `RenamingPreview`).
+        """
+        files_to_number: list[str] = sorted_files_to_rename
+        if duplicates:
+            not_numbered: set[str] = self._get_duplicates_not_numbered(
+                duplicates,
+                duplicate_action,
+                new_batch_name,
+                number_padding
+            )
+            files_to_number = [
+                file for file in sorted_files_to_rename
+                if file not in not_numbered
+            ]
+            if candidate_files is not None:
+                candidate_files = [
+                    file for file in candidate_files
+                    if file not in not_numbered
+                ]
+        reserved_numbers, reserved_files = self._reserve_numbers(
+            files_to_number,
+            new_batch_name,
+            number_padding,
+            candidate_files
+        )
+        plan: Iterator[tuple[str, str]] = self._assign_numbers(
+            files_to_number,
+            reserved_numbers,
+            reserved_files,
+            new_batch_name,
+            number_padding
         )
-        files_with_names_matching_pattern: list[str] = (
-            self.get_files_matching_pattern(files_to_rename, pattern)
+        if duplicates:
+            return iter_plan_with_duplicates(
+                plan,
+                duplicates,
+                duplicate_action
+            )
+        return plan
+
+    def _get_duplicates_not_numbered(
+            self,
+            duplicates: Mapping[str, str],
+            duplicate_action: str,
+            new_batch_name: str,
+            number_padding: int
+    ) -> set[str]:
+        """
+        Returns the duplicates which are left out of the numbering.
+        Skipped duplicates which already have a matching name are still
+        numbered (and then left out of the plan), so that no other file
+        gets their name.
+        """
+        if duplicate_action != SKIP_DUPLICATES:
+            return set(duplicates)
+        template: NameTemplate = get_name_template(
+            new_batch_name,
+            number_padding
         )
+        return {
+            duplicate for duplicate in duplicates
+            if template.match(duplicate) is None
+        }
 
-        # If those files were found, check if their numbers
-        # are in the correct range
-        files_with_correct_numbers: list[str] = self.get_files_matching_range(
-            files_with_names_matching_pattern,
-            max_number,
-            self.get_file_number_from_name
+    def _reserve_numbers(
+            self,
+            sorted_files_to_rename: list[str],
+            new_batch_name: str,
+            number_padding: int,
+            candidate_files: list[str] | None = None
+    ) -> tuple[bytearray, set[str]]:
+        """
+        Finds files which already have names matching the new one
+        with numbers in the correct range (only among `candidate_files`,
+        if provided). Returns a bitset of their numbers (index = number)
+        and a set of their names.
+        """
+        max_number: int = len(sorted_files_to_rename)
+
+        logger.info("Planning renaming of %d files", max_number)
+
+        # Check if any files already have a name that matches the new one
+        # with a number in the correct range. The template returns
+        # the number of a matching name in the same pass.
+        template: NameTemplate = get_name_template(
+            new_batch_name,
+            number_padding
         )
 
-        # Remove those files and their numbers from the renaming pool
-        for file in files_with_correct_numbers:
-            files_to_rename.remove(file)
-            numbers_pool.remove(self.get_file_number_from_name(file))
+        # Reserve those files and their numbers, so they are not renamed.
+        # Numbers are kept in a bitset (index = number), so both reserving
+        # and checking a number is O(1). If several files share a number,
+        # only the first one keeps it and the others get renamed.
+        reserved_numbers: bytearray = bytearray(max_number + 1)
+        reserved_files: set[str] = set()
+        for file in (
+            sorted_files_to_rename if candidate_files is None
+            else candidate_files
+        ):
+            file_number: int | None = template.match(file)
+            if (
+                file_number is None
+                or file_number > max_number
+                or reserved_numbers[file_number]
+            ):
+                continue
+            reserved_numbers[file_number] = 1
+            reserved_files.add(file)
         logger.info(
-            "Following files have already matching names "
-            f"and numbers: {files_with_correct_numbers}"
+            "%d files have already matching names and numbers",
+            len(reserved_files)
         )
+        # Listing them is only worth it if someone is going to read it
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Following files have already matching names "
+                "and numbers: %s",
+                sorted(reserved_files)
+            )
+        return reserved_numbers, reserved_files
 
-        files_map: dict[str, str] = {}
-        for old_name_with_extension in files_to_rename:
+    def _assign_numbers(
+            self,
+            sorted_files_to_rename: list[str],
+            reserved_numbers: bytearray,
+            reserved_files: set[str],
+            new_batch_name: str,
+            number_padding: int
+    ) -> Iterator[tuple[str, str]]:
+        """
+        Hands out the numbers not reserved by `_reserve_numbers`
+        in ascending order, with a cursor skipping over the reserved ones.
+        """
+        template: NameTemplate = get_name_template(
+            new_batch_name,
+            number_padding
+        )
+        next_free_number: int = 1
+        for old_name_with_extension in sorted_files_to_rename:
+            if old_name_with_extension in reserved_files:
+                continue
+            while reserved_numbers[next_free_number]:
+                next_free_number += 1
             extension: str = os.path.splitext(old_name_with_extension)[1]
-            file_number: int = numbers_pool.pop(0)
-            new_name_with_extension: str = (
-                f'{new_batch_name}_{str(file_number).zfill(number_padding)}'
-                + (extension if extension else '')
+            new_name_with_extension: str = template.format(
+                next_free_number,
+                extension
             )
-            files_map[old_name_with_extension] = new_name_with_extension
-
-        return files_map
+            yield old_name_with_extension, new_name_with_extension
+            next_free_number += 1
 
     def rename_files_from_file_map(
         self,
         directory: str,
-        files_map: dict[str, str]
-    ) -> None:
+        files_map: dict[str, str],
+        parallelism: int = 1,
+        step_callback: Callable[[str, str, bool], None] | None = None,
+        progress_callback: ISignal | None = None,
+        journal_path: str | None = None,
+        fsync_every: int = DEFAULT_FSYNC_EVERY,
+        cancellation_token: CancellationToken | None = None
+    ) -> BatchReport:
         """Rename files based on the provided map (dict).
 
         Assume that `keys` are old names and `values` are new names.
         Both `keys` and `values` are assumed to contain necessary
         extensions (or not if files did not have them in the first place).
+
+        Files may be renamed to names of other files from the map
+        (including swapping names), as renames are ordered so that
+        every name is freed before it gets reused (see `get_rename_chains`).
+
+        `parallelism` and `step_callback` are passed
+        to `RenameExecutor.execute_chains`. If `progress_callback`
+        is provided, it's emitted with the percentage of executed renames.
+
+        If `journal_path` is provided, the batch is recorded in a new
+        journal at that path (see `RenameJournal`), with which it can be
+        resumed by `resume_renaming` if it gets interrupted.
+
+        If `cancellation_token` is provided, the batch can be paused
+        or cancelled with it between chains of renames. Returns the report
+        of the batch, listing the executed renames.
         """
-        logger.info(f'{directory=}')  # DEBUG
-        for old_name, new_name in files_map.items():
+        snapshot: DirectorySnapshot = self.get_directory_snapshot(directory)
+        with self._stage("plan"):
+            chains: list[list[RenameStep]] = get_rename_chains(
+                files_map,
+                snapshot.names
+            )
+        return self._execute_in_directory(
+            directory,
+            snapshot,
+            chains,
+            parallelism,
+            step_callback,
+            progress_callback,
+            journal_path,
+            fsync_every,
+            cancellation_token
+        )
 
-            if old_name not in os.listdir(directory):
-                raise ValueError(
-                    f"File {old_name} was not present in the directory. "
-                    "Files map is likely incorrect."
-                )
+    def save_plan(
+        self,
+        plan_path: str,
+        directory: str,
+        files_map: dict[str, str]
+    ) -> int:
+        """Save the renames of the map to a new plan file.
 
-            if new_name in os.listdir(directory):
-                logger.error(
-                    f"File {old_name} could not be renamed to {new_name}, "
-                    f"as {new_name} already exists in the directory"
+        The renames are ordered the same way as they would be
+        by `rename_files_from_file_map` (including temporary names),
+        so that `apply_plan` can execute them later without planning.
+        Returns the number of saved renames.
+        """
+        snapshot: DirectorySnapshot = self.get_directory_snapshot(directory)
+        with self._stage("plan"):
+            return write_plan(
+                plan_path,
+                directory,
+                get_rename_chains(files_map, snapshot.names),
+                snapshot.inodes
+            )
+
+    def apply_plan(
+        self,
+        plan_path: str,
+        progress_callback: ISignal | None = None,
+        parallelism: int = 1,
+        step_callback: Callable[[str, str, bool], None] | None = None,
+        journal_path: str | None = None,
+        fsync_every: int = DEFAULT_FSYNC_EVERY,
+        cancellation_token: CancellationToken | None = None
+    ) -> BatchReport:
+        """Execute the renames saved by `save_plan`.
+
+        The plan is checked against a snapshot of the directory
+        (see `check_plan`) and executed as it is, without planning.
+        See `rename_files_from_file_map` for the other arguments.
+
+        Raises `ValueError` if the directory has changed
+        in a way which makes the plan impossible to apply.
+        """
+        plan: Plan = read_plan(plan_path)
+        snapshot: DirectorySnapshot = self.get_directory_snapshot(
+            plan.directory
+        )
+        with self._stage("plan"):
+            problems: list[str] = check_plan(
+                plan,
+                set(snapshot.names),
+                snapshot.inodes
+            )
+        if problems:
+            # Only the first few problems, as there can be millions
+            message: str = "; ".join(problems[:10])
+            if len(problems) > 10:
+                message += f" and {len(problems) - 10} more"
+            raise ValueError(
+                f"Plan {plan_path} can't be applied to {plan.directory}: "
+                f"{message}"
+            )
+        return self._execute_in_directory(
+            plan.directory,
+            snapshot,
+            plan.chains,
+            parallelism,
+            step_callback,
+            progress_callback,
+            journal_path,
+            fsync_every,
+            cancellation_token
+        )
+
+    def _execute_in_directory(
+        self,
+        directory: str,
+        snapshot: DirectorySnapshot,
+        chains: list[list[tuple[str, str]]],
+        parallelism: int,
+        step_callback: Callable[[str, str, bool], None] | None,
+        progress_callback: ISignal | None,
+        journal_path: str | None,
+        fsync_every: int,
+        cancellation_token: CancellationToken | None
+    ) -> BatchReport:
+        """
+        Execute a new batch of renames in the directory, recording it
+        in a journal and an undo log (if enabled).
+        """
+        dir_fd: int | None = open_directory(directory)
+        undo_log_recorder: UndoLogRecorder | None = None
+        try:
+            executor: RenameExecutor = RenameExecutor(
+                directory,
+                snapshot.names,
+                dir_fd=dir_fd
+            )
+            undo_log_recorder = self._create_undo_log_recorder(
+                directory,
+                dir_fd,
+                {
+                    old_name: snapshot.inodes.get(old_name, 0)
+                    for chain in chains
+                    for old_name, _ in chain
+                }
+            )
+            if journal_path is not None:
+                executor.journal = RenameJournal.create(
+                    journal_path,
+                    directory,
+                    chains,
+                    fsync_every
                 )
-                continue
+            return self._execute_chains(
+                executor,
+                chains,
+                parallelism,
+                step_callback,
+                progress_callback,
+                undo_log_recorder,
+                cancellation_token
+            )
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+            if undo_log_recorder is not None:
+                self._close_undo_log_recorder(undo_log_recorder)
+
+    def _create_undo_log_recorder(
+        self,
+        directory: str,
+        dir_fd: int | None,
+        inodes: dict[str, int]
+    ) -> UndoLogRecorder | None:
+        """
+        Returns a recorder of a new batch's undo log, or `None`
+        if undo logs are disabled. `inodes` are the inodes of the files
+        to be renamed by name (files missing from it are recorded
+        with an unknown inode).
+        """
+        if self.undo_log_dir is None:
+            return None
+        return UndoLogRecorder(
+            directory,
+            os.fstat(dir_fd) if dir_fd is not None else os.stat(directory),
+            inodes,
+            self.undo_log_dir
+        )
 
-            old = os.path.join(directory, old_name)
-            new = os.path.join(directory, new_name)
+    def _close_undo_log_recorder(self, recorder: UndoLogRecorder) -> None:
+        """Close the batch's undo log and remember it as the last one."""
+        self.last_undo_log_path = recorder.close()
+        if self.last_undo_log_path is not None:
+            logger.info("Undo log: %s", self.last_undo_log_path)
 
-            try:
-                os.rename(old, new)
+    def resume_renaming(
+        self,
+        journal_path: str,
+        progress_callback: ISignal | None = None,
+        parallelism: int = 1,
+        step_callback: Callable[[str, str, bool], None] | None = None,
+        fsync_every: int = DEFAULT_FSYNC_EVERY,
+        cancellation_token: CancellationToken | None = None
+    ) -> BatchReport:
+        """Continue an interrupted batch recorded in the journal.
+
+        The plan is taken from the journal and the directory is not
+        rescanned: only the renames which were not committed are checked
+        (see `get_pending_chains`) and executed. See
+        `rename_files_from_file_map` for the other arguments.
+
+        The resumed renames are recorded in a new undo log (if enabled),
+        without the inodes of the files. Renames executed before
+        the interruption are in the undo log of the interrupted batch,
+        so undoing the whole batch takes undoing both logs, the newest
+        first.
+        """
+        state: JournalState = read_journal(journal_path)
+        chains: list[list[tuple[str, str]]] = get_pending_chains(state)
+
+        # Only names which the pending renames use have to be known
+        names: set[str] = {
+            old_name for chain in chains for old_name, _ in chain
+        }
+        new_names: list[str] = [
+            new_name for chain in chains for _, new_name in chain
+        ]
+        names.update(
+            new_name
+            for new_name in new_names
+            if self._lexists(state.directory, new_name)
+        )
+        executor: RenameExecutor = RenameExecutor(
+            state.directory,
+            names,
+            all_names=False
+        )
+        undo_log_recorder: UndoLogRecorder | None = (
+            self._create_undo_log_recorder(state.directory, None, {})
+        )
+        executor.journal = RenameJournal.append(journal_path, fsync_every)
+        try:
+            return self._execute_chains(
+                executor,
+                chains,
+                parallelism,
+                step_callback,
+                progress_callback,
+                undo_log_recorder,
+                cancellation_token
+            )
+        finally:
+            if undo_log_recorder is not None:
+                self._close_undo_log_recorder(undo_log_recorder)
+
+    def undo_renaming(
+        self,
+        undo_log_path: str,
+        progress_callback: ISignal | None = None,
+        parallelism: int = 1,
+        step_callback: Callable[[str, str, bool], None] | None = None,
+        cancellation_token: CancellationToken | None = None
+    ) -> BatchReport:
+        """Rename files from the batch recorded in the undo log back.
+
+        The directory is not rescanned: every file from the undo log
+        is checked with a single `lstat` and skipped (with an error logged)
+        if it's missing or was replaced by another file since the batch.
+        Renames are executed the same way as in `rename_files_from_file_map`
+        (see it for the other arguments). Once every file has been
+        renamed back, the undo log is removed.
 
-            except OSError as e:
-                logger.error(
-                    f"Failed renaming ({old_name} => {new_name}). "
-                    f"{type(e).__name__}: {str(e)}."
+        Raises `ValueError` if the directory was replaced since the batch.
+        """
+        undo_log: UndoLog = read_undo_log(undo_log_path)
+        directory: str = undo_log.directory
+        dir_fd: int | None = open_directory(directory)
+        try:
+            directory_stat: os.stat_result = (
+                os.fstat(dir_fd) if dir_fd is not None
+                else os.stat(directory)
+            )
+            if (
+                (directory_stat.st_dev, directory_stat.st_ino)
+                != (undo_log.device, undo_log.inode)
+            ):
+                raise ValueError(
+                    f"Directory {directory} was replaced since the batch"
                 )
-                continue
 
-            logger.info(f"Renamed {old_name} => {new_name}")
+            files_map: dict[str, str] = {}
+            skipped_log: RateLimitedLog = RateLimitedLog(
+                logger,
+                logging.ERROR
+            )
+            for name, original_name, inode in undo_log.entries:
+                try:
+                    file_stat: os.stat_result = self._lstat_entry(
+                        directory,
+                        dir_fd,
+                        name
+                    )
+                except OSError as e:
+                    skipped_log.log(
+                        "Skipped renaming %s back to %s. %s: %s.",
+                        name,
+                        original_name,
+                        type(e).__name__,
+                        e
+                    )
+                    continue
+                if inode and file_stat.st_ino != inode:
+                    skipped_log.log(
+                        "Skipped renaming %s back to %s, "
+                        "as it was replaced by another file since the batch",
+                        name,
+                        original_name
+                    )
+                    continue
+                files_map[name] = original_name
+            skipped_log.flush()
+
+            # Only names which the renames use have to be known
+            names: set[str] = set(files_map)
+            for original_name in files_map.values():
+                try:
+                    self._lstat_entry(directory, dir_fd, original_name)
+                except OSError:
+                    continue
+                names.add(original_name)
+            executor: RenameExecutor = RenameExecutor(
+                directory,
+                names,
+                all_names=False,
+                dir_fd=dir_fd
+            )
+            report: BatchReport = self._execute_chains(
+                executor,
+                get_rename_chains(files_map, names),
+                parallelism,
+                step_callback,
+                progress_callback,
+                cancellation_token=cancellation_token
+            )
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+        if (
+            not report.failed
+            and not report.not_executed
+            and len(files_map) == len(undo_log.entries)
+        ):
+            os.remove(undo_log_path)
+        return report
+
+    def _execute_chains(
+        self,
+        executor: RenameExecutor,
+        chains: list[list[tuple[str, str]]],
+        parallelism: int,
+        step_callback: Callable[[str, str, bool], None] | None,
+        progress_callback: ISignal | None,
+        undo_log_recorder: UndoLogRecorder | None = None,
+        cancellation_token: CancellationToken | None = None
+    ) -> BatchReport:
+        total: int = sum(len(chain) for chain in chains)
+        progress: ThrottledProgress | None = None
+        if progress_callback is not None:
+            progress = ThrottledProgress(progress_callback, total=total)
+
+        report: BatchReport = BatchReport()
+        report_lock: threading.Lock = threading.Lock()
+
+        def report_step(old_name: str, new_name: str, renamed: bool) -> None:
+            with report_lock:
+                if renamed:
+                    report.renamed.append((old_name, new_name))
+                else:
+                    report.failed.append((old_name, new_name))
+            if undo_log_recorder is not None:
+                undo_log_recorder.record(old_name, new_name, renamed)
+            if step_callback is not None:
+                step_callback(old_name, new_name, renamed)
+            if progress is not None:
+                progress.advance()
+
+        executor.instrumentation = self.instrumentation
+        start: float = time.perf_counter()
+        try:
+            with self._stage("execute"):
+                executor.execute_chains(
+                    chains,
+                    parallelism=parallelism,
+                    step_callback=report_step,
+                    cancellation_token=cancellation_token
+                )
+        finally:
+            if executor.journal is not None:
+                executor.journal.close()
+            log_batch_summary(
+                executor.directory,
+                len(report.renamed),
+                len(report.failed),
+                time.perf_counter() - start
+            )
+        report.not_executed = (
+            total - len(report.renamed) - len(report.failed)
+        )
+        report.cancelled = (
+            cancellation_token is not None and cancellation_token.is_cancelled
+        )
+        if report.cancelled:
+            logger.info(
+                "Batch in %s cancelled, %d renames not executed",
+                executor.directory,
+                report.not_executed
+            )
+        elif progress is not None:
+            progress.finish()
+        return report
 
     def rename_files(
             self,
@@ -235,8 +1218,14 @@ class Renamer:
             files_to_rename: list[str],
             new_batch_name: str,
             progress_callback: ISignal,
-            number_padding: int = 3
-    ) -> None:
+            number_padding: int = 3,
+            parallelism: int = 1,
+            journal_path: str | None = None,
+            fsync_every: int = DEFAULT_FSYNC_EVERY,
+            cancellation_token: CancellationToken | None = None,
+            sort_order: SortOrder | None = None,
+            duplicate_action: str | None = None
+    ) -> BatchReport:
         """Rename files with the new name and a number.
 
         Args:
@@ -245,29 +1234,183 @@ class Renamer:
                 their appropriate extensions.
             new_batch_name (str): New name to be applied
                 to all files being renamed.
+            progress_callback (ISignal): Signal emitted with the percentage
+                of renamed files. Emissions are rate-limited, but 100%
+                is always emitted at the end.
             number_padding (int): The minimum number of the numeric
                 suffix length.
+            parallelism (int): Maximum number of independent chains
+                of renames executed at the same time.
+            journal_path (str | None): Path to a new journal recording
+                the batch, so that it can be resumed if interrupted.
+            fsync_every (int): Number of journal records after which
+                the journal is `fsync`-ed.
+            cancellation_token (CancellationToken | None): Token with which
+                the batch can be paused or cancelled while it's running,
+                including while it's being planned (e.g. while files
+                are hashed or their headers are read).
+            sort_order (SortOrder | None): Order in which files
+                are numbered, by name if not provided.
+            duplicate_action (str | None): What to do with files
+                identical to another one in the batch: `"skip"`
+                or `"suffix"` (see `get_renaming_map`). If not provided,
+                they are numbered as any other file.
+
+        Returns:
+            BatchReport: Executed renames and, if instrumentation is enabled,
+                measurements of the batch (including scanning and filtering
+                done since the previous measurements were taken).
         """
 
-        renaming_map: dict[str, str] = self.get_renaming_map(
-            files_to_rename=files_to_rename,
-            new_batch_name=new_batch_name,
-            number_padding=number_padding
+        try:
+            renaming_map: dict[str, str] = self.get_directory_renaming_map(
+                directory=directory,
+                files_to_rename=files_to_rename,
+                new_batch_name=new_batch_name,
+                number_padding=number_padding,
+                sort_order=sort_order,
+                duplicate_action=duplicate_action,
+                cancellation_token=cancellation_token
+            )
+        except BatchCancelled:
+            logger.info(
+                "Batch in %s cancelled while planning, %d files not renamed",
+                directory,
+                len(files_to_rename)
+            )
+            cancelled_report: BatchReport = BatchReport(
+                not_executed=len(files_to_rename),
+                cancelled=True
+            )
+            if self.instrumentation is not None:
+                cancelled_report.stats = self.instrumentation.take_summary()
+            return cancelled_report
+        report: BatchReport = self.rename_files_from_file_map(
+            directory=directory,
+            files_map=renaming_map,
+            parallelism=parallelism,
+            progress_callback=progress_callback,
+            journal_path=journal_path,
+            fsync_every=fsync_every,
+            cancellation_token=cancellation_token
         )
+        if self.instrumentation is not None:
+            report.stats = self.instrumentation.take_summary()
+        return report
 
-        total: int = len(renaming_map)
+    def rename_files_streaming(
+            self,
+            directory: str,
+            extensions: Collection[str],
+            new_batch_name: str,
+            progress_callback: ISignal,
+            number_padding: int = 3,
+            step_callback: Callable[[str, str, bool], None] | None = None,
+            cancellation_token: CancellationToken | None = None
+    ) -> None:
+        """Rename files with the new name and a number, with bounded memory.
 
-        # DEBUG - make the renaming process always run at least 5 s
-        # if there are more than 20 files, otherwise - 2 s
-        total_sleep_time: int = 5 if total > 20 else 2
-        sleep_time: float = total_sleep_time / total
-        logger.info(f'{sleep_time=}')
+        Equivalent to `rename_files` run on the files from `directory`
+        with one of the `extensions`, but meant for directories with tens
+        of millions of entries. Scanning, filtering, planning and renaming
+        are chained generators, so apart from the sorted list of names
+        of files to rename (which numbering requires), only names which
+        renamed files could conflict with are kept in memory.
 
-        for index, key in enumerate(renaming_map):
-            self.rename_files_from_file_map(
-                directory=directory,
-                files_map={key: renaming_map[key]}
+        Unlike `rename_files`, renames are not ordered (see
+        `get_rename_chains`), which is not needed for maps created
+        by `get_renaming_map`, as those never rename a file
+        to the name of another file being renamed.
+
+        `step_callback` is called after every rename with the old name,
+        the new name and whether the file was renamed. Executed renames
+        are not collected in a report, so that memory stays bounded,
+        so `step_callback` is the way to learn which of them were executed
+        if the batch is cancelled with `cancellation_token`. Renames are
+        recorded in an undo log (if enabled) as they are executed,
+        without the inodes of the files, which are not kept in memory.
+        """
+        # Every new name starts with this prefix, so only existing entries
+        # (including directories) with it can conflict with the new names
+        conflict_prefix: str = f"{new_batch_name}_"
+        possible_conflicts: set[str] = set()
+
+        def iter_scanned_names() -> Iterator[str]:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith(conflict_prefix):
+                        possible_conflicts.add(entry.name)
+                    try:
+                        if entry.is_dir():
+                            continue
+                    except OSError:
+                        pass
+                    yield entry.name
+
+        # Scanning and filtering are a single pass, timed as the scan
+        with self._stage("scan"):
+            self._count("listdir")
+            sorted_files_to_rename: list[str] = list(
+                self.iter_files_with_extensions(
+                    iter_scanned_names(),
+                    extensions
+                )
             )
-            percent_done: float = (index / total) * 100
-            progress_callback.emit(percent_done)
-            time.sleep(sleep_time)
+        with self._stage("plan"):
+            sorted_files_to_rename.sort()
+            reserved_numbers, reserved_files = self._reserve_numbers(
+                sorted_files_to_rename,
+                new_batch_name,
+                number_padding
+            )
+        progress: ThrottledProgress = ThrottledProgress(
+            progress_callback,
+            total=len(sorted_files_to_rename) - len(reserved_files)
+        )
+        executor: RenameExecutor = RenameExecutor(
+            directory,
+            possible_conflicts,
+            all_names=False
+        )
+        executor.instrumentation = self.instrumentation
+        undo_log_recorder: UndoLogRecorder | None = (
+            self._create_undo_log_recorder(directory, None, {})
+        )
+        counts: dict[bool, int] = {True: 0, False: 0}
+        start: float = time.perf_counter()
+        # Numbers are assigned lazily, so this includes the rest of planning
+        try:
+            with self._stage("execute"):
+                for old_name, new_name in self._assign_numbers(
+                    sorted_files_to_rename,
+                    reserved_numbers,
+                    reserved_files,
+                    new_batch_name,
+                    number_padding
+                ):
+                    if (
+                        cancellation_token is not None
+                        and cancellation_token.should_stop()
+                    ):
+                        break
+                    renamed: bool = executor.rename(old_name, new_name)
+                    counts[renamed] += 1
+                    if undo_log_recorder is not None:
+                        undo_log_recorder.record(old_name, new_name, renamed)
+                    if step_callback is not None:
+                        step_callback(old_name, new_name, renamed)
+                    progress.advance()
+        finally:
+            if undo_log_recorder is not None:
+                self._close_undo_log_recorder(undo_log_recorder)
+        executor.flush_logs()
+        log_batch_summary(
+            directory,
+            counts[True],
+            counts[False],
+            time.perf_counter() - start
+        )
+        if cancellation_token is not None and cancellation_token.is_cancelled:
+            logger.info("Batch in %s cancelled", directory)
+        else:
+            progress.finish()
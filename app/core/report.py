@@ -0,0 +1,43 @@
+"""
+This module holds the report of a batch of renames used by BatchFileRenamer.
+"""
+
+from dataclasses import dataclass, field
+
+from .instrumentation import InstrumentationSummary
+
+
+@dataclass
+class BatchReport:
+    """Outcome of a batch of renames.
+
+    Attributes:
+        renamed (list[tuple[str, str]]): Old and new names of all executed
+            (committed) renames, including renames to and from temporary
+            names, in the order in which they were executed.
+        failed (list[tuple[str, str]]): Old and new names of renames
+            which failed or were skipped.
+        not_executed (int): Number of renames which were not attempted,
+            as the batch was cancelled.
+        cancelled (bool): Whether the batch was cancelled.
+        stats (InstrumentationSummary | None): Measurements of the batch,
+            if instrumentation is enabled.
+    """
+    renamed: list[tuple[str, str]] = field(default_factory=list)
+    failed: list[tuple[str, str]] = field(default_factory=list)
+    not_executed: int = 0
+    cancelled: bool = False
+    stats: InstrumentationSummary | None = None
+
+    def __str__(self) -> str:
+        lines: list[str] = [
+            f"Renamed {len(self.renamed)} files, "
+            f"{len(self.failed)} failed"
+            + (
+                f", cancelled before {self.not_executed} more"
+                if self.cancelled else ""
+            )
+        ]
+        if self.stats is not None:
+            lines.append(str(self.stats))
+        return "\n".join(lines)
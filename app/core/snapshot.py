@@ -0,0 +1,300 @@
+"""
+This module holds the directory snapshot used by BatchFileRenamer.
+A snapshot is the result of a single `os.scandir` pass over a directory,
+shared by all the stages (extensions getting, directories filtering,
+padding calculation) instead of listing the directory again for each one.
+"""
+
+import os
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import cached_property
+from typing import NamedTuple
+
+
+# Directory modification times on some file systems (e.g. FAT)
+# are as coarse as 2 seconds, so a change made shortly after the scan
+# may not change the mtime. Snapshots of directories modified
+# within this window before the scan are never trusted.
+RACY_WINDOW_NS: int = 2_000_000_000
+
+# `os.DirEntry.stat` is only free (filled in by the directory listing)
+# on Windows. Elsewhere it takes one `stat` call per entry, which would
+# make every scan several times slower, so sizes are taken lazily.
+DIR_ENTRY_STAT_IS_FREE: bool = os.name == "nt"
+
+# Number of entries passed at once to the `batch_callback` of a scan
+SCAN_BATCH_SIZE: int = 1000
+
+# `os.stat`, or a function wrapping it (e.g. to count the calls)
+StatFunction = Callable[[str], os.stat_result]
+
+
+class SnapshotEntry(NamedTuple):
+    """Single directory entry as seen during the scan."""
+    name: str
+    extension: str
+    is_dir: bool
+    inode: int
+    size: int  # -1 if not taken during the scan
+    mtime_ns: int = -1  # -1 if not taken during the scan
+
+
+class FileInfo(NamedTuple):
+    """Name and identity of a file, and its metadata if needed.
+
+    `size` and `mtime_ns` are -1 if they were not needed
+    (and so not taken). `capture_time` is only read if needed
+    (see `metadata.MetadataCache`) and is `None` if unknown.
+    """
+    name: str
+    inode: int
+    size: int
+    mtime_ns: int
+    capture_time: datetime | None = None
+
+
+class ExtensionStats(NamedTuple):
+    """Number and total size (in bytes) of files with an extension."""
+    count: int
+    total_size: int
+
+
+def get_extension_stats(
+        path: str,
+        entries: Iterable[SnapshotEntry],
+        stat: StatFunction = os.stat
+) -> dict[str, ExtensionStats]:
+    """
+    Returns the number and total size of files (entries which are not
+    directories) by extension, sorted by extension. Sizes not taken
+    during the scan of the directory at `path` take one `stat` call
+    per file (but no additional pass over the directory).
+    """
+    counts: dict[str, int] = {}
+    sizes: dict[str, int] = {}
+    for entry in entries:
+        if entry.is_dir:
+            continue
+        size: int = entry.size
+        if size < 0:
+            try:
+                size = stat(os.path.join(path, entry.name)).st_size
+            except OSError:
+                size = 0
+        counts[entry.extension] = counts.get(entry.extension, 0) + 1
+        sizes[entry.extension] = sizes.get(entry.extension, 0) + size
+    return {
+        extension: ExtensionStats(counts[extension], sizes[extension])
+        for extension in sorted(counts)
+    }
+
+
+def merge_extension_stats(
+        stats: dict[str, ExtensionStats],
+        new_stats: dict[str, ExtensionStats]
+) -> None:
+    """Add `new_stats` (e.g. of another batch of entries) to `stats`."""
+    for extension, (count, total_size) in new_stats.items():
+        old: ExtensionStats = stats.get(extension, ExtensionStats(0, 0))
+        stats[extension] = ExtensionStats(
+            old.count + count,
+            old.total_size + total_size
+        )
+
+
+@dataclass(frozen=True)
+class DirectorySnapshot:
+    """Immutable view of a directory's contents at the time of the scan.
+
+    Attributes:
+        path (str): Path to the scanned directory.
+        mtime_ns (int): Modification time of the directory
+            (in nanoseconds) taken right before the scan.
+        scanned_at_ns (int): Wall clock time (in nanoseconds)
+            at which the scan started.
+        entries (tuple[SnapshotEntry, ...]): All entries in the order
+            returned by `os.scandir`.
+        stat (StatFunction): Function with which the directory and files
+            are stat'ed, both during the scan and afterwards.
+    """
+    path: str
+    mtime_ns: int
+    scanned_at_ns: int
+    entries: tuple[SnapshotEntry, ...]
+    stat: StatFunction = field(default=os.stat, compare=False, repr=False)
+
+    @classmethod
+    def scan(
+            cls,
+            path: str,
+            take_sizes: bool = DIR_ENTRY_STAT_IS_FREE,
+            batch_callback: Callable[[list[SnapshotEntry]], None]
+            | None = None,
+            batch_size: int = SCAN_BATCH_SIZE,
+            stat: StatFunction = os.stat
+    ) -> "DirectorySnapshot":
+        """Scan the directory once and return its snapshot.
+
+        Uses the file type and inode information cached by `os.DirEntry`,
+        so on most platforms no additional `stat` call is made per entry.
+        By default, sizes of files are taken only where `os.DirEntry`
+        provides them for free (see `DIR_ENTRY_STAT_IS_FREE`), otherwise
+        they are taken when first needed (see `extension_stats`).
+        Modification times are taken together with sizes.
+        Symbolic links are followed, the same as `os.path.isdir` does.
+
+        If `batch_callback` is provided, it's called with every
+        `batch_size` scanned entries (and with the rest at the end),
+        so that results of a long scan can be shown while it's running.
+        An exception raised by it stops the scan.
+
+        Every `stat` call on the directory and its files (outside
+        of `os.scandir`) goes through `stat`, so that it can be counted.
+        """
+        scanned_at_ns: int = time.time_ns()
+        mtime_ns: int = stat(path).st_mtime_ns
+        entries: list[SnapshotEntry] = []
+        reported: int = 0
+        with os.scandir(path) as directory_entries:
+            for entry in directory_entries:
+                try:
+                    is_dir: bool = entry.is_dir()
+                    inode: int = entry.inode()
+                except OSError:
+                    is_dir = False
+                    inode = 0
+                size: int = -1
+                entry_mtime_ns: int = -1
+                if take_sizes and not is_dir:
+                    try:
+                        entry_stat: os.stat_result = (
+                            entry.stat() if DIR_ENTRY_STAT_IS_FREE
+                            else stat(entry.path)
+                        )
+                        size = entry_stat.st_size
+                        entry_mtime_ns = entry_stat.st_mtime_ns
+                    except OSError:
+                        size = 0
+                entries.append(
+                    SnapshotEntry(
+                        name=entry.name,
+                        extension=os.path.splitext(entry.name)[1],
+                        is_dir=is_dir,
+                        inode=inode,
+                        size=size,
+                        mtime_ns=entry_mtime_ns
+                    )
+                )
+                if (
+                    batch_callback is not None
+                    and len(entries) - reported == batch_size
+                ):
+                    batch_callback(entries[reported:])
+                    reported = len(entries)
+        if batch_callback is not None and len(entries) > reported:
+            batch_callback(entries[reported:])
+        return cls(
+            path=path,
+            mtime_ns=mtime_ns,
+            scanned_at_ns=scanned_at_ns,
+            entries=tuple(entries),
+            stat=stat
+        )
+
+    @cached_property
+    def names(self) -> tuple[str, ...]:
+        """Names of all entries (both files and directories)."""
+        return tuple(entry.name for entry in self.entries)
+
+    @cached_property
+    def file_names(self) -> tuple[str, ...]:
+        """Names of all entries which are not directories."""
+        return tuple(
+            entry.name for entry in self.entries if not entry.is_dir
+        )
+
+    @cached_property
+    def extensions(self) -> frozenset[str]:
+        """Extensions of all entries which are not directories."""
+        return frozenset(
+            entry.extension for entry in self.entries if not entry.is_dir
+        )
+
+    @cached_property
+    def extension_stats(self) -> dict[str, ExtensionStats]:
+        """
+        Number and total size of files (entries which are not
+        directories) by extension, sorted by extension.
+        Sizes are taken from `file_info`, so every file is stat'ed
+        at most once for both.
+        """
+        file_info: dict[str, FileInfo] = self.file_info
+        counts: dict[str, int] = {}
+        sizes: dict[str, int] = {}
+        for entry in self.entries:
+            if entry.is_dir:
+                continue
+            counts[entry.extension] = counts.get(entry.extension, 0) + 1
+            sizes[entry.extension] = (
+                sizes.get(entry.extension, 0) + file_info[entry.name].size
+            )
+        return {
+            extension: ExtensionStats(counts[extension], sizes[extension])
+            for extension in sorted(counts)
+        }
+
+    @cached_property
+    def file_info(self) -> dict[str, FileInfo]:
+        """
+        Names, inodes, sizes and modification times of files
+        (entries which are not directories) by name. Sizes
+        and modification times not taken during the scan take
+        one `stat` call per file (but no additional pass
+        over the directory).
+        """
+        file_info: dict[str, FileInfo] = {}
+        for entry in self.entries:
+            if entry.is_dir:
+                continue
+            size: int = entry.size
+            mtime_ns: int = entry.mtime_ns
+            if size < 0 or mtime_ns < 0:
+                try:
+                    file_stat: os.stat_result = self.stat(
+                        os.path.join(self.path, entry.name)
+                    )
+                    size = file_stat.st_size
+                    mtime_ns = file_stat.st_mtime_ns
+                except OSError:
+                    size = 0
+                    mtime_ns = 0
+            file_info[entry.name] = FileInfo(
+                entry.name,
+                entry.inode,
+                size,
+                mtime_ns
+            )
+        return file_info
+
+    @cached_property
+    def inodes(self) -> dict[str, int]:
+        """Inodes of all entries by name (`0` if unknown)."""
+        return {entry.name: entry.inode for entry in self.entries}
+
+    def is_stale(self) -> bool:
+        """Check whether the directory could have changed since the scan.
+
+        Returns `True` if the directory's mtime changed, the directory
+        is no longer accessible or the mtime was too close to the scan time
+        to tell (see `RACY_WINDOW_NS`).
+        """
+        try:
+            current_mtime_ns: int = self.stat(self.path).st_mtime_ns
+        except OSError:
+            return True
+        if current_mtime_ns != self.mtime_ns:
+            return True
+        return self.mtime_ns >= self.scanned_at_ns - RACY_WINDOW_NS
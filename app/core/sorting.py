@@ -0,0 +1,155 @@
+"""
+This module holds the sort orders used by BatchFileRenamer
+to decide in which order files are numbered (by name, naturally
+by name, by modification time, by size, by capture time
+or by any other key).
+Keys are cached by order and file identity, so sorting the same files
+again (e.g. for a new preview) computes no key twice. Orders by name
+take identities from the directory snapshot, without file system calls,
+orders by size or modification time take one `stat` call per file
+every time they sort (files may have been edited since the scan).
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from re import Pattern
+from typing import Any
+
+from .snapshot import FileInfo
+
+
+@dataclass(frozen=True)
+class SortOrder:
+    """Order in which files are numbered.
+
+    Attributes:
+        name (str): Name of the order (e.g. chosen with `--sort`).
+            Sort keys are cached by the order itself, not its name.
+        key (Callable[[FileInfo], Any]): Returns the sort key of a file.
+        needs_stat (bool): Whether `key` uses the size or modification
+            time of the file, which may take a `stat` call per file.
+        needs_metadata (bool): Whether `key` uses the capture time
+            of the file, which takes reading its header.
+    """
+    name: str
+    key: Callable[[FileInfo], Any]
+    needs_stat: bool = False
+    needs_metadata: bool = False
+
+
+NUMBER_PATTERN: Pattern = re.compile(r"(\d+)")
+
+# Maximum number of sort keys kept by a `SortKeyCache`
+SORT_KEY_CACHE_SIZE: int = 100_000
+
+_MISSING: object = object()
+
+
+def natural_key(name: str) -> tuple[tuple[Any, ...], str]:
+    """
+    Returns a key sorting names with numbers in the numeric order
+    (`IMG_9` before `IMG_10`), case-insensitively.
+    Text and numbers alternate in the first part of the key, starting
+    with text, so they are never compared with each other.
+    """
+    parts: list[str] = NUMBER_PATTERN.split(name)
+    return tuple(
+        int(part) if i % 2 else part.casefold()
+        for i, part in enumerate(parts)
+    ), name
+
+
+# Names are the last part of every key, so that files
+# with equal keys are always numbered in the same order
+NAME_ORDER: SortOrder = SortOrder("name", lambda file: file.name)
+NATURAL_ORDER: SortOrder = SortOrder(
+    "natural",
+    lambda file: natural_key(file.name)
+)
+MTIME_ORDER: SortOrder = SortOrder(
+    "mtime",
+    lambda file: (file.mtime_ns, file.name),
+    needs_stat=True
+)
+SIZE_ORDER: SortOrder = SortOrder(
+    "size",
+    lambda file: (file.size, file.name),
+    needs_stat=True
+)
+
+# Files without a known capture time are numbered after the others,
+# by modification time
+CAPTURE_TIME_ORDER: SortOrder = SortOrder(
+    "capture_time",
+    lambda file: (
+        file.capture_time is None,
+        file.capture_time or datetime.min,
+        file.mtime_ns,
+        file.name
+    ),
+    needs_stat=True,
+    needs_metadata=True
+)
+
+SORT_ORDERS: dict[str, SortOrder] = {
+    order.name: order
+    for order in (
+        NAME_ORDER,
+        NATURAL_ORDER,
+        MTIME_ORDER,
+        SIZE_ORDER,
+        CAPTURE_TIME_ORDER
+    )
+}
+
+
+class SortKeyCache:
+    """Sort keys by order and file identity.
+
+    A file's identity is its name, inode, size and modification time,
+    so a key is computed again only if the file was renamed, replaced
+    or modified. Keys are cached by the order itself (not its name),
+    so orders sharing a name never share keys. At most `max_size` keys
+    are kept, the least recently used are forgotten first.
+    Safe to use from multiple threads.
+    """
+
+    def __init__(self, max_size: int = SORT_KEY_CACHE_SIZE) -> None:
+        self.max_size: int = max_size
+        self._lock: threading.Lock = threading.Lock()
+        self._keys: OrderedDict[tuple[SortOrder, FileInfo], Any] = (
+            OrderedDict()
+        )
+
+    def get_keys(
+            self,
+            sort_order: SortOrder,
+            files: Iterable[FileInfo]
+    ) -> dict[str, Any]:
+        """Returns sort keys of the files by name."""
+        keys: dict[str, Any] = {}
+        with self._lock:
+            cached_keys: OrderedDict[tuple[SortOrder, FileInfo], Any] = (
+                self._keys
+            )
+            for file in files:
+                cache_key: tuple[SortOrder, FileInfo] = (sort_order, file)
+                key: Any = cached_keys.get(cache_key, _MISSING)
+                if key is _MISSING:
+                    key = sort_order.key(file)
+                    cached_keys[cache_key] = key
+                    if len(cached_keys) > self.max_size:
+                        cached_keys.popitem(last=False)
+                else:
+                    cached_keys.move_to_end(cache_key)
+                keys[file.name] = key
+        return keys
+
+    def clear(self) -> None:
+        """Forget all cached keys."""
+        with self._lock:
+            self._keys.clear()
@@ -0,0 +1,83 @@
+"""
+This module holds the name templates used by BatchFileRenamer to
+recognise files which already have a new name with a number
+(`<new name>_<number>` with or without an extension), without a regex.
+A template checks the prefix and scans the digits, returning the number
+in the same pass. Compiled templates and validation patterns are cached,
+so they are built once per new name, not once per call.
+"""
+
+import re
+from functools import lru_cache
+from re import Pattern
+
+
+# Number of compiled templates and validation patterns kept in the caches
+TEMPLATE_CACHE_SIZE: int = 64
+
+
+class NameTemplate:
+    """Template of names with the new name and a number.
+
+    A name matches the template if it is the new name, followed by `_`,
+    the number padded with zeros to `number_padding` digits (the same as
+    the names given by the renamer) and optionally an extension.
+    The new name is compared as text, so it may contain any characters.
+
+    Attributes:
+        new_batch_name (str): New name applied to the files.
+        number_padding (int): The minimum length of the numbers.
+        prefix (str): The new name followed by `_`.
+    """
+
+    __slots__ = ("new_batch_name", "number_padding", "prefix")
+
+    def __init__(self, new_batch_name: str, number_padding: int) -> None:
+        self.new_batch_name: str = new_batch_name
+        self.number_padding: int = number_padding
+        self.prefix: str = f"{new_batch_name}_"
+
+    def match(self, name: str) -> int | None:
+        """
+        Returns the number of a matching name, or `None`
+        if the name doesn't match the template.
+        """
+        if not name.startswith(self.prefix):
+            return None
+        start: int = len(self.prefix)
+        # Digits end at the extension, if there is one
+        end: int = name.find(".", start)
+        digits: str = name[start:] if end == -1 else name[start:end]
+        # Numbers longer than the padding are never padded with zeros
+        if not (
+            len(digits) == self.number_padding
+            or len(digits) > self.number_padding and digits[0] != "0"
+        ) or not (digits.isascii() and digits.isdigit()):
+            return None
+        number: int = int(digits)
+        return number if number > 0 else None
+
+    def format(self, number: int, extension: str = "") -> str:
+        """Returns the name with the `number` and `extension`."""
+        padded_number: str = str(number).zfill(self.number_padding)
+        return f"{self.prefix}{padded_number}{extension}"
+
+    def __repr__(self) -> str:
+        return (
+            f"NameTemplate({self.new_batch_name!r}, {self.number_padding})"
+        )
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def get_name_template(
+        new_batch_name: str,
+        number_padding: int
+) -> NameTemplate:
+    """Returns the (cached) template of names with the new name."""
+    return NameTemplate(new_batch_name, number_padding)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def get_validation_pattern(pattern: str) -> Pattern:
+    """Returns the (cached) compiled pattern validating new names."""
+    return re.compile(pattern)
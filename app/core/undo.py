@@ -0,0 +1,194 @@
+"""
+This module holds the undo logs used by BatchFileRenamer.
+During every batch, each executed rename is appended to a gzip-compressed
+JSON lines file, together with the identity (device and inode)
+of the directory and of every renamed file, and read back as a compact
+reverse map (current name -> original name). Undoing a batch replays
+the reverse map through the same execution path as renaming, without
+scanning the directory, and skips files which were replaced since
+the batch.
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+
+
+DEFAULT_UNDO_LOG_DIR: str = os.path.join(
+    os.path.expanduser("~"),
+    ".batch-file-renamer",
+    "undo"
+)
+UNDO_LOG_SUFFIX: str = ".undo.jsonl.gz"
+# Logs of version 2 hold every executed rename, in the order of execution
+UNDO_LOG_VERSION: int = 2
+
+
+@dataclass
+class UndoLog:
+    """Reverse map of a single batch.
+
+    Attributes:
+        directory (str): Absolute path to the directory of the batch.
+        device (int): Device of the directory.
+        inode (int): Inode of the directory.
+        entries (list[tuple[str, str, int]]): Current name, original name
+            and inode of every renamed file (inode is `0` if unknown).
+    """
+    directory: str
+    device: int
+    inode: int
+    entries: list[tuple[str, str, int]] = field(default_factory=list)
+
+
+class UndoLogRecorder:
+    """Appends executed renames of a batch to a new undo log.
+
+    Every rename is written (and flushed to the operating system)
+    as soon as it's executed, so the log is complete even if the process
+    dies in the middle of the batch. Renames through temporary names
+    (see `get_rename_chains`) are written as they happen and collapsed
+    when the log is read (see `read_undo_log`), so that the recorder
+    keeps nothing in memory. The log is created with the first rename.
+    """
+
+    def __init__(
+            self,
+            directory: str,
+            directory_stat: os.stat_result,
+            inodes: dict[str, int],
+            log_dir: str
+    ) -> None:
+        """Initialise the recorder.
+
+        Args:
+            directory (str): Path to the directory of the batch.
+            directory_stat (os.stat_result): Result of `stat` (or `fstat`
+                of the open directory) identifying the directory.
+            inodes (dict[str, int]): Inodes of files to be renamed,
+                by name. Names are removed once their files are renamed.
+            log_dir (str): Directory in which the undo log is created.
+        """
+        self.directory: str = os.path.abspath(directory)
+        self.device: int = directory_stat.st_dev
+        self.inode: int = directory_stat.st_ino
+        self.inodes: dict[str, int] = inodes
+        self.log_dir: str = log_dir
+        self.path: str | None = None
+        self._file: gzip.GzipFile | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def record(self, old_name: str, new_name: str, renamed: bool) -> None:
+        """Record a rename. Can be used as a `step_callback`."""
+        if not renamed:
+            return
+        with self._lock:
+            if self._file is None:
+                self._file = self._create()
+            self._write_line(
+                [new_name, old_name, self.inodes.pop(old_name, 0)]
+            )
+
+    def close(self) -> str | None:
+        """
+        Close the undo log. Returns its path, or `None`
+        if no file was renamed (and so no log was created).
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        return self.path
+
+    def _create(self) -> gzip.GzipFile:
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.path = os.path.join(
+            self.log_dir,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09}"
+            # Directories of a recursive batch are recorded in parallel
+            f"-{os.getpid()}{UNDO_LOG_SUFFIX}"
+        )
+        self._file = gzip.GzipFile(self.path, "xb")
+        self._write_line({
+            "directory": self.directory,
+            "device": self.device,
+            "inode": self.inode,
+            "version": UNDO_LOG_VERSION
+        })
+        return self._file
+
+    def _write_line(self, record: object) -> None:
+        assert self._file is not None
+        self._file.write(
+            json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        )
+        # Compressed data is written out without ending the stream,
+        # so every complete line can be read after a crash
+        self._file.flush(zlib.Z_SYNC_FLUSH)
+
+
+def read_undo_log(path: str) -> UndoLog:
+    """Read the undo log written by `UndoLogRecorder`.
+
+    Renames through temporary names are collapsed, so only the original
+    and final names are kept. A log cut short by a crash is read
+    up to its last complete rename.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        header: dict = json.loads(file.readline())
+        undo_log: UndoLog = UndoLog(
+            directory=header["directory"],
+            device=header["device"],
+            inode=header["inode"]
+        )
+        lines: list[str] = []
+        try:
+            for line in file:
+                lines.append(line)
+        except EOFError:
+            pass
+    records: list[tuple[str, str, int]] = []
+    for line in lines:
+        try:
+            name, previous_name, inode = json.loads(line)
+        except ValueError:
+            # Only the last line can be incomplete
+            break
+        records.append((name, previous_name, inode))
+    if header.get("version", 1) < UNDO_LOG_VERSION:
+        # Logs of the first version only hold the collapsed renames
+        undo_log.entries = records
+        return undo_log
+    original_names: dict[str, str] = {}
+    inodes: dict[str, int] = {}
+    for name, previous_name, inode in records:
+        original_names[name] = original_names.pop(
+            previous_name,
+            previous_name
+        )
+        previous_inode: int = inodes.pop(previous_name, 0)
+        inodes[name] = inode or previous_inode
+    undo_log.entries = [
+        (name, original_name, inodes[name])
+        for name, original_name in original_names.items()
+        if name != original_name
+    ]
+    return undo_log
+
+
+def get_latest_undo_log(log_dir: str = DEFAULT_UNDO_LOG_DIR) -> str | None:
+    """Returns the path to the most recent undo log in `log_dir`, if any."""
+    try:
+        names: list[str] = [
+            name for name in os.listdir(log_dir)
+            if name.endswith(UNDO_LOG_SUFFIX)
+        ]
+    except FileNotFoundError:
+        return None
+    if not names:
+        return None
+    return os.path.join(log_dir, max(names))
@@ -0,0 +1,513 @@
+"""
+This module holds the watch mode of BatchFileRenamer, which numbers
+files as they arrive in a directory, instead of renaming all files
+again in a new batch. Numbers taken by files which already have
+a matching name are kept in memory, so numbering a new file takes
+a constant amount of work, whatever the size of the directory.
+Changes are reported by inotify on Linux, elsewhere the directory
+is polled.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import stat
+import struct
+import sys
+import time
+from collections.abc import Callable, Collection
+from typing import NamedTuple, Protocol
+
+from .cancellation import CancellationToken
+from .executor import RenameExecutor, open_directory
+from .renamer import Renamer
+from .snapshot import DirectorySnapshot
+from .template import NameTemplate, get_name_template
+from .undo import UndoLogRecorder
+
+
+logger = logging.getLogger(__name__)
+
+# Time (in seconds) without any change to a new file after which
+# it's considered complete (e.g. fully copied) and gets renamed
+SETTLE_TIME: float = 2.0
+
+# Time (in seconds) between two scans of a polled directory
+POLL_INTERVAL: float = 1.0
+
+# inotify event masks (see `man 7 inotify`)
+IN_MODIFY: int = 0x00000002
+IN_ATTRIB: int = 0x00000004
+IN_CLOSE_WRITE: int = 0x00000008
+IN_MOVED_FROM: int = 0x00000040
+IN_MOVED_TO: int = 0x00000080
+IN_CREATE: int = 0x00000100
+IN_DELETE: int = 0x00000200
+IN_DELETE_SELF: int = 0x00000400
+IN_MOVE_SELF: int = 0x00000800
+IN_Q_OVERFLOW: int = 0x00004000
+IN_IGNORED: int = 0x00008000
+IN_ISDIR: int = 0x40000000
+
+WATCH_MASK: int = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+CHANGED_MASK: int = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+)
+REMOVED_MASK: int = IN_MOVED_FROM | IN_DELETE
+CLOSED_MASK: int = IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED
+
+# `struct inotify_event` without the name which follows it
+INOTIFY_EVENT: struct.Struct = struct.Struct("iIII")
+INOTIFY_BUFFER_SIZE: int = 64 * 1024
+
+
+class DirectoryChanges(NamedTuple):
+    """Changes in a watched directory since the last read.
+
+    Attributes:
+        changed (set[str]): Names of entries which were created, moved
+            into the directory or written to.
+        removed (set[str]): Names of entries which were deleted
+            or moved out of the directory.
+        overflow (bool): Whether some changes were lost, so the directory
+            has to be scanned again to know its contents.
+        closed (bool): Whether the directory itself was deleted or moved,
+            so it can't be watched anymore.
+    """
+    changed: set[str]
+    removed: set[str]
+    overflow: bool = False
+    closed: bool = False
+
+
+class IDirectoryEvents(Protocol):
+    """Source of changes in a watched directory."""
+
+    def read_changes(self, timeout: float) -> DirectoryChanges:
+        """
+        Waits up to `timeout` seconds for changes and returns them
+        (no changes if there were none).
+        """
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+def load_libc() -> ctypes.CDLL | None:
+    """
+    Returns the C library if it provides inotify (on Linux),
+    otherwise `None`.
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc: ctypes.CDLL = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6",
+            use_errno=True
+        )
+    except OSError:
+        return None
+    if not hasattr(libc, "inotify_init1"):
+        return None
+    return libc
+
+
+class InotifyEvents:
+    """Changes in a directory reported by Linux inotify."""
+
+    def __init__(self, directory: str, libc: ctypes.CDLL) -> None:
+        """
+        Starts watching the directory. Raises `OSError` if inotify
+        can't be used (e.g. the limit of watches is reached).
+        """
+        self.fd: int = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno: int = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        if libc.inotify_add_watch(
+            self.fd,
+            os.fsencode(directory),
+            WATCH_MASK
+        ) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, os.strerror(errno), directory)
+
+    def read_changes(self, timeout: float) -> DirectoryChanges:
+        changes: DirectoryChanges = DirectoryChanges(set(), set())
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return changes
+        while True:
+            try:
+                data: bytes = os.read(self.fd, INOTIFY_BUFFER_SIZE)
+            except BlockingIOError:
+                return changes
+            position: int = 0
+            while position < len(data):
+                _, mask, _, length = INOTIFY_EVENT.unpack_from(
+                    data,
+                    position
+                )
+                position += INOTIFY_EVENT.size
+                name: str = os.fsdecode(
+                    data[position:position + length].rstrip(b"\x00")
+                )
+                position += length
+                if mask & IN_Q_OVERFLOW:
+                    changes = changes._replace(overflow=True)
+                elif mask & CLOSED_MASK:
+                    changes = changes._replace(closed=True)
+                elif mask & IN_ISDIR:
+                    continue
+                elif mask & REMOVED_MASK:
+                    changes.changed.discard(name)
+                    changes.removed.add(name)
+                elif mask & CHANGED_MASK:
+                    changes.changed.add(name)
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingEvents:
+    """Changes in a directory found by scanning it periodically.
+
+    Every scan takes one `stat` call per entry, so it's only used
+    where inotify is not available.
+    """
+
+    def __init__(
+            self,
+            directory: str,
+            interval: float = POLL_INTERVAL
+    ) -> None:
+        self.directory: str = directory
+        self.interval: float = interval
+        self.entries: dict[str, tuple[int, int, int]] = self._scan()
+        self._last_scan: float = time.monotonic()
+
+    def _scan(self) -> dict[str, tuple[int, int, int]]:
+        """Returns the inode, size and mtime of every file by name."""
+        entries: dict[str, tuple[int, int, int]] = {}
+        with os.scandir(self.directory) as directory_entries:
+            for entry in directory_entries:
+                try:
+                    if entry.is_dir():
+                        continue
+                    entry_stat: os.stat_result = entry.stat()
+                except OSError:
+                    continue
+                entries[entry.name] = (
+                    entry_stat.st_ino,
+                    entry_stat.st_size,
+                    entry_stat.st_mtime_ns
+                )
+        return entries
+
+    def read_changes(self, timeout: float) -> DirectoryChanges:
+        until_scan: float = (
+            self._last_scan + self.interval - time.monotonic()
+        )
+        if until_scan > 0:
+            time.sleep(min(timeout, until_scan))
+            if until_scan > timeout:
+                return DirectoryChanges(set(), set())
+        try:
+            entries: dict[str, tuple[int, int, int]] = self._scan()
+        except OSError:
+            return DirectoryChanges(set(), set(), closed=True)
+        self._last_scan = time.monotonic()
+        changes: DirectoryChanges = DirectoryChanges(
+            changed={
+                name for name, entry in entries.items()
+                if self.entries.get(name) != entry
+            },
+            removed=self.entries.keys() - entries.keys()
+        )
+        self.entries = entries
+        return changes
+
+    def close(self) -> None:
+        pass
+
+
+def watch_directory_events(directory: str) -> IDirectoryEvents:
+    """
+    Returns the source of changes in the directory: inotify
+    if available, otherwise polling.
+    """
+    libc: ctypes.CDLL | None = load_libc()
+    if libc is not None:
+        try:
+            return InotifyEvents(directory, libc)
+        except OSError as e:
+            logger.warning(
+                "Can't watch %s with inotify (%s), polling it instead",
+                directory,
+                e
+            )
+    return PollingEvents(directory)
+
+
+class DirectoryWatcher:
+    """Numbers files as they arrive in a directory.
+
+    Numbers of files which already have a matching name
+    (`<new name>_<number>[.<extension>]`) are kept in `numbers`,
+    so each new file gets the lowest free number without the directory
+    being listed again. Numbers of removed files become free again.
+    Files are renamed once they haven't changed for `settle_time`
+    seconds, in the order of arrival, by a `RenameExecutor` (so renames
+    are logged, rate-limited, and measured the same as in a batch).
+
+    Attributes:
+        directory (str): Path to the watched directory.
+        numbers (dict[str, int]): Numbers of files with matching names
+            by name, including the files renamed by the watcher.
+        pending (dict[str, float]): Time (of `time.monotonic`)
+            of the last change of every new file, by name.
+        executor (RenameExecutor): Executor renaming the files. Its names
+            are the names in `numbers`, the only ones which files
+            could be renamed to.
+    """
+
+    def __init__(
+            self,
+            renamer: Renamer,
+            directory: str,
+            extensions: Collection[str] | None,
+            new_batch_name: str,
+            number_padding: int,
+            settle_time: float = SETTLE_TIME,
+            step_callback: Callable[[str, str, bool], None] | None = None,
+            events: IDirectoryEvents | None = None
+    ) -> None:
+        """Initialise the watcher, scanning the directory once.
+
+        Args:
+            renamer (Renamer): Renamer whose settings (e.g. the undo log
+                directory and instrumentation) are used.
+            directory (str): Path to the directory to watch.
+            extensions (Collection[str] | None): Only files with one
+                of these extensions are renamed. All files are renamed
+                if `None`.
+            new_batch_name (str): New name to be applied to the files.
+            number_padding (int): The minimum length of the numbers.
+            settle_time (float): See `SETTLE_TIME`.
+            step_callback (Callable[[str, str, bool], None] | None):
+                Called after every rename with the old name, the new name
+                and whether the file was renamed.
+            events (IDirectoryEvents | None): Source of changes,
+                by default inotify or polling
+                (see `watch_directory_events`).
+        """
+        self.renamer: Renamer = renamer
+        self.directory: str = directory
+        self.extensions: frozenset[str] | None = (
+            None if extensions is None else frozenset(extensions)
+        )
+        self.template: NameTemplate = get_name_template(
+            new_batch_name,
+            number_padding
+        )
+        self.settle_time: float = settle_time
+        self.step_callback: Callable[[str, str, bool], None] | None = (
+            step_callback
+        )
+        self.numbers: dict[str, int] = {}
+        self.pending: dict[str, float] = {}
+        self._taken_numbers: set[int] = set()
+        # Lowest number which may be free
+        self._next_number: int = 1
+        self._undo_log_recorder: UndoLogRecorder | None = None
+        self.executor: RenameExecutor = RenameExecutor(
+            directory,
+            (),
+            all_names=False
+        )
+        self.executor.instrumentation = renamer.instrumentation
+        # Watch before the scan, so that no arriving file is missed
+        self.events: IDirectoryEvents = (
+            events if events is not None
+            else watch_directory_events(directory)
+        )
+        self._scan()
+
+    def get_number(self, name: str) -> int | None:
+        """
+        Returns the number of a matching name, or `None`
+        if the name doesn't match the new one.
+        """
+        return self.template.match(name)
+
+    def is_wanted(self, name: str) -> bool:
+        """Checks whether the file should be numbered."""
+        return (
+            self.extensions is None
+            or os.path.splitext(name)[1] in self.extensions
+        )
+
+    def _scan(self) -> None:
+        """
+        Scan the directory, taking the numbers of matching files
+        and marking the other wanted files as pending. Numbers
+        are taken again from scratch, so that numbers of files
+        removed since the last scan (e.g. with lost changes) are free.
+        """
+        with self.renamer._stage("scan"):
+            snapshot: DirectorySnapshot = DirectorySnapshot.scan(
+                self.directory,
+                stat=self.renamer._stat
+            )
+        names: frozenset[str] = frozenset(snapshot.file_names)
+        self.numbers.clear()
+        self._taken_numbers.clear()
+        self._next_number = 1
+        self.executor.names.clear()
+        for name in list(self.pending):
+            if name not in names:
+                del self.pending[name]
+        now: float = time.monotonic()
+        for name in sorted(names):
+            if not self.is_wanted(name):
+                continue
+            number: int | None = self.get_number(name)
+            if number is not None and number not in self._taken_numbers:
+                self.pending.pop(name, None)
+                self._take_number(name, number)
+            else:
+                self.pending.setdefault(name, now)
+
+    def _take_number(self, name: str, number: int) -> None:
+        self.numbers[name] = number
+        self._taken_numbers.add(number)
+        self.executor.names.add(name)
+
+    def _free_number(self, name: str) -> None:
+        number: int | None = self.numbers.pop(name, None)
+        if number is None:
+            return
+        self._taken_numbers.discard(number)
+        self._next_number = min(self._next_number, number)
+        self.executor.names.discard(name)
+
+    def _get_free_number(self) -> int:
+        while self._next_number in self._taken_numbers:
+            self._next_number += 1
+        return self._next_number
+
+    def process_changes(self, timeout: float) -> None:
+        """
+        Wait up to `timeout` seconds for changes in the directory
+        and rename the new files which have settled.
+        Raises `OSError` if the directory can't be watched anymore.
+        """
+        changes: DirectoryChanges = self.events.read_changes(timeout)
+        if changes.closed:
+            raise OSError(f"{self.directory} was removed or moved")
+        now: float = time.monotonic()
+        for name in changes.removed:
+            self._free_number(name)
+            self.pending.pop(name, None)
+        for name in changes.changed:
+            # Names with numbers include the watcher's own renames
+            if name in self.numbers or not self.is_wanted(name):
+                continue
+            # Moved to the end, so files are renamed in order of arrival
+            self.pending.pop(name, None)
+            self.pending[name] = now
+        if changes.overflow:
+            logger.warning(
+                "Changes in %s were lost, scanning it again",
+                self.directory
+            )
+            self._scan()
+            # Files found by the scan arrived no earlier than the scan
+            now = time.monotonic()
+        self._rename_settled(now)
+
+    def _rename_settled(self, now: float) -> None:
+        """Rename pending files which haven't changed for a while."""
+        for name, changed_at in list(self.pending.items()):
+            if now - changed_at < self.settle_time:
+                # Files are in the order of their last change
+                break
+            del self.pending[name]
+            try:
+                file_stat: os.stat_result = self.renamer._lstat_entry(
+                    self.directory,
+                    self.executor.dir_fd,
+                    name
+                )
+            except OSError:
+                continue
+            # Directories (and links to them) are never renamed,
+            # the same as in a batch
+            if stat.S_ISDIR(file_stat.st_mode) or (
+                stat.S_ISLNK(file_stat.st_mode)
+                and os.path.isdir(os.path.join(self.directory, name))
+            ):
+                continue
+            number: int | None = self.get_number(name)
+            if number is not None and number not in self._taken_numbers:
+                self._take_number(name, number)
+                continue
+            self._rename(name, file_stat.st_ino)
+
+    def _rename(self, name: str, inode: int) -> None:
+        extension: str = os.path.splitext(name)[1]
+        while True:
+            number: int = self._get_free_number()
+            new_name: str = self.template.format(number, extension)
+            if not self.renamer._lexists(self.directory, new_name):
+                break
+            # Taken by a file which hasn't settled yet or is ignored
+            self._take_number(new_name, number)
+        with self.renamer._stage("execute"):
+            renamed: bool = self.executor.rename(name, new_name)
+        if renamed:
+            self._take_number(new_name, number)
+            if self._undo_log_recorder is not None:
+                self._undo_log_recorder.inodes[name] = inode
+                self._undo_log_recorder.record(name, new_name, True)
+        if self.step_callback is not None:
+            self.step_callback(name, new_name, renamed)
+
+    def run(
+            self,
+            cancellation_token: CancellationToken | None = None,
+            timeout: float = POLL_INTERVAL
+    ) -> None:
+        """
+        Number arriving files until cancelled (or interrupted).
+        Renames are recorded in a single undo log as they are executed,
+        if the renamer records undo logs.
+        """
+        logger.info("Watching %s for new files", self.directory)
+        self.executor.dir_fd = open_directory(self.directory)
+        try:
+            self._undo_log_recorder = self.renamer._create_undo_log_recorder(
+                self.directory,
+                self.executor.dir_fd,
+                {}
+            )
+            while (
+                cancellation_token is None
+                or not cancellation_token.should_stop()
+            ):
+                self.process_changes(timeout)
+        finally:
+            self.events.close()
+            if self.executor.dir_fd is not None:
+                os.close(self.executor.dir_fd)
+                self.executor.dir_fd = None
+            if self._undo_log_recorder is not None:
+                self.renamer._close_undo_log_recorder(self._undo_log_recorder)
+                self._undo_log_recorder = None
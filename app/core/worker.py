@@ -26,12 +26,17 @@ class WorkerSignals(QObject):
 
     progress
         float indicating task progress
+
+    partial_result
+        object data available before the task is finished, anything
+        (only emitted by tasks which are given the signal)
     """
 
     finished = Signal()
     error = Signal(tuple)
     result = Signal(object)
     progress = Signal(float)
+    partial_result = Signal(object)
 
 
 class Worker(QRunnable):
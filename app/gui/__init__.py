@@ -1 +1 @@
-__all__ = ['app_main_window', 'extension_checkbox']
\ No newline at end of file
+__all__ = ['app_main_window', 'extension_list_model', 'renaming_preview_model']
\ No newline at end of file
@@ -1,8 +1,13 @@
 import logging
 import os
+from collections.abc import Callable, Iterator
+from typing import Any
 
 from PySide6.QtCore import (
+    QSortFilterProxyModel,
     QThreadPool,
+    QTimer,
+    Qt,
     Slot
 )
 from PySide6.QtWidgets import (
@@ -10,24 +15,64 @@ from PySide6.QtWidgets import (
     QLabel,
     QPushButton,
     QSpinBox,
+    QCheckBox,
+    QComboBox,
     QLineEdit,
     QGroupBox,
     QVBoxLayout,
+    QHBoxLayout,
     QGridLayout,
     QFileDialog,
     QMessageBox,
+    QListView,
+    QTableView,
+    QHeaderView,
 )
 from PySide6.QtGui import (
     QResizeEvent
 )
 
-from app.gui.extension_checkbox import ExtensionCheckbox
-from app.core.models import IRenamer
-from app.core.worker import Worker
+from app.gui.extension_list_model import ExtensionListModel, format_size
+from app.gui.renaming_preview_model import RenamingPreviewModel
+from app.core.cancellation import CancellationToken
+from app.core.duplicates import SKIP_DUPLICATES, SUFFIX_DUPLICATES
+from app.core.models import IRenamer, ISignal
+from app.core.preview import RenamingPreview
+from app.core.recursive import DirectoryResult, rename_tree
+from app.core.report import BatchReport
+from app.core.snapshot import DirectorySnapshot, ExtensionStats
+from app.core.sorting import (
+    CAPTURE_TIME_ORDER,
+    MTIME_ORDER,
+    NAME_ORDER,
+    NATURAL_ORDER,
+    SIZE_ORDER,
+    SORT_ORDERS,
+    SortOrder
+)
+from app.core.worker import Worker, WorkerSignals
 
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG)
+
+# Time (in milliseconds) without typing after which the preview is updated
+PREVIEW_DEBOUNCE_MS: int = 300
+
+# Labels of the orders in which files can be numbered
+SORT_ORDER_LABELS: dict[SortOrder, str] = {
+    NAME_ORDER: "Name",
+    NATURAL_ORDER: "Name (numbers by value)",
+    MTIME_ORDER: "Modification time",
+    SIZE_ORDER: "Size",
+    CAPTURE_TIME_ORDER: "Capture date (from EXIF / video headers)",
+}
+
+# Labels of what can be done with files identical to another one
+DUPLICATE_ACTION_LABELS: dict[str | None, str] = {
+    None: "Number them as any other file",
+    SKIP_DUPLICATES: "Skip them",
+    SUFFIX_DUPLICATES: "Name them after the first one, with a suffix",
+}
 
 
 class AppLayout(QWidget):
@@ -39,15 +84,34 @@ class AppLayout(QWidget):
 
         self.threadpool = QThreadPool()
         thread_count = self.threadpool.maxThreadCount()
-        logger.info(f"Multithreading with maximum {thread_count} threads.")
+        logger.info("Multithreading with maximum %d threads.", thread_count)
 
         self.renamer = renamer
 
         self.directory: str = ""
         self.number_padding: int = 0
         self.number_padding_chosen: bool = False
-        self.extensions: list[str] = []
-        self.checkboxes: list[ExtensionCheckbox] = []
+        self.extension_model = ExtensionListModel(self)
+        # Chosen extensions, checked in the extension choosing panel
+        self.extensions: set[str] = self.extension_model.checked_extensions
+        # Token of the running batch, if it can be cancelled
+        self.cancellation_token: CancellationToken | None = None
+        # Token and signals of the running directory scan. Signals
+        # of other (outdated) scans are ignored
+        self.scan_token: CancellationToken | None = None
+        self.scan_signals: WorkerSignals | None = None
+        # Preview of the chosen files (directory, extensions, order
+        # and duplicate action), reused while only the new name
+        # or padding changes
+        self.renaming_preview: RenamingPreview | None = None
+        self.renaming_preview_files: (
+            tuple[str, frozenset[str], str, str | None] | None
+        ) = None
+        # Signals and files of the preview being planned
+        self.preview_signals: WorkerSignals | None = None
+        self.pending_preview_files: (
+            tuple[str, frozenset[str], str, str | None] | None
+        ) = None
 
         # Create and configure PyQt elements
         self.directory_label = QLabel("Directory with files to rename: ", self)
@@ -57,14 +121,62 @@ class AppLayout(QWidget):
         )
         self.new_name_preview_label = QLabel("", self)
         self.new_name_preview_label.setWordWrap(True)
+        self.preview_model = RenamingPreviewModel(self)
+        self.preview_table = QTableView(self)
+        self.preview_table.setModel(self.preview_model)
+        self.preview_table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.ResizeMode.Stretch
+        )
+        # Rows are never measured one by one
+        self.preview_table.verticalHeader().setSectionResizeMode(
+            QHeaderView.ResizeMode.Fixed
+        )
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(PREVIEW_DEBOUNCE_MS)
         new_name_label = QLabel("New name for this file batch", self)
         self.number_padding_label = QLabel("Length of \"0\" padding", self)
         self.number_padding_spin_box = QSpinBox(self)
         self.number_padding_spin_box.setMinimum(1)
         self.number_padding_spin_box.setMaximum(10)
         self.new_name_input = QLineEdit(self)
+        self.sort_order_label = QLabel("Number files by", self)
+        self.sort_order_combo_box = QComboBox(self)
+        for sort_order, label in SORT_ORDER_LABELS.items():
+            self.sort_order_combo_box.addItem(label, sort_order.name)
+        self.sort_order_combo_box.setToolTip(
+            "Order in which files get their numbers. Files which already "
+            "have matching names and numbers keep them."
+        )
+        self.duplicate_action_label = QLabel("Identical files", self)
+        self.duplicate_action_combo_box = QComboBox(self)
+        for duplicate_action, label in DUPLICATE_ACTION_LABELS.items():
+            self.duplicate_action_combo_box.addItem(label, duplicate_action)
+        self.duplicate_action_combo_box.setToolTip(
+            "What to do with files with the same contents as another one "
+            "in the batch (only the first of them is numbered)."
+        )
+        self.parallelism_label = QLabel("Parallel renames", self)
+        self.parallelism_spin_box = QSpinBox(self)
+        self.parallelism_spin_box.setMinimum(1)
+        self.parallelism_spin_box.setMaximum(32)
+        self.parallelism_spin_box.setToolTip(
+            "Number of renames executed at the same time. "
+            "Values above 1 speed up renaming on network drives."
+        )
+        self.recursive_checkbox = QCheckBox(
+            "Also rename files in all subdirectories "
+            "(each subdirectory is numbered separately)",
+            self
+        )
         self.rename_files_btn = QPushButton("Rename files", self)
         self.rename_files_btn.setEnabled(False)
+        self.undo_btn = QPushButton("Undo last batch", self)
+        self.undo_btn.setEnabled(False)
+        self.pause_btn = QPushButton("Pause", self)
+        self.pause_btn.setEnabled(False)
+        self.cancel_btn = QPushButton("Cancel", self)
+        self.cancel_btn.setEnabled(False)
         self.directory_group_box = QGroupBox("Directory", self)
         self.renaming_group_box = QGroupBox("Renaming", self)
         self.renaming_group_box.setEnabled(False)
@@ -73,6 +185,29 @@ class AppLayout(QWidget):
             self
         )
         self.extensions_group_box.setEnabled(False)
+        self.extension_filter_input = QLineEdit(self)
+        self.extension_filter_input.setPlaceholderText("Filter extensions")
+        self.extension_filter_input.setClearButtonEnabled(True)
+        self.extension_filter_model = QSortFilterProxyModel(self)
+        self.extension_filter_model.setSourceModel(self.extension_model)
+        self.extension_filter_model.setFilterCaseSensitivity(
+            Qt.CaseSensitivity.CaseInsensitive
+        )
+        # Only filter again when the filter changes, not on every change
+        # of stats during a scan
+        self.extension_filter_model.setDynamicSortFilter(False)
+        self.extension_list_view = QListView(self)
+        self.extension_list_view.setModel(self.extension_filter_model)
+        # Rows are never measured one by one
+        self.extension_list_view.setUniformItemSizes(True)
+        self.select_all_extensions_btn = QPushButton("Select all", self)
+        self.select_all_extensions_btn.setToolTip(
+            "Select all extensions matching the filter"
+        )
+        self.select_no_extensions_btn = QPushButton("Select none", self)
+        self.select_no_extensions_btn.setToolTip(
+            "Unselect all extensions matching the filter"
+        )
 
         # Connect signals
         self.select_files_to_rename_btn.clicked.connect(
@@ -85,7 +220,29 @@ class AppLayout(QWidget):
             self.change_number_padding
         )
         self.number_padding_spin_box.valueChanged.connect(self.show_preview)
+        self.sort_order_combo_box.currentIndexChanged.connect(
+            self.schedule_renaming_preview
+        )
+        self.duplicate_action_combo_box.currentIndexChanged.connect(
+            self.schedule_renaming_preview
+        )
         self.rename_files_btn.clicked.connect(self.rename_files)
+        self.undo_btn.clicked.connect(self.undo_last_batch)
+        self.pause_btn.clicked.connect(self.toggle_pause)
+        self.cancel_btn.clicked.connect(self.cancel_batch)
+        self.preview_timer.timeout.connect(self.update_renaming_preview)
+        self.extension_filter_input.textChanged.connect(
+            self.extension_filter_model.setFilterFixedString
+        )
+        self.extension_model.selection_changed.connect(
+            self.handle_extension_selection_changed
+        )
+        self.select_all_extensions_btn.clicked.connect(
+            lambda: self.set_filtered_extensions_checked(True)
+        )
+        self.select_no_extensions_btn.clicked.connect(
+            lambda: self.set_filtered_extensions_checked(False)
+        )
 
         # Add PyQt elements to layout
         self.main_layout = QVBoxLayout(self)
@@ -99,24 +256,43 @@ class AppLayout(QWidget):
         directory_layout = QVBoxLayout()
         directory_layout.addWidget(self.directory_label)
         directory_layout.addWidget(self.select_files_to_rename_btn)
+        directory_layout.addWidget(self.undo_btn)
         self.directory_group_box.setLayout(directory_layout)
         self.main_layout.addWidget(self.directory_group_box)
 
-        self.checkboxes_layout = QGridLayout()
-        self.extensions_group_box.setLayout(self.checkboxes_layout)
+        extensions_layout = QVBoxLayout()
+        extensions_layout.addWidget(self.extension_filter_input)
+        extensions_layout.addWidget(self.extension_list_view)
+        extension_selection_layout = QHBoxLayout()
+        extension_selection_layout.addWidget(self.select_all_extensions_btn)
+        extension_selection_layout.addWidget(self.select_no_extensions_btn)
+        extensions_layout.addLayout(extension_selection_layout)
+        self.extensions_group_box.setLayout(extensions_layout)
         self.main_layout.addWidget(self.extensions_group_box)
 
         renaming_layout = QVBoxLayout()
         renaming_layout.addWidget(self.new_name_preview_label)
+        renaming_layout.addWidget(self.preview_table)
 
         grid_rename_layout = QGridLayout()
         grid_rename_layout.addWidget(self.number_padding_label, 0, 0)
         grid_rename_layout.addWidget(self.number_padding_spin_box, 0, 1)
         grid_rename_layout.addWidget(new_name_label, 1, 0)
         grid_rename_layout.addWidget(self.new_name_input, 1, 1)
+        grid_rename_layout.addWidget(self.sort_order_label, 2, 0)
+        grid_rename_layout.addWidget(self.sort_order_combo_box, 2, 1)
+        grid_rename_layout.addWidget(self.duplicate_action_label, 3, 0)
+        grid_rename_layout.addWidget(self.duplicate_action_combo_box, 3, 1)
+        grid_rename_layout.addWidget(self.parallelism_label, 4, 0)
+        grid_rename_layout.addWidget(self.parallelism_spin_box, 4, 1)
 
         renaming_layout.addLayout(grid_rename_layout)
+        renaming_layout.addWidget(self.recursive_checkbox)
         renaming_layout.addWidget(self.rename_files_btn)
+        batch_controls_layout = QHBoxLayout()
+        batch_controls_layout.addWidget(self.pause_btn)
+        batch_controls_layout.addWidget(self.cancel_btn)
+        renaming_layout.addLayout(batch_controls_layout)
 
         self.renaming_group_box.setLayout(renaming_layout)
         self.main_layout.addWidget(self.renaming_group_box)
@@ -158,7 +334,9 @@ class AppLayout(QWidget):
 
     @Slot()
     def enable_rename_files_btn(self):
-        """Enable the "Rename" button."""
+        """Enable the "Rename" button, unless a scan is running."""
+        if self.scan_token is not None:
+            return
         self.rename_files_btn.setEnabled(True)
         self.rename_files_btn.setText('Rename files')
 
@@ -193,14 +371,6 @@ class AppLayout(QWidget):
             return
         self.directory = selected_file
 
-        # If the padding was not manually chosen,
-        # create it automatically based on the number
-        # of digits in the count of files to rename
-        if not self.number_padding_chosen:
-            self.number_padding = len(str(len(os.listdir(self.directory))))
-            self.number_padding_spin_box.setValue(self.number_padding)
-            self.show_preview()
-
         if self.directory == os.getcwd():
             dlg = QMessageBox(self)
             dlg.setWindowTitle("Denied")
@@ -216,12 +386,92 @@ class AppLayout(QWidget):
         )
         self.extensions_group_box.setEnabled(True)
         self.clear_extension_choosing_panel()
-        self.create_extension_choosing_panel(
-            self.renamer.get_all_file_extensions(self.directory)
+        self.scan_directory()
+
+    def scan_directory(self) -> None:
+        """
+        Scan the chosen directory in the background, cancelling
+        the previous scan. Extensions are added to the extension
+        choosing panel as they are found.
+        """
+        self.cancel_scan()
+        self.scan_token = CancellationToken()
+        self.rename_files_btn.setEnabled(False)
+        self.rename_files_btn.setText("Scanning the directory...")
+
+        worker = Worker(
+            self.renamer.scan_directory,
+            path=self.directory,
+            cancellation_token=self.scan_token
+        )
+        worker.kwargs["partial_result_callback"] = (
+            worker.signals.partial_result
+        )
+        worker.signals.partial_result.connect(self.handle_scan_partial_result)
+        worker.signals.progress.connect(self.show_scan_progress)
+        worker.signals.result.connect(self.handle_scan_result)
+        worker.signals.error.connect(self.handle_scan_errors)
+        self.scan_signals = worker.signals
+
+        self.threadpool.start(worker)
+
+    def cancel_scan(self) -> None:
+        """Cancel the running directory scan, if any."""
+        if self.scan_token is not None:
+            self.scan_token.cancel()
+        self.scan_token = None
+        self.scan_signals = None
+
+    def is_current_scan(self) -> bool:
+        """Check whether the signal being handled is from the running scan."""
+        return (
+            self.scan_signals is not None
+            and self.sender() is self.scan_signals
+        )
+
+    def handle_scan_partial_result(
+            self,
+            extension_stats: dict[str, ExtensionStats]
+    ) -> None:
+        if not self.is_current_scan():
+            return
+        self.extension_model.add_stats(extension_stats)
+
+    def show_scan_progress(self, n: float) -> None:
+        if not self.is_current_scan():
+            return
+        self.rename_files_btn.setText(
+            f"Scanning the directory... {n:.0f} entries found"
+        )
+
+    def handle_scan_result(self, snapshot: DirectorySnapshot | None) -> None:
+        if not self.is_current_scan() or snapshot is None:
+            return
+        self.scan_token = None
+        self.scan_signals = None
+
+        # If the padding was not manually chosen,
+        # create it automatically based on the number
+        # of digits in the count of files to rename
+        if not self.number_padding_chosen:
+            self.number_padding = len(str(len(snapshot.names)))
+            # Not a choice of the user, so `change_number_padding`
+            # must not be called
+            self.number_padding_spin_box.blockSignals(True)
+            self.number_padding_spin_box.setValue(self.number_padding)
+            self.number_padding_spin_box.blockSignals(False)
+
+        self.show_preview()
+
+    def handle_scan_errors(self, exc: tuple[type, str, str]) -> None:
+        if not self.is_current_scan():
+            return
+        self.cancel_scan()
+        self.disable_and_clear_extension_and_renaming_panels()
+        self.show_error_message_messagebox(
+            "Can't scan the directory",
+            f"{exc[0].__name__}: {exc[1]}"
         )
-        self.rename_files_btn.setText('Rename files')
-        if self.new_name_input.text() != "":
-            self.rename_files_btn.setEnabled(True)
 
     def resizeEvent(self, event: QResizeEvent | None) -> None:
         """
@@ -251,8 +501,7 @@ class AppLayout(QWidget):
                     "2".zfill(self.number_padding)
                 )
             )
-            self.rename_files_btn.setEnabled(True)
-            self.rename_files_btn.setText("Rename files")
+            self.enable_rename_files_btn()
             self.new_name_preview_label.setStyleSheet(None)
         else:
             str_to_display = (
@@ -263,49 +512,181 @@ class AppLayout(QWidget):
             self.rename_files_btn.setText("Can't rename files")
             self.new_name_preview_label.setStyleSheet("color: red;")
         self.new_name_preview_label.setText(str_to_display)
+        self.schedule_renaming_preview()
+
+    def get_sort_order(self) -> SortOrder:
+        """Returns the order in which files are numbered."""
+        return SORT_ORDERS[self.sort_order_combo_box.currentData()]
 
-    def create_extension_choosing_panel(
+    def get_duplicate_action(self) -> str | None:
+        """
+        Returns what to do with files identical to another one,
+        `None` if they are numbered as any other file.
+        """
+        return self.duplicate_action_combo_box.currentData()
+
+    def schedule_renaming_preview(self) -> None:
+        """
+        Update the preview table once the user stops typing
+        (see `PREVIEW_DEBOUNCE_MS`), or clear it if there is nothing
+        to preview.
+        """
+        new_batch_name: str = self.new_name_input.text()
+        if (
+            self.directory
+            and self.extensions
+            and self.scan_token is None
+            and new_batch_name
+            and self.renamer.validate_new_name(new_batch_name)
+        ):
+            self.preview_timer.start()
+            return
+        self.preview_timer.stop()
+        self.preview_signals = None
+        self.preview_model.set_plan(None)
+
+    def update_renaming_preview(self) -> None:
+        """Plan the renaming of the chosen files in the background."""
+        sort_order: SortOrder = self.get_sort_order()
+        duplicate_action: str | None = self.get_duplicate_action()
+        files: tuple[str, frozenset[str], str, str | None] = (
+            self.directory,
+            frozenset(self.extensions),
+            sort_order.name,
+            duplicate_action
+        )
+        worker = Worker(
+            self.plan_renaming_preview,
+            directory=self.directory,
+            extensions=sorted(self.extensions),
+            sort_order=sort_order,
+            duplicate_action=duplicate_action,
+            preview=(
+                self.renaming_preview
+                if files == self.renaming_preview_files else None
+            ),
+            new_batch_name=self.new_name_input.text(),
+            number_padding=self.number_padding
+        )
+        worker.signals.result.connect(self.handle_preview_result)
+        worker.signals.error.connect(self.handle_preview_errors)
+        self.preview_signals = worker.signals
+        self.pending_preview_files = files
+
+        self.threadpool.start(worker)
+
+    def plan_renaming_preview(
             self,
-            extensions: set[str],
-            max_cols: int = 5
-    ) -> None:
-        # Make all columns the same width
-        for i in range(max_cols):
-            self.checkboxes_layout.setColumnMinimumWidth(i, 50)
-            self.checkboxes_layout.setColumnStretch(i, 1)
-
-        extensions_list: list[str] = sorted(list(extensions))
-        col: int = 0
-        row: int = 0
-        for extension in extensions_list:
-            extension_checkbox = ExtensionCheckbox(
-                extension, self,
-                self.extensions,
-                self.enable_rename_files_btn,
-                self.renaming_group_box
+            directory: str,
+            extensions: list[str],
+            sort_order: SortOrder,
+            duplicate_action: str | None,
+            preview: RenamingPreview | None,
+            new_batch_name: str,
+            number_padding: int,
+            progress_callback: ISignal | None = None
+    ) -> tuple[RenamingPreview, Iterator[tuple[str, str]]]:
+        """
+        Runs in a worker thread. Files are listed, sorted and checked
+        for duplicates only if the directory, the extensions, the order
+        or the duplicate action changed since the last preview
+        (`preview` is `None`).
+        """
+        if preview is None:
+            files_to_rename: list[str] = self.renamer.filter_extensions(
+                self.renamer.filter_directories(directory),
+                extensions
+            )
+            sort_key: Callable[[str], Any] | None = (
+                self.renamer.get_sort_key(
+                    directory,
+                    files_to_rename,
+                    sort_order
+                )
             )
-            if col == max_cols:
-                col = 0
-                row += 1
-            self.checkboxes_layout.addWidget(
-                extension_checkbox.checkbox,
-                row,
-                col
+            duplicates: dict[str, str] | None = None
+            if duplicate_action is not None:
+                files_to_rename.sort(key=sort_key)
+                duplicates = self.renamer.find_duplicates(
+                    directory,
+                    files_to_rename
+                )
+            preview = RenamingPreview(
+                self.renamer,
+                files_to_rename,
+                sort_key,
+                duplicates,
+                duplicate_action or SKIP_DUPLICATES
             )
-            col += 1
-            self.checkboxes.append(extension_checkbox)
+        return preview, preview.iter_plan(new_batch_name, number_padding)
+
+    def handle_preview_result(
+            self,
+            result: tuple[RenamingPreview, Iterator[tuple[str, str]]]
+    ) -> None:
+        if (
+            self.preview_signals is None
+            or self.sender() is not self.preview_signals
+        ):
+            return
+        self.preview_signals = None
+        self.renaming_preview, plan = result
+        self.renaming_preview_files = self.pending_preview_files
+        self.preview_model.set_plan(plan)
+
+    def handle_preview_errors(self, exc: tuple[type, str, str]) -> None:
+        logger.info(
+            "Error while planning the preview: %s. %s.",
+            exc[0].__name__,
+            exc[1]
+        )
+
+    def clear_renaming_preview(self) -> None:
+        """Forget the preview, e.g. once the files have been renamed."""
+        self.preview_timer.stop()
+        self.preview_signals = None
+        self.renaming_preview = None
+        self.renaming_preview_files = None
+        self.preview_model.set_plan(None)
+
+    def handle_extension_selection_changed(self) -> None:
+        """
+        Enable the renaming panel (and the "Rename" button)
+        only if any extension is chosen.
+        """
+        self.renaming_group_box.setEnabled(len(self.extensions) > 0)
+        if self.extensions:
+            self.enable_rename_files_btn()
+        self.schedule_renaming_preview()
+
+    def set_filtered_extensions_checked(self, checked: bool) -> None:
+        """Check or uncheck all extensions matching the filter."""
+        if not self.extension_filter_input.text():
+            self.extension_model.set_checked(
+                self.extension_model.extensions,
+                checked
+            )
+            return
+        self.extension_model.set_checked(
+            (
+                self.extension_filter_model.index(row, 0).data(
+                    Qt.ItemDataRole.UserRole
+                )
+                for row in range(self.extension_filter_model.rowCount())
+            ),
+            checked
+        )
 
     def clear_extension_choosing_panel(self) -> None:
-        for checkbox in self.checkboxes:
-            self.checkboxes_layout.removeWidget(checkbox.checkbox)
-            checkbox.checkbox.close()
-        self.checkboxes.clear()
-        self.extensions.clear()
+        self.extension_filter_input.clear()
+        self.extension_model.clear()
+        self.clear_renaming_preview()
 
     def disable_and_clear_extension_and_renaming_panels(self) -> None:
         """
         Disables both panels and clears extension panel
         """
+        self.cancel_scan()
         self.renaming_group_box.setEnabled(False)
         self.extensions_group_box.setEnabled(False)
         self.clear_extension_choosing_panel()
@@ -317,18 +698,42 @@ class AppLayout(QWidget):
         self.extensions_group_box.setEnabled(False)
 
         new_batch_name: str = self.new_name_input.text()
+        recursive: bool = self.recursive_checkbox.isChecked()
 
-        files_to_rename: list[str] = self.renamer.filter_extensions(
-            file_list=self.renamer.filter_directories(self.directory),
-            extensions=self.extensions
-        )
+        if recursive and os.path.commonpath(
+            [os.getcwd(), self.directory]
+        ) == os.path.normpath(self.directory):
+            self.show_error_message_messagebox(
+                "Denied",
+                "You can't rename files in a directory containing "
+                "this application."
+            )
+            self.rename_files_btn.setEnabled(True)
+            self.select_files_to_rename_btn.setEnabled(True)
+            self.extensions_group_box.setEnabled(True)
+            return
+
+        # Computed from the stats of the scan, without listing files again
+        chosen_stats: list[ExtensionStats] = [
+            self.extension_model.stats[extension]
+            for extension in self.extensions
+            if extension in self.extension_model.stats
+        ]
+        files_count: int = sum(stats.count for stats in chosen_stats)
+        total_size: int = sum(stats.total_size for stats in chosen_stats)
         if not self.get_confirmation(
             title="Rename files?",
             message=(
-                f"Are your sure you want to rename {len(files_to_rename)} "
-                "files with following extensions: ("
-                f"{', '.join(self.extensions)}) in"
-                f"\n{self.directory}?\n\n"
+                "Are your sure you want to rename "
+                + (
+                    "" if recursive
+                    else f"{files_count} ({format_size(total_size)}) "
+                )
+                + "files with following extensions: ("
+                f"{', '.join(sorted(self.extensions))}) in"
+                f"\n{self.directory}"
+                + (" and all its subdirectories" if recursive else "")
+                + "?\n\n"
                 "WARNING: If done in a wrong directory / "
                 "folder it may cause some programs "
                 "or even operating system to stop working!"
@@ -339,14 +744,95 @@ class AppLayout(QWidget):
             self.extensions_group_box.setEnabled(True)
             return
 
-        worker = Worker(
-            self.renamer.rename_files,
-            directory=self.directory,
-            files_to_rename=files_to_rename,
-            new_batch_name=new_batch_name,
-            number_padding=self.number_padding
+        if recursive:
+            worker = Worker(
+                rename_tree,
+                root=self.directory,
+                extensions=sorted(self.extensions),
+                new_batch_name=new_batch_name,
+                # Unless chosen, every directory is padded by its own size
+                number_padding=(
+                    self.number_padding if self.number_padding_chosen
+                    else None
+                ),
+                sort_order_name=self.get_sort_order().name,
+                duplicate_action=self.get_duplicate_action(),
+                undo_log_dir=self.renamer.undo_log_dir,
+                cancellation_token=self.start_cancellable_batch()
+            )
+            # Every directory is recorded in its own undo log, so there
+            # is no single batch to undo and the previous one is outdated
+            self.renamer.last_undo_log_path = None
+        else:
+            worker = Worker(
+                self.rename_chosen_files,
+                directory=self.directory,
+                extensions=sorted(self.extensions),
+                new_batch_name=new_batch_name,
+                number_padding=self.number_padding,
+                parallelism=self.parallelism_spin_box.value(),
+                cancellation_token=self.start_cancellable_batch(),
+                sort_order=self.get_sort_order(),
+                duplicate_action=self.get_duplicate_action()
+            )
+
+        self.undo_btn.setEnabled(False)
+        worker.signals.result.connect(self.handle_output)
+        worker.signals.error.connect(self.handle_errors)
+        worker.signals.finished.connect(self.handle_complete)
+        worker.signals.progress.connect(self.show_progress)
+
+        self.threadpool.start(worker)
+
+    def rename_chosen_files(
+            self,
+            directory: str,
+            extensions: list[str],
+            progress_callback: ISignal,
+            **kwargs: Any
+    ) -> BatchReport:
+        """
+        Runs in a worker thread. Files are listed there too, since
+        the directory may have to be scanned again (e.g. right after
+        a batch), which would freeze the window on the GUI thread.
+        See `Renamer.rename_files` for the other arguments.
+        """
+        return self.renamer.rename_files(
+            directory=directory,
+            files_to_rename=self.renamer.filter_extensions(
+                file_list=self.renamer.filter_directories(directory),
+                extensions=extensions
+            ),
+            progress_callback=progress_callback,
+            **kwargs
         )
 
+    def undo_last_batch(self) -> None:
+        """Rename files from the last renamed batch back."""
+        undo_log_path: str | None = self.renamer.last_undo_log_path
+        if undo_log_path is None:
+            return
+        if not self.get_confirmation(
+            title="Undo renaming?",
+            message=(
+                "Are your sure you want to rename files "
+                "from the last batch back to their previous names?"
+            )
+        ):
+            return
+
+        self.undo_btn.setEnabled(False)
+        self.rename_files_btn.setEnabled(False)
+        self.select_files_to_rename_btn.setEnabled(False)
+        self.extensions_group_box.setEnabled(False)
+        self.renamer.last_undo_log_path = None
+
+        worker = Worker(
+            self.renamer.undo_renaming,
+            undo_log_path=undo_log_path,
+            parallelism=self.parallelism_spin_box.value(),
+            cancellation_token=self.start_cancellable_batch()
+        )
         worker.signals.result.connect(self.handle_output)
         worker.signals.error.connect(self.handle_errors)
         worker.signals.finished.connect(self.handle_complete)
@@ -354,8 +840,111 @@ class AppLayout(QWidget):
 
         self.threadpool.start(worker)
 
-    def handle_output(self, s: str) -> None:
-        logger.info(s)
+    def start_cancellable_batch(self) -> CancellationToken:
+        """
+        Returns a token for a new batch and enables the buttons
+        with which it can be paused and cancelled.
+        """
+        self.cancellation_token = CancellationToken()
+        self.pause_btn.setText("Pause")
+        self.pause_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(True)
+        return self.cancellation_token
+
+    def toggle_pause(self) -> None:
+        """Pause the running batch, or resume it if it's paused."""
+        if self.cancellation_token is None:
+            return
+        if self.cancellation_token.is_paused:
+            self.cancellation_token.resume()
+            self.pause_btn.setText("Pause")
+        else:
+            self.cancellation_token.pause()
+            self.pause_btn.setText("Resume")
+            self.rename_files_btn.setText("Renaming paused")
+
+    def cancel_batch(self) -> None:
+        """
+        Cancel the running batch. Renames which have been started
+        are finished, the rest is not executed.
+        """
+        if self.cancellation_token is None:
+            return
+        self.cancellation_token.cancel()
+        self.pause_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(False)
+        self.rename_files_btn.setText("Cancelling...")
+
+    def handle_output(self, s: object) -> None:
+        if isinstance(s, list):
+            self.show_recursive_results(s)
+            return
+        if not isinstance(s, BatchReport):
+            logger.info("%s", s)
+            return
+        logger.info("Renaming finished.\n%s", s)
+        if s.cancelled:
+            dialog: QMessageBox = QMessageBox(self)
+            dialog.setWindowTitle("Renaming cancelled")
+            dialog.setText(
+                f"{len(s.renamed)} files were renamed "
+                f"and {len(s.failed)} failed before the renaming "
+                f"was cancelled. {s.not_executed} files were not renamed."
+            )
+            dialog.setDetailedText("\n".join(
+                f"{old_name} -> {new_name}" for old_name, new_name in s.renamed
+            ))
+            dialog.setStandardButtons(QMessageBox.StandardButton.Ok)
+            dialog.setIcon(QMessageBox.Icon.Information)
+            dialog.exec()
+
+    def show_recursive_results(self, results: list[DirectoryResult]) -> None:
+        """
+        Logs a summary of a recursive batch and shows the directories
+        in which renaming failed. Results hold every rename in the tree,
+        so they are only counted, never logged whole.
+        """
+        renamed: int = 0
+        failed: int = 0
+        for result in results:
+            for _, _, status in result.renames:
+                if status == "renamed":
+                    renamed += 1
+                elif status == "failed":
+                    failed += 1
+        failed_directories: list[DirectoryResult] = [
+            result for result in results if result.failed
+        ]
+        logger.info(
+            "Renaming finished in %d directories.\n"
+            "Renamed %d files, %d failed",
+            len(results),
+            renamed,
+            failed
+        )
+        if not failed_directories:
+            return
+        logger.warning(
+            "Renaming failed in %d directories: %s",
+            len(failed_directories),
+            ", ".join(result.directory for result in failed_directories)
+        )
+        dialog: QMessageBox = QMessageBox(self)
+        dialog.setWindowTitle("Renaming failed")
+        dialog.setText(
+            f"Renaming failed in {len(failed_directories)} of "
+            f"{len(results)} directories. {renamed} files were renamed "
+            f"and {failed} failed."
+        )
+        dialog.setDetailedText("\n".join(
+            f"{result.directory}: {result.error}"
+            if result.error is not None
+            else result.directory
+            for result in failed_directories
+        ))
+        dialog.setStandardButtons(QMessageBox.StandardButton.Ok)
+        dialog.setIcon(QMessageBox.Icon.Warning)
+        dialog.exec()
 
     def handle_complete(self) -> None:
         """Handle completion of a renaming task.
@@ -365,11 +954,25 @@ class AppLayout(QWidget):
         selection checkboxes.
         """
 
-        self.rename_files_btn.setText(
-            'Files renamed succesfully. Choose next directory.'
-        )
+        if (
+            self.cancellation_token is not None
+            and self.cancellation_token.is_cancelled
+        ):
+            self.rename_files_btn.setText(
+                'Renaming cancelled. Choose next directory.'
+            )
+        else:
+            self.rename_files_btn.setText(
+                'Files renamed succesfully. Choose next directory.'
+            )
+        self.cancellation_token = None
+        self.pause_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(False)
+        # Names of the files have changed
+        self.clear_renaming_preview()
         self.select_files_to_rename_btn.setEnabled(True)
         self.extensions_group_box.setEnabled(True)
+        self.undo_btn.setEnabled(self.renamer.last_undo_log_path is not None)
 
     def show_progress(self, n: int) -> None:
         """Show progress to the user.
@@ -387,8 +990,9 @@ class AppLayout(QWidget):
 
     def handle_errors(self, exc: tuple[type, str, str]) -> None:
         logger.info(
-            f"Error while renaming files: {exc[0].__name__}. "
-            f"{exc[1]}."
+            "Error while renaming files: %s. %s.",
+            exc[0].__name__,
+            exc[1]
         )
         # Show traceback
         # logger.info(exc[2])
@@ -0,0 +1,200 @@
+from collections.abc import Iterable
+
+from PySide6.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    QPersistentModelIndex,
+    Qt,
+    Signal
+)
+
+from app.core.snapshot import ExtensionStats, merge_extension_stats
+
+
+def format_size(size: int) -> str:
+    """Returns the size in bytes in a human readable form (e.g. 1.5 MB)."""
+    value: float = size
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if value < 1000 or unit == "TB":
+            break
+        value /= 1000
+    if unit == "B":
+        return f"{size} B"
+    return f"{value:.1f} {unit}"
+
+
+class ExtensionListModel(QAbstractListModel):
+    """Checkable list of extensions, sorted by extension.
+
+    Only rows visible in a view are ever rendered, so a directory
+    with thousands of extensions costs no more than one with a few.
+    Checked extensions are kept in the `checked_extensions` set.
+
+    Signals:
+        selection_changed: Emitted when extensions are checked
+            or unchecked.
+    """
+
+    selection_changed = Signal()
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.extensions: list[str] = []
+        self.rows: dict[str, int] = {}
+        self.stats: dict[str, ExtensionStats] = {}
+        self.checked_extensions: set[str] = set()
+
+    def rowCount(
+            self,
+            parent: QModelIndex | QPersistentModelIndex = QModelIndex()
+    ) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.extensions)
+
+    def data(
+            self,
+            index: QModelIndex | QPersistentModelIndex,
+            role: int = Qt.ItemDataRole.DisplayRole
+    ) -> object:
+        if not index.isValid():
+            return None
+        extension: str = self.extensions[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.get_label(extension)
+        if role == Qt.ItemDataRole.CheckStateRole:
+            if extension in self.checked_extensions:
+                return Qt.CheckState.Checked
+            return Qt.CheckState.Unchecked
+        if role == Qt.ItemDataRole.UserRole:
+            return extension
+        return None
+
+    def setData(
+            self,
+            index: QModelIndex | QPersistentModelIndex,
+            value: object,
+            role: int = Qt.ItemDataRole.EditRole
+    ) -> bool:
+        if not index.isValid() or role != Qt.ItemDataRole.CheckStateRole:
+            return False
+        extension: str = self.extensions[index.row()]
+        if Qt.CheckState(value) == Qt.CheckState.Checked:
+            self.checked_extensions.add(extension)
+        else:
+            self.checked_extensions.discard(extension)
+        self.dataChanged.emit(
+            index,
+            index,
+            [Qt.ItemDataRole.CheckStateRole]
+        )
+        self.selection_changed.emit()
+        return True
+
+    def flags(
+            self,
+            index: QModelIndex | QPersistentModelIndex
+    ) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return (
+            Qt.ItemFlag.ItemIsEnabled
+            | Qt.ItemFlag.ItemIsSelectable
+            | Qt.ItemFlag.ItemIsUserCheckable
+        )
+
+    def get_label(self, extension: str) -> str:
+        """
+        Returns the extension with the number and total size
+        of files with it (if known).
+        """
+        label: str = extension if extension else "No extension"
+        stats: ExtensionStats | None = self.stats.get(extension)
+        if stats is not None:
+            label += f" ({stats.count}, {format_size(stats.total_size)})"
+        return label
+
+    def add_stats(self, extension_stats: dict[str, ExtensionStats]) -> None:
+        """
+        Add the stats of newly scanned files to the stats
+        of the extensions, adding the extensions which are not
+        in the list yet.
+        """
+        merge_extension_stats(self.stats, extension_stats)
+        updated_rows: list[int] = [
+            self.rows[extension]
+            for extension in extension_stats
+            if extension in self.rows
+        ]
+        if updated_rows:
+            self.dataChanged.emit(
+                self.index(min(updated_rows)),
+                self.index(max(updated_rows)),
+                [Qt.ItemDataRole.DisplayRole]
+            )
+        new_extensions: list[str] = [
+            extension
+            for extension in extension_stats
+            if extension not in self.rows
+        ]
+        if not new_extensions:
+            return
+        first_row: int = len(self.extensions)
+        self.beginInsertRows(
+            QModelIndex(),
+            first_row,
+            first_row + len(new_extensions) - 1
+        )
+        for row, extension in enumerate(new_extensions, first_row):
+            self.rows[extension] = row
+        self.extensions.extend(new_extensions)
+        self.endInsertRows()
+        self.sort_extensions()
+
+    def sort_extensions(self) -> None:
+        """
+        Sort the extensions in a single step, instead of letting
+        a view or a proxy model sort them with a comparison
+        (and a `data` call) per pair of rows.
+        """
+        self.layoutAboutToBeChanged.emit()
+        persistent_indexes: list[QModelIndex] = self.persistentIndexList()
+        persistent_extensions: list[str] = [
+            self.extensions[index.row()] for index in persistent_indexes
+        ]
+        self.extensions.sort()
+        self.rows = {
+            extension: row for row, extension in enumerate(self.extensions)
+        }
+        self.changePersistentIndexList(
+            persistent_indexes,
+            [
+                self.index(self.rows[extension])
+                for extension in persistent_extensions
+            ]
+        )
+        self.layoutChanged.emit()
+
+    def set_checked(self, extensions: Iterable[str], checked: bool) -> None:
+        """Check or uncheck the extensions at once."""
+        if checked:
+            self.checked_extensions.update(extensions)
+        else:
+            self.checked_extensions.difference_update(extensions)
+        if self.extensions:
+            self.dataChanged.emit(
+                self.index(0),
+                self.index(len(self.extensions) - 1),
+                [Qt.ItemDataRole.CheckStateRole]
+            )
+        self.selection_changed.emit()
+
+    def clear(self) -> None:
+        """Remove all the extensions."""
+        self.beginResetModel()
+        self.extensions.clear()
+        self.rows.clear()
+        self.stats.clear()
+        self.checked_extensions.clear()
+        self.endResetModel()
+        self.selection_changed.emit()
@@ -0,0 +1,104 @@
+from collections.abc import Iterator
+from itertools import islice
+
+from PySide6.QtCore import (
+    QAbstractTableModel,
+    QModelIndex,
+    QPersistentModelIndex,
+    Qt
+)
+
+
+# Number of rows taken from the plan each time the view needs more
+FETCH_SIZE: int = 500
+
+
+class RenamingPreviewModel(QAbstractTableModel):
+    """Table of old and new file names of a renaming plan.
+
+    Rows are taken from the plan's iterator lazily, as the view
+    is scrolled (see `canFetchMore` and `fetchMore`), so showing
+    the preview of a huge batch costs no more than of a small one.
+    """
+
+    HEADERS: tuple[str, str] = ("Old name", "New name")
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.rows: list[tuple[str, str]] = []
+        self.plan: Iterator[tuple[str, str]] | None = None
+
+    def set_plan(self, plan: Iterator[tuple[str, str]] | None) -> None:
+        """
+        Show the plan instead of the current one. Only the first rows
+        are taken from it, the rest when the view needs them.
+        """
+        self.beginResetModel()
+        self.rows = []
+        self.plan = plan
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def rowCount(
+            self,
+            parent: QModelIndex | QPersistentModelIndex = QModelIndex()
+    ) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(
+            self,
+            parent: QModelIndex | QPersistentModelIndex = QModelIndex()
+    ) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def data(
+            self,
+            index: QModelIndex | QPersistentModelIndex,
+            role: int = Qt.ItemDataRole.DisplayRole
+    ) -> object:
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return self.rows[index.row()][index.column()]
+
+    def headerData(
+            self,
+            section: int,
+            orientation: Qt.Orientation,
+            role: int = Qt.ItemDataRole.DisplayRole
+    ) -> object:
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return section + 1
+
+    def canFetchMore(
+            self,
+            parent: QModelIndex | QPersistentModelIndex = QModelIndex()
+    ) -> bool:
+        return not parent.isValid() and self.plan is not None
+
+    def fetchMore(
+            self,
+            parent: QModelIndex | QPersistentModelIndex = QModelIndex()
+    ) -> None:
+        if parent.isValid() or self.plan is None:
+            return
+        new_rows: list[tuple[str, str]] = list(islice(self.plan, FETCH_SIZE))
+        if len(new_rows) < FETCH_SIZE:
+            # The plan is exhausted
+            self.plan = None
+        if not new_rows:
+            return
+        first_row: int = len(self.rows)
+        self.beginInsertRows(
+            QModelIndex(),
+            first_row,
+            first_row + len(new_rows) - 1
+        )
+        self.rows.extend(new_rows)
+        self.endInsertRows()
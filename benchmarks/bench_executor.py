@@ -0,0 +1,45 @@
+"""
+Benchmark of `Renamer.rename_files_from_file_map`.
+
+Renames directories of growing size and prints the time per file,
+which should stay roughly constant (linear scaling) as the directory
+is listed only once per batch.
+
+Run from the repository root with:
+    python -m benchmarks.bench_executor [SIZE ...]
+"""
+
+import argparse
+import logging
+
+from app.core.renamer import Renamer
+from benchmarks.common import measure, synthetic_directory
+
+
+DEFAULT_SIZES: list[int] = [1_000, 2_000, 4_000, 8_000, 16_000]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("sizes", nargs="*", type=int, default=DEFAULT_SIZES)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    print(f"{'files':>10} {'total [s]':>12} {'per file [us]':>15}")
+    for size in args.sizes:
+        file_names: list[str] = [f"IMG_{i}.jpg" for i in range(size)]
+        files_map: dict[str, str] = {
+            name: f"Holidays_{i:07}.jpg" for i, name in enumerate(file_names)
+        }
+        with synthetic_directory(file_names) as directory:
+            renamer = Renamer()
+            elapsed: float = measure(
+                lambda: renamer.rename_files_from_file_map(
+                    directory, files_map
+                )
+            )
+        print(f"{size:>10} {elapsed:>12.3f} {elapsed / size * 1e6:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
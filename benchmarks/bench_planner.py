@@ -0,0 +1,52 @@
+"""
+Benchmark of `Renamer.get_renaming_map`.
+
+Plans batches of growing size (10% of which already have correct
+names and numbers) and prints the time per name, which should stay
+roughly constant as planning no longer removes items from lists.
+
+Run from the repository root with:
+    python -m benchmarks.bench_planner [SIZE ...]
+"""
+
+import argparse
+import logging
+
+from app.core.renamer import Renamer
+from benchmarks.common import measure
+
+
+DEFAULT_SIZES: list[int] = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def make_file_names(size: int, padding: int) -> list[str]:
+    """
+    Returns `size` file names, every 10th of which
+    already matches `Holidays_<number>.jpg`.
+    """
+    return [
+        f"Holidays_{str(i).zfill(padding)}.jpg" if i % 10 == 0
+        else f"IMG_{i}.jpg"
+        for i in range(1, size + 1)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("sizes", nargs="*", type=int, default=DEFAULT_SIZES)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    print(f"{'names':>10} {'total [s]':>12} {'per name [us]':>15}")
+    for size in args.sizes:
+        padding: int = len(str(size))
+        file_names: list[str] = make_file_names(size, padding)
+        renamer = Renamer()
+        elapsed: float = measure(
+            lambda: renamer.get_renaming_map(file_names, "Holidays", padding)
+        )
+        print(f"{size:>10} {elapsed:>12.3f} {elapsed / size * 1e6:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
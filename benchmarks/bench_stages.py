@@ -0,0 +1,238 @@
+"""
+Benchmark of every stage of `Renamer` on synthetic directories.
+
+For every size, a directory is generated on tmpfs (if available)
+with files of mixed extensions, a few subdirectories and some files
+which already match `Holidays_<number>`. Then `get_all_file_extensions`,
+`filter_directories`, `filter_extensions`, `get_renaming_map` and the whole
+`rename_files` are timed. Scanning stages are timed with a fresh `Renamer`,
+so that the directory snapshot is not reused between repeats.
+
+Results are saved as JSON (by default to `bench_results/<commit>.json`),
+so that they can be compared between commits with `--compare`.
+
+Run from the repository root with:
+    python -m benchmarks.bench_stages [SIZE ...] [--compare OLD.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
+
+from app.cli import NullSignal
+from app.core.renamer import Renamer
+from benchmarks.common import measure, synthetic_directory
+
+
+DEFAULT_SIZES: list[int] = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_OUTPUT_DIR: str = "bench_results"
+NEW_BATCH_NAME: str = "Holidays"
+EXTENSIONS: list[str] = [".jpg", ".JPG", ".png", ".mp4", ".txt", ""]
+CHOSEN_EXTENSIONS: list[str] = [".jpg", ".JPG", ".png"]
+# Stages slower than in the compared results by more than this
+# fraction are reported as regressions
+REGRESSION_THRESHOLD: float = 0.10
+
+
+def make_file_names(size: int, padding: int) -> list[str]:
+    """
+    Returns `size` file names with extensions from `EXTENSIONS`,
+    every 20th of which already matches `Holidays_<number>`.
+    """
+    file_names: list[str] = []
+    for i in range(1, size + 1):
+        extension: str = EXTENSIONS[i % len(EXTENSIONS)]
+        if i % 20 == 0:
+            file_names.append(
+                f"{NEW_BATCH_NAME}_{str(i).zfill(padding)}{extension}"
+            )
+        else:
+            file_names.append(f"IMG_{i}{extension}")
+    return file_names
+
+
+def get_commit() -> str:
+    """Returns the short hash of the current commit, if available."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def best_of(repeat: int, setup: Callable[[], Callable[[], object]]) -> float:
+    """
+    Returns the shortest wall time of `repeat` runs. `setup` is called
+    (outside of the measurement) before every run and returns
+    the function to measure.
+    """
+    return min(measure(setup()) for _ in range(repeat))
+
+
+def benchmark_size(size: int, repeat: int) -> dict[str, float]:
+    """Returns the time (in seconds) of every stage for the given size."""
+    padding: int = len(str(size))
+    timings: dict[str, float] = {}
+    with synthetic_directory(
+        make_file_names(size, padding),
+        [f"directory_{i}" for i in range(10)]
+    ) as directory:
+        timings["get_all_file_extensions"] = best_of(
+            repeat,
+            lambda: (lambda: Renamer().get_all_file_extensions(directory))
+        )
+        timings["filter_directories"] = best_of(
+            repeat,
+            lambda: (lambda: Renamer().filter_directories(directory))
+        )
+
+        renamer: Renamer = Renamer()
+        files: list[str] = renamer.filter_directories(directory)
+        timings["filter_extensions"] = best_of(
+            repeat,
+            lambda: (
+                lambda: renamer.filter_extensions(files, CHOSEN_EXTENSIONS)
+            )
+        )
+
+        files_to_rename: list[str] = renamer.filter_extensions(
+            files,
+            CHOSEN_EXTENSIONS
+        )
+
+        def setup_renaming_map() -> Callable[[], object]:
+            # `get_renaming_map` sorts the list in place
+            shuffled: list[str] = files_to_rename[::-1]
+            return lambda: renamer.get_renaming_map(
+                shuffled,
+                NEW_BATCH_NAME,
+                padding
+            )
+
+        timings["get_renaming_map"] = best_of(repeat, setup_renaming_map)
+
+        # Renaming changes the directory, so it's measured only once
+        timings["rename_files"] = measure(
+            lambda: Renamer().rename_files(
+                directory=directory,
+                files_to_rename=list(files_to_rename),
+                new_batch_name=NEW_BATCH_NAME,
+                progress_callback=NullSignal(),
+                number_padding=padding
+            )
+        )
+    return timings
+
+
+def compare(
+        results: list[dict[str, Any]],
+        old_results: list[dict[str, Any]]
+) -> bool:
+    """
+    Prints the ratio of every stage's time to the old one.
+    Returns `True` if any of the stages got slower by more
+    than `REGRESSION_THRESHOLD`.
+    """
+    old_timings: dict[tuple[int, str], float] = {
+        (result["files"], result["stage"]): result["seconds"]
+        for result in old_results
+    }
+    regressed: bool = False
+    print(f"\n{'files':>10} {'stage':<24} {'ratio':>8}")
+    for result in results:
+        old: float | None = old_timings.get((result["files"], result["stage"]))
+        if not old:
+            continue
+        ratio: float = result["seconds"] / old
+        flag: str = ""
+        if ratio > 1 + REGRESSION_THRESHOLD:
+            flag = "  <- regression"
+            regressed = True
+        print(
+            f"{result['files']:>10} {result['stage']:<24} "
+            f"{ratio:>8.2f}{flag}"
+        )
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("sizes", nargs="*", type=int, default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="number of runs of every read-only stage, the best is kept"
+    )
+    parser.add_argument(
+        "--output",
+        help=(
+            "path to the JSON file with results "
+            f"(default: {DEFAULT_OUTPUT_DIR}/<commit>.json)"
+        )
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="OLD_JSON",
+        help="compare the results with results saved by a previous run"
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    commit: str = get_commit()
+    results: list[dict[str, Any]] = []
+    print(
+        f"{'files':>10} {'stage':<24} {'total [s]':>12} "
+        f"{'per file [us]':>15}"
+    )
+    for size in args.sizes:
+        for stage, seconds in benchmark_size(size, args.repeat).items():
+            results.append({
+                "files": size,
+                "stage": stage,
+                "seconds": seconds
+            })
+            print(
+                f"{size:>10} {stage:<24} {seconds:>12.4f} "
+                f"{seconds / size * 1e6:>15.2f}"
+            )
+
+    output: str = args.output or os.path.join(
+        DEFAULT_OUTPUT_DIR,
+        f"{commit}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "commit": commit,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results
+            },
+            file,
+            indent=2
+        )
+    print(f"\nResults saved to {output}")
+
+    if args.compare is not None:
+        with open(args.compare, encoding="utf-8") as file:
+            if compare(results, json.load(file)["results"]):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Benchmark of `NameTemplate` against the regex it replaced.
+
+Finds names matching `Holidays_<number>[.ext]` (10% of all names)
+and their numbers, once with a regex and splitting the matching names
+(as planning used to), once with the template, and prints the time
+per name of both.
+
+Run from the repository root with:
+    python -m benchmarks.bench_template [SIZE ...]
+"""
+
+import argparse
+import os
+import re
+
+from app.core.template import NameTemplate, get_name_template
+from benchmarks.bench_planner import make_file_names
+from benchmarks.common import measure
+
+
+DEFAULT_SIZES: list[int] = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def match_with_regex(
+        file_names: list[str],
+        new_batch_name: str,
+        number_padding: int
+) -> dict[str, int]:
+    """
+    Returns numbers of matching names by name, compiling the pattern
+    and taking the numbers from the names the same way as before.
+    """
+    pattern: re.Pattern = re.compile(
+        rf"^{re.escape(new_batch_name)}_\d{{{number_padding}}}\.\S*$|"
+        rf"^{re.escape(new_batch_name)}_\d{{{number_padding}}}$"
+    )
+    return {
+        name: int(os.path.splitext(name)[0].split("_")[-1])
+        for name in file_names
+        if re.match(pattern, name)
+    }
+
+
+def match_with_template(
+        file_names: list[str],
+        new_batch_name: str,
+        number_padding: int
+) -> dict[str, int]:
+    """Returns numbers of matching names by name."""
+    template: NameTemplate = get_name_template(new_batch_name, number_padding)
+    numbers: dict[str, int] = {}
+    for name in file_names:
+        number: int | None = template.match(name)
+        if number is not None:
+            numbers[name] = number
+    return numbers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("sizes", nargs="*", type=int, default=DEFAULT_SIZES)
+    args = parser.parse_args()
+
+    print(
+        f"{'names':>10} {'regex [us/name]':>16} "
+        f"{'template [us/name]':>19} {'speedup':>8}"
+    )
+    for size in args.sizes:
+        padding: int = len(str(size))
+        file_names: list[str] = make_file_names(size, padding)
+        assert match_with_regex(
+            file_names, "Holidays", padding
+        ) == match_with_template(file_names, "Holidays", padding)
+        regex: float = measure(
+            lambda: match_with_regex(file_names, "Holidays", padding)
+        )
+        template: float = measure(
+            lambda: match_with_template(file_names, "Holidays", padding)
+        )
+        print(
+            f"{size:>10} {regex / size * 1e6:>16.2f} "
+            f"{template / size * 1e6:>19.2f} {regex / template:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Helpers shared by the BatchFileRenamer benchmarks.
+"""
+
+import os
+import tempfile
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+
+
+def get_benchmark_root() -> str | None:
+    """
+    Returns a tmpfs-backed directory (if available) to create
+    synthetic directories in, so that disk speed does not
+    dominate the measurements.
+    """
+    shm: str = "/dev/shm"
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        return shm
+    return None
+
+
+@contextmanager
+def synthetic_directory(
+        file_names: Iterable[str],
+        directory_names: Iterable[str] = ()
+) -> Iterator[str]:
+    """
+    Create a temporary directory with empty files
+    and subdirectories of the given names.
+    """
+    with tempfile.TemporaryDirectory(dir=get_benchmark_root()) as directory:
+        for file_name in file_names:
+            os.close(os.open(
+                os.path.join(directory, file_name),
+                os.O_CREAT | os.O_WRONLY,
+                0o644
+            ))
+        for directory_name in directory_names:
+            os.mkdir(os.path.join(directory, directory_name))
+        yield directory
+
+
+def measure(fn: Callable[[], object]) -> float:
+    """Returns the wall time (in seconds) it took to run `fn`."""
+    start: float = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
@@ -1,16 +1,31 @@
+import logging
+import os
 import sys
 from PySide6.QtWidgets import QApplication
 
+from app.core.instrumentation import Instrumentation
 from app.core.renamer import Renamer
+from app.core.undo import DEFAULT_UNDO_LOG_DIR
 from app.gui.app_layout import AppLayout
 from app.gui.app_main_window import AppMainWindow
 
 
+# Set (to any non-empty value) to measure batches and log the measurements
+STATS_ENV_VAR: str = "BATCH_FILE_RENAMER_STATS"
+
+
 def main() -> None:
+    # Per-file records are rate-limited, see `RateLimitedLog`
+    logging.basicConfig(level=logging.DEBUG)
 
     app = QApplication(sys.argv)
 
-    renamer = Renamer()
+    renamer = Renamer(
+        undo_log_dir=DEFAULT_UNDO_LOG_DIR,
+        instrumentation=(
+            Instrumentation() if os.environ.get(STATS_ENV_VAR) else None
+        )
+    )
     layout = AppLayout(renamer)
     window = AppMainWindow(layout, "Batch File Renamer")
 
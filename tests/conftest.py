@@ -0,0 +1,33 @@
+"""Fixtures shared by the tests of the core and of the command line."""
+
+from pathlib import Path
+
+import pytest
+from tests.helpers import FakeClock, NullSignal, RecordingSignal
+
+
+@pytest.fixture
+def signal() -> RecordingSignal:
+    return RecordingSignal()
+
+
+@pytest.fixture
+def null_signal() -> NullSignal:
+    return NullSignal()
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def directory(tmp_path: Path) -> Path:
+    """
+    Returns an empty directory to rename files in, leaving `tmp_path`
+    for the files written next to it (plans, journals, undo logs).
+    Modules needing files in it override this fixture.
+    """
+    directory: Path = tmp_path / "files"
+    directory.mkdir()
+    return directory
@@ -0,0 +1,30 @@
+"""Stand-ins shared by the tests of the core and of the command line."""
+
+from typing import Any
+
+
+class RecordingSignal:
+    """Stand-in for a Qt signal, which records the emitted values."""
+
+    def __init__(self) -> None:
+        self.values: list[Any] = []
+
+    def emit(self, value: Any) -> None:
+        self.values.append(value)
+
+
+class NullSignal:
+    """Stand-in for a Qt signal, which ignores the emitted values."""
+
+    def emit(self, value: Any) -> None:
+        pass
+
+
+class FakeClock:
+    """Clock which only moves when `now` is set."""
+
+    def __init__(self, start: float = 0.0) -> None:
+        self.now: float = start
+
+    def __call__(self) -> float:
+        return self.now
@@ -0,0 +1,211 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from app.cli import main
+
+
+# Maximum time (in seconds) importing the command line interface may take
+IMPORT_TIME_BUDGET: float = 0.5
+
+
+@pytest.fixture(autouse=True)
+def undo_log_dir(
+    tmp_path_factory: pytest.TempPathFactory,
+    monkeypatch: pytest.MonkeyPatch
+) -> Path:
+    """Keep undo logs of renaming tests out of the user's home directory."""
+    undo_log_dir: Path = tmp_path_factory.mktemp("undo")
+    monkeypatch.setattr("app.cli.DEFAULT_UNDO_LOG_DIR", str(undo_log_dir))
+    return undo_log_dir
+
+
+@pytest.fixture
+def directory(directory: Path) -> Path:
+    for name in ("b.jpg", "a.jpg", "c.png", "holidays_1.jpg"):
+        (directory / name).write_text("")
+    return directory
+
+
+def test_dry_run_prints_json_lines_without_renaming(
+    directory: Path,
+    capsys: pytest.CaptureFixture[str]
+) -> None:
+    exit_code: int = main([
+        str(directory), "--name", "holidays", "-e", "jpg",
+        "--padding", "1", "--dry-run", "--json"
+    ])
+    lines: list[dict] = [
+        json.loads(line) for line in capsys.readouterr().out.splitlines()
+    ]
+    assert exit_code == 0
+    assert lines == [
+        {"old": "a.jpg", "new": "holidays_2.jpg", "status": "planned"},
+        {"old": "b.jpg", "new": "holidays_3.jpg", "status": "planned"},
+    ]
+    assert "a.jpg" in os.listdir(directory)
+
+
+def test_renames_files_with_chosen_extensions(directory: Path) -> None:
+    exit_code: int = main([
+        str(directory), "--name", "holidays", "-e", ".jpg", "-p", "1"
+    ])
+    assert exit_code == 0
+    assert sorted(os.listdir(directory)) == [
+        "c.png", "holidays_1.jpg", "holidays_2.jpg", "holidays_3.jpg"
+    ]
+
+
+def test_dry_run_numbers_files_in_chosen_order(
+    directory: Path,
+    capsys: pytest.CaptureFixture[str]
+) -> None:
+    (directory / "a.jpg").write_text("larger")
+    exit_code: int = main([
+        str(directory), "--name", "holidays", "-e", "jpg",
+        "--padding", "1", "--sort", "size", "--dry-run", "--json"
+    ])
+    lines: list[dict] = [
+        json.loads(line) for line in capsys.readouterr().out.splitlines()
+    ]
+    assert exit_code == 0
+    assert lines == [
+        {"old": "b.jpg", "new": "holidays_2.jpg", "status": "planned"},
+        {"old": "a.jpg", "new": "holidays_3.jpg", "status": "planned"},
+    ]
+
+
+def test_skipped_duplicates_keep_their_names(directory: Path) -> None:
+    (directory / "a.jpg").write_text("photo")
+    (directory / "b.jpg").write_text("photo")
+    exit_code: int = main([
+        str(directory), "--name", "holidays", "-e", "jpg", "-p", "1",
+        "--duplicates", "skip"
+    ])
+    assert exit_code == 0
+    assert sorted(os.listdir(directory)) == [
+        "b.jpg", "c.png", "holidays_1.jpg", "holidays_2.jpg"
+    ]
+
+
+def test_streaming_renames_the_same_way(
+    directory: Path,
+    capsys: pytest.CaptureFixture[str]
+) -> None:
+    arguments: list[str] = [
+        str(directory), "--name", "holidays", "-e", "jpg", "-p", "1", "--json"
+    ]
+    main(arguments + ["--dry-run"])
+    planned: str = capsys.readouterr().out.replace("planned", "renamed")
+
+    assert main(arguments + ["--streaming"]) == 0
+    assert capsys.readouterr().out == planned
+
+
+def test_streaming_rejects_parallelism(
+    directory: Path,
+    capsys: pytest.CaptureFixture[str]
+) -> None:
+    with pytest.raises(SystemExit):
+        main([
+            str(directory), "--name", "holidays", "-e", "jpg", "-p", "1",
+            "--streaming", "-j", "4"
+        ])
+    assert "--parallelism can't be used with --streaming" in (
+        capsys.readouterr().err
+    )
+
+
+@pytest.mark.parametrize(
+    ("arguments", "message"),
+    [
+        (
+            ["--journal", "journal.jsonl", "--dry-run"],
+            "--journal can't be used with --dry-run"
+        ),
+        (["--jobs", "2"], "--jobs can only be used with --recursive"),
+    ]
+)
+def test_ignored_options_are_rejected(
+    directory: Path,
+    capsys: pytest.CaptureFixture[str],
+    arguments: list[str],
+    message: str
+) -> None:
+    with pytest.raises(SystemExit):
+        main([str(directory), "--name", "holidays", "-e", "jpg"] + arguments)
+    assert message in capsys.readouterr().err
+
+
+def test_error_names_the_failed_operation_and_path(
+    directory: Path,
+    capsys: pytest.CaptureFixture[str]
+) -> None:
+    plan_path: Path = directory / "missing" / "plan.jsonl"
+    with pytest.raises(SystemExit):
+        main([
+            str(directory), "--name", "holidays", "-e", "jpg",
+            "--save-plan", str(plan_path)
+        ])
+    error: str = capsys.readouterr().err
+    assert f"can't save plan to {plan_path}" in error
+    assert "can't read directory" not in error
+
+
+def test_recursive_mode_prints_overall_progress(
+    directory: Path,
+    capsys: pytest.CaptureFixture[str]
+) -> None:
+    (directory / "sub").mkdir()
+    (directory / "sub" / "d.jpg").write_text("")
+    assert main([
+        str(directory), "--name", "holidays", "-e", "jpg", "--recursive",
+        "--jobs", "1"
+    ]) == 0
+    assert capsys.readouterr().err.splitlines()[-1] == (
+        "directories processed: 100%"
+    )
+
+
+def test_invalid_new_name_is_rejected(directory: Path) -> None:
+    with pytest.raises(SystemExit):
+        main([str(directory), "--name", "holidays/", "--all-extensions"])
+
+
+@pytest.mark.parametrize(
+    "command",
+    ["--apply-plan", "--undo", "--resume"]
+)
+def test_commands_renaming_from_file_reject_dry_run(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    command: str
+) -> None:
+    with pytest.raises(SystemExit):
+        main([command, str(tmp_path / "file"), "--dry-run"])
+    assert f"{command} can't be used with --dry-run" in (
+        capsys.readouterr().err
+    )
+
+
+def test_import_does_not_load_pyside_and_fits_time_budget() -> None:
+    code: str = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import app.cli\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(elapsed, any(m.startswith('PySide6') for m in sys.modules))\n"
+    )
+    output: str = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    elapsed, pyside_imported = output.split()
+    assert pyside_imported == "False"
+    assert float(elapsed) < IMPORT_TIME_BUDGET
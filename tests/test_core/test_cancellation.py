@@ -0,0 +1,162 @@
+import os
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+from app.core.cancellation import CancellationToken
+from app.core.duplicates import SKIP_DUPLICATES, hash_file
+from app.core.recursive import rename_tree
+from app.core.renamer import Renamer
+from app.core.report import BatchReport
+
+
+def create_files(directory: Path, count: int) -> dict[str, str]:
+    """Creates `count` files and returns a map renaming all of them."""
+    files_map: dict[str, str] = {}
+    for i in range(count):
+        (directory / f"{i}.jpg").write_text("")
+        files_map[f"{i}.jpg"] = f"holidays_{i}.jpg"
+    return files_map
+
+
+def cancel_after(
+        token: CancellationToken,
+        count: int
+) -> Callable[[str, str, bool], None]:
+    """Returns a step callback which cancels the batch after `count` steps."""
+    steps: list[int] = [0]
+    lock: threading.Lock = threading.Lock()
+
+    def step_callback(old_name: str, new_name: str, renamed: bool) -> None:
+        with lock:
+            steps[0] += 1
+            if steps[0] == count:
+                token.cancel()
+
+    return step_callback
+
+
+def test_cancelled_batch_reports_exactly_the_executed_renames(
+    tmp_path: Path
+) -> None:
+    files_map: dict[str, str] = create_files(tmp_path, 20)
+    token = CancellationToken()
+    report: BatchReport = Renamer().rename_files_from_file_map(
+        str(tmp_path),
+        files_map,
+        step_callback=cancel_after(token, 5),
+        cancellation_token=token
+    )
+    assert report.cancelled
+    assert len(report.renamed) == 5
+    assert report.not_executed == 15
+    renamed_names: set[str] = {new_name for _, new_name in report.renamed}
+    assert set(os.listdir(tmp_path)) == (
+        renamed_names
+        | set(files_map) - {old_name for old_name, _ in report.renamed}
+    )
+
+
+def test_cancelled_parallel_batch_stops(tmp_path: Path) -> None:
+    files_map: dict[str, str] = create_files(tmp_path, 200)
+    token = CancellationToken()
+    report: BatchReport = Renamer().rename_files_from_file_map(
+        str(tmp_path),
+        files_map,
+        parallelism=4,
+        step_callback=cancel_after(token, 10),
+        cancellation_token=token
+    )
+    assert report.cancelled
+    # Chains which were started before the cancellation are finished
+    assert 10 <= len(report.renamed) < 200
+    assert len(report.renamed) + report.not_executed == 200
+    assert len(os.listdir(tmp_path)) == 200
+
+
+def test_paused_batch_resumes(tmp_path: Path) -> None:
+    files_map: dict[str, str] = create_files(tmp_path, 10)
+    token = CancellationToken()
+    token.pause()
+    reports: list[BatchReport] = []
+    thread = threading.Thread(
+        target=lambda: reports.append(
+            Renamer().rename_files_from_file_map(
+                str(tmp_path),
+                files_map,
+                cancellation_token=token
+            )
+        )
+    )
+    thread.start()
+    thread.join(timeout=0.1)
+    assert thread.is_alive()
+    assert sorted(os.listdir(tmp_path)) == sorted(files_map)
+
+    token.resume()
+    thread.join(timeout=5)
+    assert not reports[0].cancelled
+    assert sorted(os.listdir(tmp_path)) == sorted(files_map.values())
+
+
+def test_cancel_stops_paused_batch(tmp_path: Path) -> None:
+    files_map: dict[str, str] = create_files(tmp_path, 10)
+    token = CancellationToken()
+    token.pause()
+    token.cancel()
+    report: BatchReport = Renamer().rename_files_from_file_map(
+        str(tmp_path),
+        files_map,
+        cancellation_token=token
+    )
+    assert report.cancelled
+    assert report.renamed == []
+    assert report.not_executed == 10
+    assert sorted(os.listdir(tmp_path)) == sorted(files_map)
+
+
+def test_batch_cancelled_while_hashing_renames_nothing(
+    tmp_path: Path,
+    monkeypatch
+) -> None:
+    for name in create_files(tmp_path, 10):
+        (tmp_path / name).write_text("same size")
+    token = CancellationToken()
+
+    def hash_and_cancel(
+        path: str,
+        cancellation_token: CancellationToken | None = None
+    ) -> bytes | None:
+        token.cancel()
+        return hash_file(path, cancellation_token)
+
+    monkeypatch.setattr("app.core.duplicates.hash_file", hash_and_cancel)
+    report: BatchReport = Renamer().rename_files(
+        directory=str(tmp_path),
+        files_to_rename=sorted(os.listdir(tmp_path)),
+        new_batch_name="holidays",
+        progress_callback=None,
+        cancellation_token=token,
+        duplicate_action=SKIP_DUPLICATES
+    )
+    assert report.cancelled
+    assert report.renamed == [] and report.not_executed == 10
+    assert "0.jpg" in os.listdir(tmp_path)
+
+
+def test_cancelled_recursive_batch_processes_no_more_directories(
+    tmp_path: Path
+) -> None:
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "x.jpg").write_text("")
+    token = CancellationToken()
+    token.cancel()
+    assert rename_tree(
+        root=str(tmp_path),
+        extensions=[".jpg"],
+        new_batch_name="holidays",
+        progress_callback=None,
+        cancellation_token=token
+    ) == []
+    assert os.listdir(tmp_path / "a") == ["x.jpg"]
@@ -0,0 +1,156 @@
+import os
+from pathlib import Path
+
+import pytest
+from app.core.cancellation import CancellationToken
+from app.core.duplicates import (
+    SKIP_DUPLICATES,
+    SUFFIX_DUPLICATES,
+    hash_file
+)
+from app.core.preview import RenamingPreview
+from app.core.renamer import Renamer
+
+
+@pytest.fixture
+def directory(directory: Path) -> Path:
+    contents: dict[str, bytes] = {
+        "a.jpg": b"first photo",
+        "b.jpg": b"other photo",
+        "c.jpg": b"first photo",
+        "d.jpg": b"third photo",
+        "e.jpg": b"first photo",
+        "f.jpg": b"larger photo",
+    }
+    for name, content in contents.items():
+        (directory / name).write_bytes(content)
+    return directory
+
+
+def test_files_are_hashed_in_chunks(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr("app.core.duplicates.HASH_CHUNK_SIZE", 3)
+    (tmp_path / "a").write_bytes(b"0123456789")
+    (tmp_path / "b").write_bytes(b"0123456789")
+    (tmp_path / "c").write_bytes(b"0123456788")
+    (tmp_path / "empty").write_bytes(b"")
+    assert hash_file(str(tmp_path / "a")) == hash_file(str(tmp_path / "b"))
+    assert hash_file(str(tmp_path / "a")) != hash_file(str(tmp_path / "c"))
+    assert hash_file(str(tmp_path / "empty")) is not None
+    assert hash_file(str(tmp_path / "missing")) is None
+
+
+def test_duplicates_of_first_file_are_found(directory: Path) -> None:
+    assert Renamer().find_duplicates(
+        str(directory),
+        sorted(os.listdir(directory))
+    ) == {"c.jpg": "a.jpg", "e.jpg": "a.jpg"}
+
+
+def test_only_files_of_same_size_are_hashed(
+    directory: Path,
+    monkeypatch
+) -> None:
+    hashed: list[str] = []
+
+    def record_hash(
+        path: str,
+        cancellation_token: CancellationToken | None = None
+    ) -> bytes | None:
+        hashed.append(os.path.basename(path))
+        return hash_file(path, cancellation_token)
+
+    monkeypatch.setattr("app.core.duplicates.hash_file", record_hash)
+    renamer = Renamer()
+    files: list[str] = sorted(os.listdir(directory))
+    renamer.find_duplicates(str(directory), files)
+    assert sorted(hashed) == ["a.jpg", "b.jpg", "c.jpg", "d.jpg", "e.jpg"]
+
+    # Unchanged files are not hashed again
+    renamer.find_duplicates(str(directory), files)
+    assert len(hashed) == 5
+
+
+def test_modified_file_is_hashed_again(tmp_path: Path) -> None:
+    (tmp_path / "a").write_bytes(b"same")
+    (tmp_path / "b").write_bytes(b"same")
+    # Old enough for the snapshot of the directory to be trusted
+    os.utime(tmp_path, ns=(0, 1_000_000_000))
+    renamer = Renamer()
+    assert renamer.find_duplicates(str(tmp_path), ["a", "b"]) == {"b": "a"}
+
+    # Edited in place, which doesn't change the directory
+    (tmp_path / "b").write_bytes(b"diff")
+    os.utime(tmp_path / "b", ns=(0, 1_000_000_000))
+    assert renamer.find_duplicates(str(tmp_path), ["a", "b"]) == {}
+
+
+def test_skipped_duplicates_take_no_numbers(directory: Path) -> None:
+    files: list[str] = sorted(os.listdir(directory))
+    assert Renamer().get_directory_renaming_map(
+        str(directory),
+        files,
+        "x",
+        1,
+        duplicate_action=SKIP_DUPLICATES
+    ) == {
+        "a.jpg": "x_1.jpg",
+        "b.jpg": "x_2.jpg",
+        "d.jpg": "x_3.jpg",
+        "f.jpg": "x_4.jpg",
+    }
+
+
+def test_duplicates_are_named_after_original(directory: Path) -> None:
+    files: list[str] = sorted(os.listdir(directory))
+    assert Renamer().get_directory_renaming_map(
+        str(directory),
+        files,
+        "x",
+        1,
+        duplicate_action=SUFFIX_DUPLICATES
+    ) == {
+        "a.jpg": "x_1.jpg",
+        "c.jpg": "x_1_duplicate_1.jpg",
+        "e.jpg": "x_1_duplicate_2.jpg",
+        "b.jpg": "x_2.jpg",
+        "d.jpg": "x_3.jpg",
+        "f.jpg": "x_4.jpg",
+    }
+
+
+def test_skipped_duplicate_with_matching_name_keeps_its_number(
+    tmp_path: Path
+) -> None:
+    for name in ("a.jpg", "x_2.jpg"):
+        (tmp_path / name).write_bytes(b"same")
+    (tmp_path / "b.jpg").write_bytes(b"other")
+    renamer = Renamer()
+    files: list[str] = ["a.jpg", "b.jpg", "x_2.jpg"]
+    duplicates: dict[str, str] = renamer.find_duplicates(
+        str(tmp_path),
+        files
+    )
+    assert duplicates == {"x_2.jpg": "a.jpg"}
+    files_map: dict[str, str] = renamer.get_renaming_map(
+        list(files),
+        "x",
+        1,
+        duplicates=duplicates
+    )
+    # No file is renamed to the name of the skipped duplicate
+    assert files_map == {"a.jpg": "x_1.jpg", "b.jpg": "x_3.jpg"}
+
+    preview = RenamingPreview(renamer, list(files), duplicates=duplicates)
+    assert dict(preview.iter_plan("x", 1)) == files_map
+
+
+def test_duplicates_of_kept_file_are_named_after_it(tmp_path: Path) -> None:
+    for name in ("x_1.jpg", "x_1_duplicate_1.jpg", "y.jpg"):
+        (tmp_path / name).write_bytes(b"same")
+    assert Renamer().get_directory_renaming_map(
+        str(tmp_path),
+        ["x_1.jpg", "x_1_duplicate_1.jpg", "y.jpg"],
+        "x",
+        1,
+        duplicate_action=SUFFIX_DUPLICATES
+    ) == {"y.jpg": "x_1_duplicate_2.jpg"}
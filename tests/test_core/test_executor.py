@@ -0,0 +1,91 @@
+import os
+from pathlib import Path
+
+import pytest
+from app.core.executor import RenameExecutor
+from app.core.renamer import Renamer
+
+
+def test_executor_keeps_names_up_to_date(tmp_path: Path) -> None:
+    (tmp_path / "a.jpg").write_text("")
+    executor = RenameExecutor(str(tmp_path))
+
+    assert executor.rename("a.jpg", "b.jpg")
+    assert executor.names == {"b.jpg"}
+    assert os.listdir(tmp_path) == ["b.jpg"]
+
+    # The old name is gone, so renaming it again is an incorrect map
+    with pytest.raises(ValueError):
+        executor.rename("a.jpg", "c.jpg")
+
+
+def test_executor_does_not_overwrite_existing_files(tmp_path: Path) -> None:
+    (tmp_path / "a.jpg").write_text("a")
+    (tmp_path / "b.jpg").write_text("b")
+    executor = RenameExecutor(str(tmp_path))
+
+    assert not executor.rename("a.jpg", "b.jpg")
+    assert (tmp_path / "b.jpg").read_text() == "b"
+    assert executor.names == {"a.jpg", "b.jpg"}
+
+
+def test_rename_files_from_file_map_lists_directory_once(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch
+) -> None:
+    files_map: dict[str, str] = {
+        f"file_{i}.txt": f"renamed_{i}.txt" for i in range(20)
+    }
+    for old_name in files_map:
+        (tmp_path / old_name).write_text("")
+
+    scans: list[str] = []
+    original_scandir = os.scandir
+
+    def counting_scandir(path):
+        scans.append(path)
+        return original_scandir(path)
+
+    monkeypatch.setattr(os, "listdir", None)
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+    Renamer().rename_files_from_file_map(str(tmp_path), files_map)
+    monkeypatch.undo()
+
+    assert len(scans) == 1
+    assert sorted(os.listdir(tmp_path)) == sorted(files_map.values())
+
+
+def test_chain_stops_at_first_failed_rename(tmp_path: Path) -> None:
+    for name in ("a", "b", "taken"):
+        (tmp_path / name).write_text(name)
+    executor = RenameExecutor(str(tmp_path))
+
+    results: list[bool] = list(
+        executor.execute_chain([("b", "taken"), ("a", "b")])
+    )
+    assert results == [False, False]
+    assert (tmp_path / "a").read_text() == "a"
+    assert (tmp_path / "b").read_text() == "b"
+
+
+def test_chains_are_executed_in_parallel(tmp_path: Path) -> None:
+    chains: list[list[tuple[str, str]]] = []
+    for i in range(50):
+        (tmp_path / f"a_{i}").write_text("")
+        (tmp_path / f"b_{i}").write_text("")
+        chains.append([(f"b_{i}", f"c_{i}"), (f"a_{i}", f"b_{i}")])
+    executor = RenameExecutor(str(tmp_path))
+
+    results: list[bool] = []
+    executor.execute_chains(
+        chains,
+        parallelism=4,
+        step_callback=lambda old_name, new_name, renamed: (
+            results.append(renamed)
+        )
+    )
+    assert results == [True] * 100
+    assert executor.names == set(os.listdir(tmp_path))
+    assert executor.names == {
+        name for i in range(50) for name in (f"b_{i}", f"c_{i}")
+    }
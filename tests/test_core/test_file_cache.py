@@ -0,0 +1,53 @@
+import os
+from pathlib import Path
+
+from app.core.file_cache import FileIdentityCache
+from app.core.snapshot import FileInfo
+
+
+def get_file_info(path: Path) -> FileInfo:
+    stat: os.stat_result = path.stat()
+    return FileInfo(path.name, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def test_values_are_read_once_per_file_identity(tmp_path: Path) -> None:
+    (tmp_path / "a").write_text("a")
+    read: list[str] = []
+    cache: FileIdentityCache[str] = FileIdentityCache()
+
+    def read_name(path: str) -> str:
+        read.append(os.path.basename(path))
+        return read[-1]
+
+    for _ in range(2):
+        assert cache.get_values(
+            str(tmp_path),
+            [get_file_info(tmp_path / "a")],
+            read_name
+        ) == {"a": "a"}
+    assert read == ["a"]
+
+    # Without an inode, files can't be told apart and are always read
+    for _ in range(2):
+        cache.get_values(str(tmp_path), [FileInfo("a", 0, 1, 1)], read_name)
+    assert read == ["a", "a", "a"]
+
+
+def test_least_recently_used_values_are_forgotten(tmp_path: Path) -> None:
+    files: list[FileInfo] = []
+    for name in ("a", "b", "c"):
+        (tmp_path / name).write_text(name)
+        files.append(get_file_info(tmp_path / name))
+    read: list[str] = []
+    cache: FileIdentityCache[str] = FileIdentityCache(max_size=2)
+
+    def read_name(path: str) -> str:
+        read.append(os.path.basename(path))
+        return read[-1]
+
+    cache.get_values(str(tmp_path), files[:2], read_name)
+    # "a" is used again, so "b" is forgotten when "c" is read
+    cache.get_values(str(tmp_path), files[:1], read_name)
+    cache.get_values(str(tmp_path), files[2:], read_name)
+    cache.get_values(str(tmp_path), files, read_name)
+    assert read == ["a", "b", "c", "b"]
@@ -0,0 +1,116 @@
+import json
+from pathlib import Path
+
+import pytest
+from app.cli import main
+from app.core.instrumentation import Instrumentation
+from app.core.renamer import Renamer
+from app.core.snapshot import DIR_ENTRY_STAT_IS_FREE
+from tests.helpers import FakeClock
+
+
+def test_stages_accumulate_until_summary_is_taken(clock: FakeClock) -> None:
+    instrumentation = Instrumentation(clock=clock)
+    for _ in range(2):
+        with instrumentation.stage("plan"):
+            clock.now += 1_000_000
+    with instrumentation.stage("scan"):
+        clock.now += 3_000_000
+
+    summary = instrumentation.take_summary()
+    # Stages are ordered as they happen in a batch
+    assert list(summary.stages) == ["scan", "plan"]
+    assert summary.stages == {"scan": 0.003, "plan": 0.002}
+    assert instrumentation.take_summary().stages == {}
+
+
+def test_rename_latencies_are_in_power_of_two_buckets() -> None:
+    instrumentation = Instrumentation()
+    for latency_us in (0, 5, 7, 8, 1000):
+        instrumentation.record_rename(latency_us * 1000)
+    summary = instrumentation.take_summary()
+    assert summary.calls == {"rename": 5}
+    assert summary.rename_latencies == {1: 1, 8: 2, 16: 1, 1024: 1}
+
+
+def test_rename_files_returns_the_summary(tmp_path: Path) -> None:
+    for name in ("a.jpg", "b.jpg", "c.png"):
+        (tmp_path / name).write_text("")
+    renamer = Renamer(instrumentation=Instrumentation())
+    files_to_rename: list[str] = renamer.filter_extensions(
+        renamer.filter_directories(str(tmp_path)),
+        [".jpg"]
+    )
+    summary = renamer.rename_files(
+        directory=str(tmp_path),
+        files_to_rename=files_to_rename,
+        new_batch_name="holidays",
+        progress_callback=None,
+        number_padding=1
+    ).stats
+    assert summary is not None
+    assert set(summary.stages) == {"scan", "filter", "plan", "execute"}
+    assert summary.calls["rename"] == 2
+    assert summary.calls["listdir"] >= 1
+    assert sum(summary.rename_latencies.values()) == 2
+
+
+def test_rename_files_without_instrumentation_has_no_stats(
+    tmp_path: Path
+) -> None:
+    (tmp_path / "a.jpg").write_text("")
+    assert Renamer().rename_files(
+        directory=str(tmp_path),
+        files_to_rename=["a.jpg"],
+        new_batch_name="holidays",
+        progress_callback=None
+    ).stats is None
+
+
+def test_cli_prints_stats_as_json(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str]
+) -> None:
+    (tmp_path / "a.jpg").write_text("")
+    assert main([
+        str(tmp_path), "-n", "x", "-e", "jpg", "-p", "1",
+        "--no-undo-log", "--json", "--stats"
+    ]) == 0
+    records: list[dict] = [
+        json.loads(line) for line in capsys.readouterr().out.splitlines()
+    ]
+    assert records[-1]["stats"]["calls"]["rename"] == 1
+    assert set(records[-1]["stats"]["stages"]) == {
+        "scan", "filter", "plan", "execute"
+    }
+
+
+def test_saving_plan_records_the_plan_stage(tmp_path: Path) -> None:
+    (tmp_path / "a.jpg").write_text("")
+    renamer = Renamer(instrumentation=Instrumentation())
+    renamer.save_plan(
+        str(tmp_path / "plan.jsonl"),
+        str(tmp_path),
+        {"a.jpg": "x_1.jpg"}
+    )
+    assert "plan" in renamer.instrumentation.take_summary().stages
+
+
+@pytest.mark.skipif(
+    DIR_ENTRY_STAT_IS_FREE,
+    reason="sizes are taken by the directory listing"
+)
+def test_every_stat_of_files_is_counted(tmp_path: Path) -> None:
+    for i in range(50):
+        (tmp_path / f"{i}.jpg").write_text("")
+    instrumentation = Instrumentation()
+    snapshot = Renamer(
+        instrumentation=instrumentation
+    ).get_directory_snapshot(str(tmp_path))
+    snapshot.extension_stats
+    # The directory and every file once
+    assert instrumentation.take_summary().calls["stat"] == 51
+
+    # Sizes and modification times are taken with the same call
+    snapshot.file_info
+    assert "stat" not in instrumentation.take_summary().calls
@@ -0,0 +1,75 @@
+import os
+from pathlib import Path
+
+from app.core.journal import (
+    RenameJournal,
+    get_pending_chains,
+    read_journal
+)
+from app.core.renamer import Renamer
+
+
+def test_rename_files_records_every_rename(tmp_path: Path) -> None:
+    directory: Path = tmp_path / "files"
+    directory.mkdir()
+    for name in ("a.jpg", "b.jpg"):
+        (directory / name).write_text("")
+    journal_path: Path = tmp_path / "journal.jsonl"
+
+    Renamer().rename_files(
+        directory=str(directory),
+        files_to_rename=["a.jpg", "b.jpg"],
+        new_batch_name="holidays",
+        progress_callback=None,
+        number_padding=1,
+        journal_path=str(journal_path),
+        fsync_every=1
+    )
+
+    state = read_journal(str(journal_path))
+    assert state.directory == str(directory)
+    assert state.chains == [
+        [("a.jpg", "holidays_1.jpg")],
+        [("b.jpg", "holidays_2.jpg")]
+    ]
+    assert state.committed == {0, 1}
+    assert get_pending_chains(state) == []
+
+
+def test_resume_continues_interrupted_batch(tmp_path: Path) -> None:
+    directory: Path = tmp_path / "files"
+    directory.mkdir()
+    for name in ("a", "b", "c", "x"):
+        (directory / name).write_text(name)
+    journal_path: Path = tmp_path / "journal.jsonl"
+    chains: list[list[tuple[str, str]]] = [
+        # Swap of "a" and "b" through a temporary name
+        [("a", "tmp"), ("b", "a"), ("tmp", "b")],
+        [("c", "d")],
+        [("x", "y")],
+    ]
+
+    # Simulate a crash: "a" was renamed and committed, "c" was renamed,
+    # but its commit record got lost, and the last record is torn
+    journal = RenameJournal.create(str(journal_path), str(directory), chains)
+    journal.record_intent("a", "tmp")
+    os.rename(directory / "a", directory / "tmp")
+    journal.record_commit("a", "tmp")
+    os.rename(directory / "c", directory / "d")
+    journal.close()
+    with open(journal_path, "a") as file:
+        file.write('{"type":"comm')
+
+    assert get_pending_chains(read_journal(str(journal_path))) == [
+        [("b", "a"), ("tmp", "b")],
+        [("x", "y")],
+    ]
+
+    Renamer().resume_renaming(str(journal_path))
+
+    assert sorted(os.listdir(directory)) == ["a", "b", "d", "y"]
+    assert (directory / "a").read_text() == "b"
+    assert (directory / "b").read_text() == "a"
+    state = read_journal(str(journal_path))
+    assert state.committed == {0, 1, 2, 4}
+    assert get_pending_chains(state) == []
@@ -0,0 +1,183 @@
+import os
+import struct
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from app.core.metadata import (
+    MetadataCache,
+    parse_capture_time,
+    read_capture_time
+)
+from app.core.renamer import Renamer
+from app.core.snapshot import FileInfo
+from app.core.sorting import CAPTURE_TIME_ORDER
+
+
+def create_tiff(
+        date: bytes,
+        byte_order: str = "<",
+        in_exif_ifd: bool = True
+) -> bytes:
+    """
+    Returns TIFF structured data with the date as DateTimeOriginal
+    (in the EXIF IFD) or as DateTime (in IFD0).
+    """
+    mark: bytes = b"II" if byte_order == "<" else b"MM"
+    header: bytes = mark + struct.pack(byte_order + "HI", 42, 8)
+    date += b"\x00"
+    if not in_exif_ifd:
+        # IFD0 with DateTime, followed by the date
+        ifd0: bytes = struct.pack(byte_order + "H", 1) + struct.pack(
+            byte_order + "HHII", 0x0132, 2, len(date), 8 + 2 + 12 + 4
+        ) + b"\x00" * 4
+        return header + ifd0 + date
+    # IFD0 with a pointer to the EXIF IFD, which has DateTimeOriginal
+    exif_ifd_offset: int = 8 + 2 + 12 + 4
+    ifd0 = struct.pack(byte_order + "H", 1) + struct.pack(
+        byte_order + "HHII", 0x8769, 4, 1, exif_ifd_offset
+    ) + b"\x00" * 4
+    exif_ifd: bytes = struct.pack(byte_order + "H", 1) + struct.pack(
+        byte_order + "HHII", 0x9003, 2, len(date), exif_ifd_offset + 18
+    ) + b"\x00" * 4
+    return header + ifd0 + exif_ifd + date
+
+
+def create_jpeg(tiff: bytes) -> bytes:
+    jfif: bytes = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + (
+        b"\x00" * 9
+    )
+    exif: bytes = b"Exif\x00\x00" + tiff
+    app1: bytes = b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+    return b"\xff\xd8" + jfif + app1 + b"\xff\xda" + b"\x00" * 100
+
+
+def create_png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + chunk_type + data + b"\x00" * 4
+
+
+def create_mp4(seconds: int, version: int = 0) -> bytes:
+    ftyp: bytes = struct.pack(">I", 16) + b"ftypisom" + b"\x00" * 4
+    if version == 1:
+        payload: bytes = b"\x01\x00\x00\x00" + struct.pack(">QQ", seconds, 0)
+    else:
+        payload = b"\x00\x00\x00\x00" + struct.pack(">II", seconds, 0)
+    mvhd: bytes = struct.pack(">I", 8 + len(payload)) + b"mvhd" + payload
+    moov: bytes = struct.pack(">I", 8 + len(mvhd)) + b"moov" + mvhd
+    return ftyp + moov
+
+
+CAPTURE_TIME: datetime = datetime(2024, 7, 14, 18, 30, 5)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        create_jpeg(create_tiff(b"2024:07:14 18:30:05")),
+        create_jpeg(create_tiff(b"2024:07:14 18:30:05", ">")),
+        create_tiff(b"2024:07:14 18:30:05", in_exif_ifd=False),
+        create_tiff(b"2024:07:14 18:30:05", ">", in_exif_ifd=False),
+        b"\x89PNG\r\n\x1a\n" + create_png_chunk(
+            b"tIME",
+            struct.pack(">HBBBBB", 2024, 7, 14, 18, 30, 5)
+        ) + create_png_chunk(b"IEND", b""),
+        b"\x89PNG\r\n\x1a\n" + create_png_chunk(
+            b"eXIf",
+            create_tiff(b"2024:07:14 18:30:05")
+        ),
+        create_mp4(3803826605),
+        create_mp4(3803826605, version=1),
+    ]
+)
+def test_capture_time_is_parsed_from_headers(data: bytes) -> None:
+    assert parse_capture_time(data) == CAPTURE_TIME
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"plain text",
+        create_jpeg(create_tiff(b"0000:00:00 00:00:00")),
+        create_jpeg(create_tiff(b"2024:07:14 18:30:05"))[:40],
+        create_mp4(0),
+    ]
+)
+def test_missing_or_invalid_capture_time_is_none(data: bytes) -> None:
+    assert parse_capture_time(data) is None
+
+
+def test_capture_time_is_read_from_file_header(tmp_path: Path) -> None:
+    path: Path = tmp_path / "photo.jpg"
+    # Image data after the header is never read
+    path.write_bytes(
+        create_jpeg(create_tiff(b"2024:07:14 18:30:05")) + b"\x00" * 200_000
+    )
+    (tmp_path / "empty.jpg").write_bytes(b"")
+    assert read_capture_time(str(path)) == CAPTURE_TIME
+    assert read_capture_time(str(tmp_path / "empty.jpg")) is None
+    assert read_capture_time(str(tmp_path / "missing.jpg")) is None
+
+
+def test_capture_times_are_cached_by_file_identity(tmp_path: Path) -> None:
+    path: Path = tmp_path / "photo.jpg"
+    path.write_bytes(create_jpeg(create_tiff(b"2024:07:14 18:30:05")))
+    cache = MetadataCache()
+    file = FileInfo("photo.jpg", 1, 10, 100)
+    assert cache.get_capture_times(str(tmp_path), [file]) == {
+        "photo.jpg": CAPTURE_TIME
+    }
+
+    path.write_bytes(create_jpeg(create_tiff(b"2020:01:01 00:00:00")))
+    assert cache.get_capture_times(str(tmp_path), [file]) == {
+        "photo.jpg": CAPTURE_TIME
+    }
+    # A modified file is read again
+    assert cache.get_capture_times(
+        str(tmp_path),
+        [file._replace(mtime_ns=200)]
+    ) == {"photo.jpg": datetime(2020, 1, 1)}
+
+
+def test_renamed_file_keeps_cached_capture_time(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / "photo.jpg").write_bytes(
+        create_jpeg(create_tiff(b"2024:07:14 18:30:05"))
+    )
+    renamer = Renamer()
+    assert renamer.get_capture_times(str(tmp_path), ["photo.jpg"]) == {
+        "photo.jpg": CAPTURE_TIME
+    }
+
+    os.rename(tmp_path / "photo.jpg", tmp_path / "x_1.jpg")
+    # Headers are not read again
+    monkeypatch.setattr("app.core.metadata.read_capture_time", None)
+    assert renamer.get_capture_times(str(tmp_path), ["x_1.jpg"]) == {
+        "x_1.jpg": CAPTURE_TIME
+    }
+
+
+def test_renaming_map_in_capture_time_order(tmp_path: Path) -> None:
+    dates: dict[str, bytes] = {
+        "a.jpg": b"2024:07:14 18:30:05",
+        "b.jpg": b"2023:01:01 10:00:00",
+        "c.jpg": b"2024:01:01 10:00:00",
+    }
+    for name, date in dates.items():
+        (tmp_path / name).write_bytes(create_jpeg(create_tiff(date)))
+    (tmp_path / "0.jpg").write_bytes(b"no header")
+    renamer = Renamer()
+    files: list[str] = ["0.jpg", "a.jpg", "b.jpg", "c.jpg"]
+    assert renamer.get_renaming_map(
+        list(files),
+        "x",
+        1,
+        renamer.get_sort_key(str(tmp_path), files, CAPTURE_TIME_ORDER)
+    ) == {
+        "b.jpg": "x_1.jpg",
+        "c.jpg": "x_2.jpg",
+        "a.jpg": "x_3.jpg",
+        "0.jpg": "x_4.jpg",
+    }
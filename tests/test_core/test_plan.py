@@ -0,0 +1,86 @@
+import os
+from pathlib import Path
+
+import pytest
+from app.cli import main
+from app.core.plan import iter_plan_steps, read_plan
+from app.core.planner import TEMPORARY_NAME_PREFIX
+from app.core.renamer import Renamer
+
+
+@pytest.fixture
+def directory(directory: Path) -> Path:
+    for name in ("a", "b", "c.jpg"):
+        (directory / name).write_text(name)
+    return directory
+
+
+def test_saved_plan_keeps_the_order_and_temporary_names(
+    directory: Path,
+    tmp_path: Path
+) -> None:
+    plan_path: str = str(tmp_path / "plan.jsonl")
+    count: int = Renamer().save_plan(
+        plan_path,
+        str(directory),
+        {"a": "b", "b": "a", "c.jpg": "x_1.jpg"}
+    )
+    assert count == 4
+    assert sorted(os.listdir(directory)) == ["a", "b", "c.jpg"]
+
+    plan = read_plan(plan_path)
+    assert plan.directory == str(directory)
+    assert list(iter_plan_steps(plan_path)) == plan.steps
+    assert sum(
+        step.new_name.startswith(TEMPORARY_NAME_PREFIX) for step in plan.steps
+    ) == 1
+    assert all(
+        step.inode == (directory / step.old_name).stat().st_ino
+        for step in plan.steps
+        if not step.old_name.startswith(TEMPORARY_NAME_PREFIX)
+    )
+
+
+def test_apply_plan_executes_saved_renames(
+    directory: Path,
+    tmp_path: Path
+) -> None:
+    plan_path: str = str(tmp_path / "plan.jsonl")
+    Renamer().save_plan(
+        plan_path,
+        str(directory),
+        {"a": "b", "b": "a", "c.jpg": "x_1.jpg"}
+    )
+    Renamer().apply_plan(plan_path)
+    assert sorted(os.listdir(directory)) == ["a", "b", "x_1.jpg"]
+    assert (directory / "a").read_text() == "b"
+
+
+@pytest.mark.parametrize("change", ["remove_source", "create_target"])
+def test_apply_plan_refuses_a_changed_directory(
+    directory: Path,
+    tmp_path: Path,
+    change: str
+) -> None:
+    plan_path: str = str(tmp_path / "plan.jsonl")
+    Renamer().save_plan(plan_path, str(directory), {"c.jpg": "x_1.jpg"})
+    if change == "remove_source":
+        (directory / "c.jpg").unlink()
+    else:
+        (directory / "x_1.jpg").write_text("")
+    files_before: list[str] = sorted(os.listdir(directory))
+
+    with pytest.raises(ValueError):
+        Renamer().apply_plan(plan_path)
+    assert sorted(os.listdir(directory)) == files_before
+
+
+def test_cli_saves_and_applies_a_plan(directory: Path, tmp_path: Path) -> None:
+    plan_path: str = str(tmp_path / "plan.jsonl")
+    assert main([
+        str(directory), "-n", "x", "-e", "jpg", "-p", "1",
+        "--save-plan", plan_path
+    ]) == 0
+    assert "c.jpg" in os.listdir(directory)
+    assert main(["--apply-plan", plan_path, "--no-undo-log"]) == 0
+    assert sorted(os.listdir(directory)) == ["a", "b", "x_1.jpg"]
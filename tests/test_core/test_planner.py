@@ -0,0 +1,80 @@
+import os
+from pathlib import Path
+
+import pytest
+from app.core.planner import (
+    RenameStep,
+    TEMPORARY_NAME_PREFIX,
+    get_rename_chains,
+    order_renames
+)
+from app.core.renamer import Renamer
+
+
+def test_chain_is_renamed_from_its_end() -> None:
+    files_map: dict[str, str] = {
+        "a.jpg": "b.jpg",
+        "b.jpg": "c.jpg",
+        "c.jpg": "d.jpg",
+    }
+    assert order_renames(files_map) == [
+        RenameStep("c.jpg", "d.jpg"),
+        RenameStep("b.jpg", "c.jpg"),
+        RenameStep("a.jpg", "b.jpg"),
+    ]
+
+
+def test_cycle_is_broken_with_one_temporary_name() -> None:
+    files_map: dict[str, str] = {
+        "a.jpg": "b.jpg",
+        "b.jpg": "c.jpg",
+        "c.jpg": "a.jpg",
+        "x.jpg": "x.jpg",
+    }
+    steps: list[RenameStep] = order_renames(files_map)
+    temporary_names: set[str] = {
+        name for step in steps for name in step
+        if name.startswith(TEMPORARY_NAME_PREFIX)
+    }
+    assert len(steps) == 4
+    assert len(temporary_names) == 1
+
+    # Simulate the renames to check that no name is ever taken twice
+    names: set[str] = set(files_map)
+    for old_name, new_name in steps:
+        assert old_name in names and new_name not in names
+        names.remove(old_name)
+        names.add(new_name)
+    assert names == {"a.jpg", "b.jpg", "c.jpg", "x.jpg"}
+
+
+def test_chains_are_independent() -> None:
+    files_map: dict[str, str] = {
+        "a": "b", "b": "c",
+        "x": "y", "y": "x",
+        "p": "q",
+    }
+    chains: list[list[RenameStep]] = get_rename_chains(files_map)
+    assert len(chains) == 3
+    for chain in chains:
+        sources: set[str] = {step.old_name for step in chain}
+        for other_chain in chains:
+            if other_chain is not chain:
+                assert not sources & {step.new_name for step in other_chain}
+
+
+def test_duplicate_targets_are_rejected() -> None:
+    with pytest.raises(ValueError):
+        order_renames({"a": "c", "b": "c"})
+
+
+def test_rename_files_from_file_map_swaps_names(tmp_path: Path) -> None:
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "b.txt").write_text("b")
+    Renamer().rename_files_from_file_map(
+        str(tmp_path),
+        {"a.txt": "b.txt", "b.txt": "a.txt"}
+    )
+    assert sorted(os.listdir(tmp_path)) == ["a.txt", "b.txt"]
+    assert (tmp_path / "a.txt").read_text() == "b"
+    assert (tmp_path / "b.txt").read_text() == "a"
@@ -0,0 +1,36 @@
+import pytest
+from app.core.preview import RenamingPreview
+from app.core.renamer import Renamer
+
+
+FILES: list[str] = [
+    "IMG_10.jpg",
+    "IMG_9.jpg",
+    "holidays_002.jpg",
+    "holidays_2.png",
+    "holidays_009.jpg",
+    "holidays_001",
+    "notes.txt",
+    "summer_01.png",
+]
+
+
+@pytest.mark.parametrize(
+    ("new_batch_name", "number_padding"),
+    [("holidays", 3), ("holidays", 1), ("summer", 2), ("other", 3)]
+)
+def test_preview_plans_the_same_as_renaming_map(
+    new_batch_name: str,
+    number_padding: int
+) -> None:
+    renamer = Renamer()
+    preview = RenamingPreview(renamer, list(reversed(FILES)))
+    assert dict(preview.iter_plan(new_batch_name, number_padding)) == (
+        renamer.get_renaming_map(list(FILES), new_batch_name, number_padding)
+    )
+
+
+def test_preview_only_checks_numbered_files() -> None:
+    preview = RenamingPreview(Renamer(), list(FILES))
+    assert "notes.txt" not in preview.numbered_files
+    assert "holidays_002.jpg" in preview.numbered_files
@@ -0,0 +1,84 @@
+from pathlib import Path
+
+from app.core.progress import ThrottledProgress
+from app.core.renamer import Renamer
+from tests.helpers import FakeClock, RecordingSignal
+
+
+def test_progress_is_rate_limited_by_time(
+    signal: RecordingSignal,
+    clock: FakeClock
+) -> None:
+    progress = ThrottledProgress(signal, total=1000, clock=clock)
+
+    # 1000 updates within the same instant are emitted only once
+    for done in range(1, 1001):
+        progress.update(done)
+    assert signal.values == [0.1]
+
+    clock.now = 1.0
+    progress.update(500)
+    assert signal.values == [0.1, 50.0]
+
+
+def test_progress_is_rate_limited_by_percent_delta(
+    signal: RecordingSignal,
+    clock: FakeClock
+) -> None:
+    progress = ThrottledProgress(
+        signal, total=1000, min_percent_delta=10.0, clock=clock
+    )
+    for done in range(1, 1001):
+        clock.now += 1.0
+        progress.update(done)
+    assert len(signal.values) == 10
+
+
+def test_progress_always_finishes_at_100(
+    signal: RecordingSignal,
+    clock: FakeClock
+) -> None:
+    progress = ThrottledProgress(signal, total=3, clock=clock)
+    for done in range(1, 4):
+        progress.update(done)
+    progress.finish()
+    assert signal.values[-1] == 100.0
+
+
+def test_rename_files_reports_100_percent(
+    tmp_path: Path,
+    signal: RecordingSignal
+) -> None:
+    for name in ("a.jpg", "b.jpg"):
+        (tmp_path / name).write_text("")
+    Renamer().rename_files(
+        directory=str(tmp_path),
+        files_to_rename=["a.jpg", "b.jpg"],
+        new_batch_name="holidays",
+        progress_callback=signal,
+        number_padding=1
+    )
+    assert signal.values[-1] == 100.0
+    assert {p.name for p in tmp_path.iterdir()} == {
+        "holidays_1.jpg", "holidays_2.jpg"
+    }
+
+
+def test_rename_files_in_parallel_reports_100_percent(
+    tmp_path: Path,
+    signal: RecordingSignal
+) -> None:
+    files_to_rename: list[str] = [f"{i}.jpg" for i in range(40)]
+    for name in files_to_rename:
+        (tmp_path / name).write_text("")
+    Renamer().rename_files(
+        directory=str(tmp_path),
+        files_to_rename=files_to_rename,
+        new_batch_name="holidays",
+        progress_callback=signal,
+        number_padding=2,
+        parallelism=4
+    )
+    assert signal.values[-1] == 100.0
+    assert signal.values == sorted(signal.values)
+    assert len(list(tmp_path.glob("holidays_??.jpg"))) == 40
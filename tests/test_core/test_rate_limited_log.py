@@ -0,0 +1,66 @@
+import logging
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from app.core.rate_limited_log import RateLimitedLog
+from app.core.renamer import Renamer
+from tests.helpers import FakeClock
+
+
+def test_records_above_the_limit_are_counted_and_reported(
+    caplog: pytest.LogCaptureFixture,
+    clock: FakeClock
+) -> None:
+    logger = logging.getLogger("app.test_rate_limited_log")
+    log = RateLimitedLog(
+        logger, logging.INFO, records_per_second=3, clock=clock
+    )
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        for i in range(10):
+            log.log("Renamed %d", i)
+        clock.now = 1.0
+        log.log("Renamed %d", 10)
+        log.flush()
+    assert [record.getMessage() for record in caplog.records] == [
+        "Renamed 0", "Renamed 1", "Renamed 2",
+        "7 similar records suppressed",
+        "Renamed 10",
+    ]
+
+
+def test_disabled_records_are_not_counted(
+    caplog: pytest.LogCaptureFixture
+) -> None:
+    logger = logging.getLogger("app.test_rate_limited_log")
+    log = RateLimitedLog(logger, logging.DEBUG, records_per_second=1)
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        for i in range(10):
+            log.log("Renamed %d", i)
+        log.flush()
+    assert caplog.records == []
+
+
+def test_batch_ends_with_a_summary_record(
+    tmp_path: Path,
+    caplog: pytest.LogCaptureFixture
+) -> None:
+    for name in ("a.jpg", "b.jpg"):
+        (tmp_path / name).write_text("")
+    with caplog.at_level(logging.INFO, logger="app"):
+        Renamer().rename_files_from_file_map(
+            str(tmp_path),
+            {"a.jpg": "x_1.jpg", "b.jpg": "x_2.jpg"}
+        )
+    assert caplog.records[-1].getMessage().startswith(
+        f"Renamed 2 files in {tmp_path} in "
+    )
+
+
+def test_importing_the_library_does_not_configure_logging() -> None:
+    code: str = (
+        "import logging, app.core.renamer, app.cli; "
+        "assert not logging.getLogger().handlers"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
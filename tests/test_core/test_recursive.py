@@ -0,0 +1,73 @@
+import os
+from pathlib import Path
+
+from app.core.recursive import rename_directory, rename_tree
+from tests.helpers import NullSignal, RecordingSignal
+
+
+def make_tree(root: Path) -> list[Path]:
+    directories: list[Path] = [root, root / "a", root / "a" / "b", root / "c"]
+    for directory in directories:
+        directory.mkdir(exist_ok=True)
+        for name in ("x.jpg", "y.jpg", "z.png"):
+            (directory / name).write_text("")
+    return directories
+
+
+def test_rename_directory_dry_run_does_not_rename(tmp_path: Path) -> None:
+    (tmp_path / "x.jpg").write_text("")
+    result = rename_directory(str(tmp_path), [".jpg"], "holidays", 1, True)
+    assert result.renames == [("x.jpg", "holidays_1.jpg", "planned")]
+    assert os.listdir(tmp_path) == ["x.jpg"]
+
+
+def test_rename_tree_numbers_every_directory_separately(
+    tmp_path: Path,
+    signal: RecordingSignal
+) -> None:
+    directories: list[Path] = make_tree(tmp_path)
+    results = rename_tree(
+        root=str(tmp_path),
+        extensions=[".jpg"],
+        new_batch_name="holidays",
+        progress_callback=signal,
+        number_padding=1,
+        max_workers=2
+    )
+
+    assert sorted(result.directory for result in results) == sorted(
+        str(directory) for directory in directories
+    )
+    assert not any(result.failed for result in results)
+    assert signal.values[-1] == 100.0
+    for directory in directories:
+        assert {
+            path.name for path in directory.iterdir() if path.is_file()
+        } == {"holidays_1.jpg", "holidays_2.jpg", "z.png"}
+
+
+def test_rename_tree_writes_undo_log_per_directory(
+    tmp_path: Path,
+    null_signal: NullSignal
+) -> None:
+    root: Path = tmp_path / "root"
+    directories: list[Path] = make_tree(root)
+    undo_log_dir: Path = tmp_path / "undo"
+    results = rename_tree(
+        root=str(root),
+        extensions=[".jpg"],
+        new_batch_name="holidays",
+        progress_callback=null_signal,
+        number_padding=1,
+        max_workers=2,
+        undo_log_dir=str(undo_log_dir)
+    )
+
+    undo_log_paths: list[str | None] = [
+        result.undo_log_path for result in results
+    ]
+    assert None not in undo_log_paths
+    assert sorted(os.listdir(undo_log_dir)) == sorted(
+        os.path.basename(path) for path in undo_log_paths
+    )
+    assert len(undo_log_paths) == len(directories)
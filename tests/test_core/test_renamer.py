@@ -24,7 +24,8 @@ def pattern() -> str:
         ("test_name_5", 5),
         ("test_name_56", 56),
         ("test_name_7.jpg", 7),
-        ("test_name_78.exe", 78)
+        ("test_name_78.exe", 78),
+        ("test_name_9.tar.gz", 9)
     ]
 )
 def test_get_file_number_from_name(filename: str, number: int) -> None:
@@ -113,6 +114,46 @@ def test_get_renaming_map_some_files_already_renamed() -> None:
     assert set(new_names) == expected
 
 
+def test_get_renaming_map_keeps_relative_order() -> None:
+    """
+    Files being renamed get the free numbers in their sorted order,
+    skipping numbers of files which already have correct names
+    """
+    files_to_rename: list[str] = [
+        "IMG_235.jpg",
+        "Holidays_001.jpg",
+        "IMG_234.jpg",
+        "ABC_123.jpg",
+        "Holidays_2077.v",
+    ]
+    expected: dict[str, str] = {
+        "ABC_123.jpg": "Holidays_002.jpg",
+        "Holidays_2077.v": "Holidays_003.v",
+        "IMG_234.jpg": "Holidays_004.jpg",
+        "IMG_235.jpg": "Holidays_005.jpg",
+    }
+    r = Renamer()
+    assert r.get_renaming_map(files_to_rename, "Holidays", 3) == expected
+
+
+def test_get_renaming_map_files_sharing_a_number() -> None:
+    """
+    Only the first of the files with the same correct number keeps it,
+    the other one is renamed to a free number
+    """
+    files_to_rename: list[str] = [
+        "holidays_1.jpg",
+        "holidays_1.png",
+        "paris.jpg",
+    ]
+    expected: dict[str, str] = {
+        "holidays_1.png": "holidays_2.png",
+        "paris.jpg": "holidays_3.jpg",
+    }
+    r = Renamer()
+    assert r.get_renaming_map(files_to_rename, "holidays", 1) == expected
+
+
 @pytest.mark.parametrize(
         "new_name, valid",
         [
@@ -0,0 +1,116 @@
+import os
+from pathlib import Path
+
+import pytest
+from app.core.cancellation import CancellationToken
+from app.core.renamer import Renamer
+from app.core.snapshot import (
+    DirectorySnapshot,
+    ExtensionStats,
+    merge_extension_stats
+)
+from tests.helpers import RecordingSignal
+
+
+@pytest.fixture
+def directory(directory: Path) -> Path:
+    """
+    Returns a directory with 3 files and 1 subdirectory,
+    with its mtime set well in the past, so that snapshots
+    of it are not considered racy.
+    """
+    for name in ("a.jpg", "b.png", "no_extension"):
+        (directory / name).write_text("")
+    (directory / "subdirectory.d").mkdir()
+    os.utime(directory, ns=(0, 1_000_000_000))
+    return directory
+
+
+def test_scan_separates_files_and_directories(directory: Path) -> None:
+    snapshot = DirectorySnapshot.scan(str(directory))
+    assert set(snapshot.names) == {
+        "a.jpg", "b.png", "no_extension", "subdirectory.d"
+    }
+    assert set(snapshot.file_names) == {"a.jpg", "b.png", "no_extension"}
+    assert snapshot.extensions == {".jpg", ".png", ""}
+
+
+def test_renamer_reuses_snapshot_until_directory_changes(
+    directory: Path
+) -> None:
+    r = Renamer()
+    snapshot = r.get_directory_snapshot(str(directory))
+    assert r.get_directory_snapshot(str(directory)) is snapshot
+
+    (directory / "c.txt").write_text("")
+    os.utime(directory, ns=(0, 2_000_000_000))
+    assert r.get_directory_snapshot(str(directory)) is not snapshot
+    assert ".txt" in r.get_all_file_extensions(str(directory))
+
+
+def test_recently_modified_directory_snapshot_is_stale(
+    tmp_path: Path
+) -> None:
+    (tmp_path / "a.jpg").write_text("")
+    snapshot = DirectorySnapshot.scan(str(tmp_path))
+    assert snapshot.is_stale()
+
+
+def test_extension_stats_count_files_and_bytes(tmp_path: Path) -> None:
+    (tmp_path / "a.jpg").write_text("x" * 10)
+    (tmp_path / "b.jpg").write_text("x" * 5)
+    (tmp_path / "c.png").write_text("")
+    (tmp_path / "directory.jpg").mkdir()
+    stats = Renamer().get_extension_stats(str(tmp_path))
+    assert stats == {".jpg": (2, 15), ".png": (1, 0)}
+    assert stats[".jpg"].total_size == 15
+
+
+def test_scan_reports_entries_in_batches(directory: Path) -> None:
+    batches: list[list[str]] = []
+    snapshot = DirectorySnapshot.scan(
+        str(directory),
+        batch_callback=lambda entries: batches.append(
+            [entry.name for entry in entries]
+        ),
+        batch_size=3
+    )
+    assert [len(batch) for batch in batches] == [3, 1]
+    assert [name for batch in batches for name in batch] == list(
+        snapshot.names
+    )
+
+
+def test_scan_directory_reports_partial_extension_stats(
+    tmp_path: Path
+) -> None:
+    for i in range(2500):
+        (tmp_path / f"{i}.jpg").write_text("x")
+    (tmp_path / "a.png").write_text("xy")
+    partial_results = RecordingSignal()
+    progress = RecordingSignal()
+    r = Renamer()
+    snapshot = r.scan_directory(
+        str(tmp_path),
+        progress_callback=progress,
+        partial_result_callback=partial_results
+    )
+    assert snapshot is not None
+    merged: dict[str, ExtensionStats] = {}
+    for stats in partial_results.values:
+        merge_extension_stats(merged, stats)
+    assert merged == {".jpg": (2500, 2500), ".png": (1, 2)}
+    assert progress.values[-1] == 2501
+    assert r.get_extension_stats(str(tmp_path)) == merged
+
+
+def test_cancelled_scan_returns_none(directory: Path) -> None:
+    token = CancellationToken()
+    token.cancel()
+    r = Renamer()
+    assert r.scan_directory(
+        str(directory),
+        cancellation_token=token
+    ) is None
+    # A cancelled scan is not reused
+    assert r.scan_directory(str(directory)) is not None
@@ -0,0 +1,138 @@
+import os
+
+from app.core.renamer import Renamer
+from app.core.snapshot import FileInfo
+from app.core.sorting import (
+    MTIME_ORDER,
+    NAME_ORDER,
+    NATURAL_ORDER,
+    SIZE_ORDER,
+    SortKeyCache,
+    SortOrder,
+    natural_key
+)
+
+
+def test_natural_key_compares_numbers_by_value() -> None:
+    names: list[str] = ["img_10.jpg", "IMG_9.jpg", "img_1.jpg", "img.jpg"]
+    assert sorted(names, key=natural_key) == [
+        "img.jpg", "img_1.jpg", "IMG_9.jpg", "img_10.jpg"
+    ]
+
+
+def test_natural_key_never_compares_text_with_numbers() -> None:
+    names: list[str] = ["1a", "a1", "_1", "10", "a"]
+    assert sorted(names, key=natural_key)[:2] == ["1a", "10"]
+
+
+def create_files(tmp_path, sizes: dict[str, int]) -> None:
+    for i, (name, size) in enumerate(sizes.items()):
+        path = tmp_path / name
+        path.write_bytes(b"x" * size)
+        # Modification times in the reverse order of names
+        os.utime(path, ns=(0, (len(sizes) - i) * 1_000_000_000))
+
+
+def test_renaming_map_in_mtime_and_size_order(tmp_path) -> None:
+    create_files(tmp_path, {"a.jpg": 20, "b.jpg": 10, "c.jpg": 30})
+    renamer = Renamer()
+    files: list[str] = ["a.jpg", "b.jpg", "c.jpg"]
+
+    assert renamer.get_renaming_map(
+        list(files),
+        "x",
+        1,
+        renamer.get_sort_key(str(tmp_path), files, MTIME_ORDER)
+    ) == {"c.jpg": "x_1.jpg", "b.jpg": "x_2.jpg", "a.jpg": "x_3.jpg"}
+    assert renamer.get_renaming_map(
+        list(files),
+        "x",
+        1,
+        renamer.get_sort_key(str(tmp_path), files, SIZE_ORDER)
+    ) == {"b.jpg": "x_1.jpg", "a.jpg": "x_2.jpg", "c.jpg": "x_3.jpg"}
+
+
+def test_renaming_map_in_natural_order_keeps_matching_names(tmp_path) -> None:
+    create_files(tmp_path, {"x_2.jpg": 1, "IMG_10.jpg": 1, "IMG_9.jpg": 1})
+    renamer = Renamer()
+    files: list[str] = ["x_2.jpg", "IMG_10.jpg", "IMG_9.jpg"]
+    assert renamer.get_renaming_map(
+        list(files),
+        "x",
+        1,
+        renamer.get_sort_key(str(tmp_path), files, NATURAL_ORDER)
+    ) == {"IMG_9.jpg": "x_1.jpg", "IMG_10.jpg": "x_3.jpg"}
+
+
+def test_no_sort_key_for_name_order(tmp_path) -> None:
+    assert Renamer().get_sort_key(str(tmp_path), [], NAME_ORDER) is None
+    assert Renamer().get_sort_key(str(tmp_path), [], None) is None
+
+
+def test_sort_keys_are_cached_by_file_identity() -> None:
+    calls: list[str] = []
+
+    def key(file: FileInfo) -> str:
+        calls.append(file.name)
+        return file.name
+
+    order = SortOrder("custom", key)
+    cache = SortKeyCache()
+    files: list[FileInfo] = [
+        FileInfo("a.jpg", 1, 10, 100),
+        FileInfo("b.jpg", 2, 10, 100)
+    ]
+    assert cache.get_keys(order, files) == {"a.jpg": "a.jpg", "b.jpg": "b.jpg"}
+    cache.get_keys(order, files)
+    assert calls == ["a.jpg", "b.jpg"]
+
+    # A modified file gets a new key
+    cache.get_keys(order, [FileInfo("a.jpg", 1, 20, 200)])
+    assert calls == ["a.jpg", "b.jpg", "a.jpg"]
+
+
+def test_orders_sharing_a_name_have_their_own_keys() -> None:
+    cache = SortKeyCache()
+    files: list[FileInfo] = [FileInfo("a.jpg", 1, 10, 100)]
+    assert cache.get_keys(SortOrder("custom", lambda file: 1), files) == {
+        "a.jpg": 1
+    }
+    assert cache.get_keys(SortOrder("custom", lambda file: 2), files) == {
+        "a.jpg": 2
+    }
+
+
+def test_least_recently_used_keys_are_forgotten() -> None:
+    calls: list[str] = []
+
+    def key(file: FileInfo) -> str:
+        calls.append(file.name)
+        return file.name
+
+    order = SortOrder("custom", key)
+    cache = SortKeyCache(max_size=2)
+    a, b, c = (FileInfo(name, 0, -1, -1) for name in ("a", "b", "c"))
+    cache.get_keys(order, [a, b])
+    cache.get_keys(order, [a, c])
+    assert calls == ["a", "b", "c"]
+    cache.get_keys(order, [a, b])
+    assert calls == ["a", "b", "c", "b"]
+
+
+def test_file_edited_after_scan_sorts_by_new_mtime(tmp_path) -> None:
+    create_files(tmp_path, {"a.jpg": 1, "b.jpg": 1})
+    # Old enough for the snapshot of the directory to be trusted
+    os.utime(tmp_path, ns=(0, 1_000_000_000))
+    renamer = Renamer()
+    files: list[str] = ["a.jpg", "b.jpg"]
+    assert sorted(
+        files,
+        key=renamer.get_sort_key(str(tmp_path), files, MTIME_ORDER)
+    ) == ["b.jpg", "a.jpg"]
+
+    # Edited in place, which doesn't change the directory
+    os.utime(tmp_path / "b.jpg", ns=(0, 10_000_000_000))
+    assert sorted(
+        files,
+        key=renamer.get_sort_key(str(tmp_path), files, MTIME_ORDER)
+    ) == ["a.jpg", "b.jpg"]
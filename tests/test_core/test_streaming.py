@@ -0,0 +1,88 @@
+import logging
+import os
+import tracemalloc
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+from app.core.renamer import Renamer
+from tests.helpers import NullSignal
+
+
+FILE_COUNT: int = 4_000
+
+
+@pytest.fixture(autouse=True)
+def no_logging() -> Iterator[None]:
+    """Logged records would be kept in memory by pytest"""
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+def make_directory(path: Path) -> Path:
+    path.mkdir()
+    for i in range(FILE_COUNT):
+        extension: str = ".jpg" if i % 2 else ".png"
+        (path / f"IMG_{i:06}{extension}").touch()
+    (path / "holidays_000001.jpg").touch()
+    (path / "subdirectory.jpg").mkdir()
+    return path
+
+
+def get_peak_memory(fn: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_streaming_scan_and_filter_memory_is_bounded(tmp_path: Path) -> None:
+    directory: Path = make_directory(tmp_path / "files")
+    r = Renamer()
+
+    def count_streamed() -> int:
+        return sum(1 for _ in r.iter_files_with_extensions(
+            r.iter_file_names(str(directory)), [".jpg"]
+        ))
+
+    assert count_streamed() == FILE_COUNT // 2 + 1
+    # Names of all the files alone take more than 200 kB
+    assert get_peak_memory(count_streamed) < 64 * 1024
+
+
+def test_rename_files_streaming_uses_less_memory(
+    tmp_path: Path,
+    null_signal: NullSignal
+) -> None:
+    streamed: Path = make_directory(tmp_path / "streamed")
+    materialized: Path = make_directory(tmp_path / "materialized")
+
+    streamed_peak: int = get_peak_memory(
+        lambda: Renamer().rename_files_streaming(
+            directory=str(streamed),
+            extensions=[".jpg"],
+            new_batch_name="holidays",
+            progress_callback=null_signal,
+            number_padding=6
+        )
+    )
+
+    def rename_materialized() -> None:
+        r = Renamer()
+        r.rename_files(
+            directory=str(materialized),
+            files_to_rename=r.filter_extensions(
+                r.filter_directories(str(materialized)), [".jpg"]
+            ),
+            new_batch_name="holidays",
+            progress_callback=null_signal,
+            number_padding=6
+        )
+
+    materialized_peak: int = get_peak_memory(rename_materialized)
+
+    assert sorted(os.listdir(streamed)) == sorted(os.listdir(materialized))
+    assert streamed_peak < materialized_peak / 2
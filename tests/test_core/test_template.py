@@ -0,0 +1,55 @@
+import pytest
+from app.core.renamer import Renamer
+from app.core.template import (
+    NameTemplate,
+    get_name_template,
+    get_validation_pattern
+)
+
+
+@pytest.mark.parametrize(
+    "name, number",
+    [
+        ("x_001.jpg", 1),
+        ("x_042", 42),
+        ("x_123.tar.gz", 123),
+        ("x_1000.jpg", 1000),
+        ("x_01.jpg", None),
+        ("x_0001.jpg", None),
+        ("x_000.jpg", None),
+        ("x_00a.jpg", None),
+        ("x_１２３.jpg", None),
+        ("x_001_duplicate_1.jpg", None),
+        ("y_001.jpg", None),
+        ("xx_001.jpg", None),
+        ("x001.jpg", None),
+    ]
+)
+def test_template_returns_number_of_matching_name(
+    name: str,
+    number: int | None
+) -> None:
+    assert NameTemplate("x", 3).match(name) == number
+
+
+def test_new_name_is_not_a_regex() -> None:
+    template = NameTemplate("a.b+(c)", 2)
+    assert template.match("a.b+(c)_07.jpg") == 7
+    assert template.match("aXbb(c)_07.jpg") is None
+    assert template.format(7, ".jpg") == "a.b+(c)_07.jpg"
+
+
+def test_templates_and_patterns_are_cached() -> None:
+    assert get_name_template("x", 3) is get_name_template("x", 3)
+    assert get_name_template("x", 3) is not get_name_template("x", 4)
+    assert get_validation_pattern("^x$") is get_validation_pattern("^x$")
+    assert Renamer().validate_new_name("x", "^x$")
+    assert not Renamer().validate_new_name("y", "^x$")
+
+
+def test_renaming_map_keeps_names_with_regex_characters() -> None:
+    files: list[str] = ["a+b_2.jpg", "aab_1.jpg", "c.png", "a+b_1.tar.gz"]
+    assert Renamer().get_renaming_map(files, "a+b", 1) == {
+        "aab_1.jpg": "a+b_3.jpg",
+        "c.png": "a+b_4.png",
+    }
@@ -0,0 +1,181 @@
+import os
+from pathlib import Path
+
+import pytest
+from app.cli import main
+from app.core.journal import RenameJournal
+from app.core.models import ISignal
+from app.core.renamer import Renamer
+from app.core.undo import (
+    UndoLogRecorder,
+    get_latest_undo_log,
+    read_undo_log
+)
+
+
+def create_files(directory: Path, names: list[str]) -> None:
+    for name in names:
+        (directory / name).write_text(name)
+
+
+@pytest.fixture
+def log_dir(tmp_path: Path) -> Path:
+    return tmp_path / "undo"
+
+
+def test_undo_restores_original_names(
+    directory: Path,
+    log_dir: Path
+) -> None:
+    names: list[str] = ["b.jpg", "a.jpg", "c.png", "holidays_2.jpg"]
+    create_files(directory, names)
+    renamer = Renamer(undo_log_dir=str(log_dir))
+    renamer.rename_files_from_file_map(
+        str(directory),
+        {"a.jpg": "holidays_1.jpg", "b.jpg": "holidays_3.jpg"}
+    )
+    assert renamer.last_undo_log_path is not None
+
+    renamer.undo_renaming(renamer.last_undo_log_path)
+    assert sorted(os.listdir(directory)) == sorted(names)
+    assert (directory / "a.jpg").read_text() == "a.jpg"
+    # A fully undone batch can't be undone again
+    assert get_latest_undo_log(str(log_dir)) is None
+
+
+def test_undo_log_collapses_cycles_to_original_names(
+    directory: Path,
+    log_dir: Path
+) -> None:
+    create_files(directory, ["a", "b"])
+    renamer = Renamer(undo_log_dir=str(log_dir))
+    renamer.rename_files_from_file_map(str(directory), {"a": "b", "b": "a"})
+    assert renamer.last_undo_log_path is not None
+
+    # The temporary name used to swap the files is not in the log
+    entries = read_undo_log(renamer.last_undo_log_path).entries
+    assert sorted((name, original) for name, original, _ in entries) == [
+        ("a", "b"), ("b", "a")
+    ]
+    renamer.undo_renaming(renamer.last_undo_log_path)
+    assert (directory / "a").read_text() == "a"
+    assert (directory / "b").read_text() == "b"
+
+
+def test_undo_skips_replaced_files(directory: Path, log_dir: Path) -> None:
+    create_files(directory, ["a.jpg", "b.jpg"])
+    renamer = Renamer(undo_log_dir=str(log_dir))
+    renamer.rename_files_from_file_map(
+        str(directory),
+        {"a.jpg": "x_1.jpg", "b.jpg": "x_2.jpg"}
+    )
+    assert renamer.last_undo_log_path is not None
+    # Created before the old file is removed, so it gets another inode
+    (directory / "new.jpg").write_text("another file")
+    os.replace(directory / "new.jpg", directory / "x_2.jpg")
+
+    renamer.undo_renaming(renamer.last_undo_log_path)
+    assert sorted(os.listdir(directory)) == ["a.jpg", "x_2.jpg"]
+    # The log is kept, as not every file was renamed back
+    assert os.path.exists(renamer.last_undo_log_path)
+
+
+def test_undo_refuses_a_replaced_directory(
+    directory: Path,
+    log_dir: Path
+) -> None:
+    create_files(directory, ["a.jpg"])
+    renamer = Renamer(undo_log_dir=str(log_dir))
+    renamer.rename_files_from_file_map(str(directory), {"a.jpg": "x_1.jpg"})
+    assert renamer.last_undo_log_path is not None
+    directory.rename(directory.with_name("moved"))
+    directory.mkdir()
+    create_files(directory, ["x_1.jpg"])
+
+    with pytest.raises(ValueError):
+        renamer.undo_renaming(renamer.last_undo_log_path)
+    assert os.listdir(directory) == ["x_1.jpg"]
+
+
+def test_no_undo_log_without_a_log_directory(directory: Path) -> None:
+    create_files(directory, ["a.jpg"])
+    renamer = Renamer()
+    renamer.rename_files_from_file_map(str(directory), {"a.jpg": "x_1.jpg"})
+    assert renamer.last_undo_log_path is None
+
+
+def test_cli_undoes_the_last_batch(directory: Path, log_dir: Path) -> None:
+    create_files(directory, ["b.jpg", "a.jpg"])
+    common_arguments: list[str] = ["--undo-log-dir", str(log_dir)]
+    assert main([
+        str(directory), "-n", "holidays", "-e", "jpg", "-p", "1",
+        *common_arguments
+    ]) == 0
+    assert sorted(os.listdir(directory)) == [
+        "holidays_1.jpg", "holidays_2.jpg"
+    ]
+    assert main(["--undo", "last", *common_arguments]) == 0
+    assert sorted(os.listdir(directory)) == ["a.jpg", "b.jpg"]
+
+
+def test_undo_log_of_crashed_batch_is_readable(
+    directory: Path,
+    log_dir: Path
+) -> None:
+    recorder = UndoLogRecorder(
+        str(directory),
+        os.stat(directory),
+        {"a": 1, "b": 2},
+        str(log_dir)
+    )
+    # A swap through a temporary name, interrupted before its last rename
+    recorder.record("a", "tmp", True)
+    recorder.record("b", "a", True)
+    assert recorder.path is not None
+
+    # The recorder is never closed, so the compressed stream has no end
+    assert read_undo_log(recorder.path).entries == [
+        ("tmp", "a", 1), ("a", "b", 2)
+    ]
+
+
+def test_streaming_batch_is_recorded_in_undo_log(
+    directory: Path,
+    log_dir: Path,
+    null_signal: ISignal
+) -> None:
+    names: list[str] = ["b.jpg", "a.jpg", "c.png"]
+    create_files(directory, names)
+    renamer = Renamer(undo_log_dir=str(log_dir))
+    renamer.rename_files_streaming(
+        directory=str(directory),
+        extensions=[".jpg"],
+        new_batch_name="holidays",
+        progress_callback=null_signal,
+        number_padding=1
+    )
+    assert renamer.last_undo_log_path is not None
+
+    renamer.undo_renaming(renamer.last_undo_log_path)
+    assert sorted(os.listdir(directory)) == sorted(names)
+
+
+def test_resumed_batch_is_recorded_in_undo_log(
+    directory: Path,
+    log_dir: Path,
+    tmp_path: Path
+) -> None:
+    create_files(directory, ["a", "b"])
+    journal_path: Path = tmp_path / "journal.jsonl"
+    journal = RenameJournal.create(
+        str(journal_path),
+        str(directory),
+        [[("a", "x")], [("b", "y")]]
+    )
+    journal.close()
+    renamer = Renamer(undo_log_dir=str(log_dir))
+    renamer.resume_renaming(str(journal_path))
+    assert renamer.last_undo_log_path is not None
+
+    renamer.undo_renaming(renamer.last_undo_log_path)
+    assert sorted(os.listdir(directory)) == ["a", "b"]
@@ -0,0 +1,179 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+from app.core.cancellation import CancellationToken
+from app.core.instrumentation import Instrumentation
+from app.core.renamer import Renamer
+from app.core.undo import read_undo_log
+from app.core.watcher import (
+    DirectoryChanges,
+    DirectoryWatcher,
+    InotifyEvents,
+    PollingEvents,
+    load_libc
+)
+
+
+class OverflowEvents:
+    """Source of changes which lost all changes since the last read."""
+
+    def read_changes(self, timeout: float) -> DirectoryChanges:
+        return DirectoryChanges(set(), set(), overflow=True)
+
+    def close(self) -> None:
+        pass
+
+
+def create_watcher(
+        directory: Path,
+        renames: list[tuple[str, str]],
+        renamer: Renamer | None = None,
+        settle_time: float = 0.0
+) -> DirectoryWatcher:
+    return DirectoryWatcher(
+        renamer=renamer if renamer is not None else Renamer(),
+        directory=str(directory),
+        extensions=[".jpg"],
+        new_batch_name="x",
+        number_padding=3,
+        settle_time=settle_time,
+        step_callback=lambda old_name, new_name, renamed: (
+            renames.append((old_name, new_name))
+        ),
+        events=PollingEvents(str(directory), interval=0.0)
+    )
+
+
+def test_new_files_get_lowest_free_numbers(tmp_path: Path) -> None:
+    for name in ("x_001.jpg", "x_003.jpg", "x_004.png", "notes.txt"):
+        (tmp_path / name).write_text("")
+    renames: list[tuple[str, str]] = []
+    watcher = create_watcher(tmp_path, renames)
+    assert watcher.numbers == {"x_001.jpg": 1, "x_003.jpg": 3}
+
+    (tmp_path / "b.jpg").write_text("")
+    (tmp_path / "a.txt").write_text("")
+    watcher.process_changes(0.0)
+    (tmp_path / "c.jpg").write_text("")
+    watcher.process_changes(0.0)
+    assert renames == [("b.jpg", "x_002.jpg"), ("c.jpg", "x_004.jpg")]
+
+    # Own renames are not numbered again
+    watcher.process_changes(0.0)
+    assert len(renames) == 2
+    assert sorted(os.listdir(tmp_path)) == [
+        "a.txt", "notes.txt", "x_001.jpg", "x_002.jpg", "x_003.jpg",
+        "x_004.jpg", "x_004.png"
+    ]
+
+
+def test_numbers_of_removed_files_are_reused(tmp_path: Path) -> None:
+    (tmp_path / "x_001.jpg").write_text("")
+    (tmp_path / "x_002.jpg").write_text("")
+    renames: list[tuple[str, str]] = []
+    watcher = create_watcher(tmp_path, renames)
+
+    (tmp_path / "x_001.jpg").unlink()
+    watcher.process_changes(0.0)
+    (tmp_path / "new.jpg").write_text("")
+    watcher.process_changes(0.0)
+    assert renames == [("new.jpg", "x_001.jpg")]
+
+
+def test_arriving_file_with_matching_name_keeps_it(tmp_path: Path) -> None:
+    renames: list[tuple[str, str]] = []
+    watcher = create_watcher(tmp_path, renames)
+    (tmp_path / "x_002.jpg").write_text("")
+    (tmp_path / "a.jpg").write_text("")
+    watcher.process_changes(0.0)
+    assert renames == [("a.jpg", "x_001.jpg")]
+    assert watcher.numbers == {"x_001.jpg": 1, "x_002.jpg": 2}
+
+
+def test_files_are_renamed_once_settled(tmp_path: Path) -> None:
+    renames: list[tuple[str, str]] = []
+    watcher = create_watcher(tmp_path, renames, settle_time=60.0)
+    (tmp_path / "a.jpg").write_text("")
+    watcher.process_changes(0.0)
+    assert renames == [] and "a.jpg" in watcher.pending
+
+    watcher.pending["a.jpg"] -= 60.0
+    watcher.process_changes(0.0)
+    assert renames == [("a.jpg", "x_001.jpg")]
+
+
+def test_watch_renames_are_recorded_in_undo_log(tmp_path: Path) -> None:
+    directory: Path = tmp_path / "directory"
+    directory.mkdir()
+    renamer = Renamer(undo_log_dir=str(tmp_path / "undo"))
+    renames: list[tuple[str, str]] = []
+    watcher = create_watcher(directory, renames, renamer)
+    (directory / "a.jpg").write_text("")
+    token = CancellationToken()
+    watcher.step_callback = lambda *_: token.cancel()
+    watcher.run(token, timeout=0.0)
+
+    assert renamer.last_undo_log_path is not None
+    assert [
+        (name, original_name)
+        for name, original_name, _ in read_undo_log(
+            renamer.last_undo_log_path
+        ).entries
+    ] == [("x_001.jpg", "a.jpg")]
+
+
+def test_numbers_of_files_removed_during_overflow_are_freed(
+    tmp_path: Path
+) -> None:
+    (tmp_path / "x_001.jpg").write_text("")
+    (tmp_path / "x_002.jpg").write_text("")
+    renames: list[tuple[str, str]] = []
+    watcher = create_watcher(tmp_path, renames)
+    watcher.events = OverflowEvents()
+
+    (tmp_path / "x_001.jpg").unlink()
+    (tmp_path / "new.jpg").write_text("")
+    watcher.process_changes(0.0)
+    assert renames == [("new.jpg", "x_001.jpg")]
+    assert watcher.numbers == {"x_001.jpg": 1, "x_002.jpg": 2}
+
+
+def test_watch_renames_are_measured(tmp_path: Path) -> None:
+    renamer = Renamer(instrumentation=Instrumentation())
+    renames: list[tuple[str, str]] = []
+    watcher = create_watcher(tmp_path, renames, renamer)
+    renamer.instrumentation.take_summary()
+    (tmp_path / "a.jpg").write_text("")
+    watcher.process_changes(0.0)
+
+    assert renames == [("a.jpg", "x_001.jpg")]
+    summary = renamer.instrumentation.take_summary()
+    assert summary.calls["rename"] == 1
+    assert summary.calls["stat"] >= 2
+    assert "execute" in summary.stages
+
+
+@pytest.mark.skipif(load_libc() is None, reason="requires inotify")
+def test_inotify_reports_changes(tmp_path: Path) -> None:
+    libc = load_libc()
+    assert libc is not None
+    events = InotifyEvents(str(tmp_path), libc)
+    try:
+        (tmp_path / "a.jpg").write_text("")
+        (tmp_path / "b.jpg").write_text("")
+        os.rename(tmp_path / "b.jpg", tmp_path / "c.jpg")
+        (tmp_path / "subdirectory").mkdir()
+        deadline: float = time.monotonic() + 5
+        changed: set[str] = set()
+        removed: set[str] = set()
+        while time.monotonic() < deadline and "c.jpg" not in changed:
+            changes = events.read_changes(0.1)
+            changed |= changes.changed
+            removed |= changes.removed
+        assert changed >= {"a.jpg", "c.jpg"}
+        assert "b.jpg" in removed
+        assert "subdirectory" not in changed
+    finally:
+        events.close()